@@ -5,6 +5,9 @@ import pandas as pd
 from geopy.distance import geodesic
 from sklearn.cluster import KMeans
 
+from utils.atribuicao_capacitada import atribuir_com_capacidade, limites_de_tamanho
+from utils.kmeans_incremental import KMeansIncremental, assinatura_coordenadas
+
 
 class ClusterizationEngine:
     """
@@ -31,6 +34,14 @@ class ClusterizationEngine:
         self.max_clusters = max_clusters
         self.reader = reader
         self.logger = logger
+        self._kmeans = None
+
+    def _kmeans_incremental(self, coords) -> KMeansIncremental:
+        """Partições por k reaproveitadas enquanto os pontos forem os mesmos (elbow + clusterização)."""
+        coords = np.asarray(coords, dtype=float)
+        if self._kmeans is None or self._kmeans.assinatura != assinatura_coordenadas(coords):
+            self._kmeans = KMeansIncremental(coords, random_state=self.random_state)
+        return self._kmeans
 
     def _log_info(self, message: str):
         if self.logger:
@@ -101,12 +112,8 @@ class ClusterizationEngine:
         if not k_values:
             return 1
 
-        inertia = []
-        coords = df[[self.LAT_COL, self.LON_COL]].values
-        for k in k_values:
-            kmeans = KMeans(n_clusters=k, random_state=self.random_state, n_init=10)
-            kmeans.fit(coords)
-            inertia.append(kmeans.inertia_)
+        kmeans = self._kmeans_incremental(df[[self.LAT_COL, self.LON_COL]].values)
+        inertia = [kmeans.inercia(k) for k in k_values]
 
         return self._find_elbow_point(k_values, inertia)
 
@@ -142,8 +149,9 @@ class ClusterizationEngine:
             n_clusters = self.determine_optimal_clusters_elbow(df)
 
         n_clusters = max(1, min(int(n_clusters), len(df)))
-        modelo = KMeans(n_clusters=n_clusters, random_state=self.random_state, n_init=10)
-        df["cluster"] = modelo.fit_predict(df[[self.LAT_COL, self.LON_COL]].values)
+        df["cluster"] = self._kmeans_incremental(
+            df[[self.LAT_COL, self.LON_COL]].values
+        ).rotulos(n_clusters)
 
         centers_df = self._recalculate_centers(df)
         df = self._aplicar_centros(df, centers_df)
@@ -253,7 +261,7 @@ class ClusterizationEngine:
             n_subclusters = int(np.ceil(quantidade / max_entregas))
             n_subclusters = max(1, min(n_subclusters, quantidade))
             coords = cluster_df[[self.LAT_COL, self.LON_COL]].values
-            modelo = KMeans(n_clusters=n_subclusters, random_state=self.random_state, n_init=10)
+            modelo = KMeans(n_clusters=n_subclusters, random_state=self.random_state, n_init="auto")
             labels = modelo.fit_predict(coords)
 
             self._log_info(
@@ -481,43 +489,10 @@ class ClusterizationEngine:
         n_clusters = max(1, min(int(n_clusters), len(df)))
         coords = df[[self.LAT_COL, self.LON_COL]].values
 
-        kmeans = KMeans(n_clusters=n_clusters, random_state=self.random_state, n_init=10)
-        df["cluster"] = kmeans.fit_predict(coords)
-
-        target_size = int(len(df) / n_clusters)
-        for _ in range(max_iter):
-            cluster_sizes = df["cluster"].value_counts().to_dict()
-            clusters_excesso = [c for c, s in cluster_sizes.items() if s > target_size + tolerance]
-            clusters_deficit = [c for c, s in cluster_sizes.items() if s < target_size - tolerance]
-
-            if not clusters_excesso or not clusters_deficit:
-                break
-
-            for c_excesso in clusters_excesso:
-                excesso = cluster_sizes[c_excesso] - target_size
-                pontos = df[df["cluster"] == c_excesso].copy()
-                centro = pontos[[self.LAT_COL, self.LON_COL]].mean().values
-                pontos["dist_centro"] = np.linalg.norm(
-                    pontos[[self.LAT_COL, self.LON_COL]].values - centro,
-                    axis=1,
-                )
+        centros = self._kmeans_incremental(coords).centros(n_clusters)
 
-                candidatos = pontos.sort_values("dist_centro", ascending=False).head(excesso)
-                for idx, row in candidatos.iterrows():
-                    best_cluster = None
-                    best_dist = float("inf")
-                    for c_deficit in clusters_deficit:
-                        centro_deficit = df[df["cluster"] == c_deficit][
-                            [self.LAT_COL, self.LON_COL]
-                        ].mean().values
-                        dist = np.linalg.norm(
-                            row[[self.LAT_COL, self.LON_COL]].values - centro_deficit
-                        )
-                        if dist < best_dist:
-                            best_dist = dist
-                            best_cluster = c_deficit
-
-                    if best_cluster is not None:
-                        df.at[idx, "cluster"] = best_cluster
+        minimo, maximo = limites_de_tamanho(len(df), n_clusters, tolerance)
+        rotulos, _ = atribuir_com_capacidade(coords, centros, minimo, maximo, max_iter=max_iter)
+        df["cluster"] = rotulos
 
         return self._aplicar_centros(df, self._recalculate_centers(df))
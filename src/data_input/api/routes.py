@@ -12,6 +12,7 @@ from rq import Queue
 from rq.job import Job
 
 from data_input.workers.data_input_job import processar_data_input
+from data_input.workers.reprocess_invalids_job import reprocessar_invalidos_incremental
 from data_input.infrastructure.manual_data_entry import process_manual_data_input
 from data_input.infrastructure.db_connection import get_connection_context
 from data_input.infrastructure.database_writer import DatabaseWriter
@@ -152,6 +153,40 @@ async def upload_data_input(
         raise HTTPException(500, str(e))
 
 
+@router.post("/reprocessar_invalidos/{job_id}", dependencies=[Depends(verify_token)])
+def reprocessar_invalidos(
+    request: Request,
+    job_id: str,
+    usar_fallback: bool = Query(True),
+    limite_peso_kg: Optional[float] = Query(None),
+):
+    """Reprocessa só os inválidos recuperáveis de um upload anterior (sem reenviar a planilha)."""
+    tenant_id = normalizar_tenant(get_tenant_id(request))
+
+    BASE_PATH = os.getenv("DATA_INPUT_PATH", "/app/src/data_input")
+
+    output_path = os.path.join(BASE_PATH, "tenants", tenant_id, "output", f"{job_id}.xlsx")
+
+    if not os.path.exists(output_path):
+        raise HTTPException(404, "Resultado do job não encontrado")
+
+    job = queue.enqueue(
+        reprocessar_invalidos_incremental,
+        tenant_id,
+        job_id,
+        usar_fallback,
+        limite_peso_kg,
+        job_timeout=3600,
+    )
+
+    return {
+        "status": "processing",
+        "job_id": job.id,
+        "job_id_origem": job_id,
+        "tenant_id": tenant_id,
+    }
+
+
 @router.post("/upload/manual", dependencies=[Depends(verify_token)])
 async def upload_data_input_manual(
     request: Request,
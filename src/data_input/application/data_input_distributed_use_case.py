@@ -5,13 +5,21 @@ import math
 import uuid
 import logging
 import pandas as pd
+from openpyxl import load_workbook
 
 from rq import Queue
 from redis import Redis
 
 from data_input.workers.data_input_subjob import processar_subjob
 from data_input.application.dataframe_builder import DataFrameBuilder
-from data_input.utils.address_normalizer import normalize_address
+from data_input.application.geo_validator import GeoValidator
+from data_input.infrastructure.database_reader import DatabaseReader
+from data_input.infrastructure.db_connection import get_connection_context
+from data_input.infrastructure.parquet_io import (
+    salvar_parte_parquet,
+    salvar_parquet_em_blocos,
+)
+from data_input.utils.address_normalizer import normalize_address_series
 
 
 logger = logging.getLogger(__name__)
@@ -21,13 +29,14 @@ class DataInputDistributedUseCase:
     """
     Fluxo distribuído otimizado:
 
-    1. Lê arquivo
-    2. Faz build completo UMA VEZ
+    1. Lê o arquivo em pedaços (CSV em chunks, Excel em modo read-only)
+    2. Faz o build de cada pedaço e grava como parte Parquet no volume compartilhado
     3. Gera addr_norm
     4. Deduplica globalmente os endereços
-    5. Divide apenas os endereços únicos em subjobs
-    6. Salva o DataFrame completo pré-processado em arquivo temporário
-    7. O job pai depois consolida os resultados dos subjobs
+    5. Resolve pelo cache (localizacoes) numa única consulta
+    6. Grava os endereços não resolvidos num Parquet e despacha subjobs
+       que recebem apenas caminho + intervalo de linhas
+    7. O job pai depois consolida cache + resultados dos subjobs
     """
 
     def __init__(self, tenant_id: str):
@@ -38,64 +47,204 @@ class DataInputDistributedUseCase:
         # Bom ponto de partida para t3.xlarge
         self.chunk_size = int(os.getenv("DATA_INPUT_GEOCODE_CHUNK_SIZE", "300"))
 
-    def _load_file(self, filepath: str) -> pd.DataFrame:
+        # linhas lidas do arquivo de entrada por vez (limita a memória do job pai)
+        self.linhas_leitura = int(os.getenv("DATA_INPUT_READ_CHUNK_ROWS", "20000"))
+
+        # precisa ser visível pelos workers de subjob (volume tenants compartilhado)
+        self.work_dir = os.getenv(
+            "DATA_INPUT_WORK_DIR",
+            os.path.join(os.getenv("DATA_INPUT_PATH", "/app/src/data_input"), "tenants"),
+        )
+
+    @staticmethod
+    def _deduplicar_colunas(cabecalho):
+        """Mesmo padrão do pandas para cabeçalhos repetidos/vazios (ex.: 'CNPJ/CPF.1')."""
+        colunas = []
+        vistos = {}
+
+        for i, nome in enumerate(cabecalho):
+            nome = f"Unnamed: {i}" if nome is None else str(nome)
+            if nome in vistos:
+                vistos[nome] += 1
+                nome_final = f"{nome}.{vistos[nome]}"
+                while nome_final in vistos:
+                    vistos[nome] += 1
+                    nome_final = f"{nome}.{vistos[nome]}"
+                vistos[nome_final] = 0
+                nome = nome_final
+            else:
+                vistos[nome] = 0
+            colunas.append(nome)
+
+        return colunas
+
+    def _iterar_excel(self, filepath: str):
+        workbook = load_workbook(filepath, read_only=True, data_only=True)
+
+        try:
+            linhas = workbook.worksheets[0].iter_rows(values_only=True)
+
+            cabecalho = next(linhas, None)
+            if cabecalho is None:
+                return
+
+            colunas = self._deduplicar_colunas(cabecalho)
+            bloco = []
+
+            for linha in linhas:
+                if all(v is None for v in linha):
+                    continue
+                bloco.append(linha[:len(colunas)])
+                if len(bloco) >= self.linhas_leitura:
+                    yield pd.DataFrame(bloco, columns=colunas)
+                    bloco = []
+
+            if bloco:
+                yield pd.DataFrame(bloco, columns=colunas)
+
+        finally:
+            workbook.close()
+
+    def _iterar_csv(self, filepath: str):
+        try:
+            leitor = pd.read_csv(filepath, sep=";", chunksize=self.linhas_leitura)
+            primeiro = next(leitor, None)
+        except Exception:
+            leitor = pd.read_csv(filepath, chunksize=self.linhas_leitura)
+            primeiro = next(leitor, None)
+
+        if primeiro is None:
+            return
+
+        yield primeiro
+        yield from leitor
+
+    def _iterar_arquivo(self, filepath: str):
+        """Gera o arquivo de entrada em DataFrames de até linhas_leitura linhas."""
         ext = os.path.splitext(filepath)[1].lower()
 
-        if ext in [".xlsx", ".xls"]:
-            return pd.read_excel(filepath)
+        if ext == ".xlsx":
+            yield from self._iterar_excel(filepath)
+            return
+
+        if ext == ".xls":
+            # formato antigo não tem leitor em streaming (openpyxl só lê .xlsx)
+            df = pd.read_excel(filepath)
+            for i in range(0, len(df), self.linhas_leitura):
+                yield df.iloc[i:i + self.linhas_leitura].reset_index(drop=True)
+            return
 
         if ext == ".csv":
-            try:
-                return pd.read_csv(filepath, sep=";")
-            except Exception:
-                return pd.read_csv(filepath)
+            yield from self._iterar_csv(filepath)
+            return
 
         raise ValueError(f"Formato de arquivo não suportado: {ext}")
 
+    def _resolver_pelo_cache(self, df_unique: pd.DataFrame):
+        """
+        Consulta todos os endereços únicos em localizacoes de uma vez.
+        Retorna (resultados_cache, df_misses): hits já validados na UF (mesma regra
+        do geocode_batch) e os endereços que ainda precisam de geocoding externo.
+        """
+        if df_unique.empty:
+            return [], df_unique
+
+        try:
+            with get_connection_context() as conn:
+                reader = DatabaseReader(conn)
+                cache = reader.buscar_localizacoes_em_lote(
+                    df_unique["addr_norm"].tolist(),
+                    ja_normalizados=True,
+                )
+        except Exception as e:
+            logger.warning(f"⚠ Cache em lote indisponível, despachando todos os endereços: {e}")
+            return [], df_unique
+
+        validator = GeoValidator()
+        resultados_cache = []
+        resolvidos = []
+
+        for row in df_unique.itertuples(index=False):
+            cached = cache.get(row.addr_norm)
+            if not cached:
+                resolvidos.append(False)
+                continue
+
+            lat = cached["latitude"]
+            lon = cached["longitude"]
+            if validator.validar_ponto(lat, lon, row.cte_uf) != "ok":
+                resolvidos.append(False)
+                continue
+
+            resolvidos.append(True)
+            resultados_cache.append({
+                "addr_norm": row.addr_norm,
+                "endereco_completo": row.endereco_completo,
+                "destino_latitude": lat,
+                "destino_longitude": lon,
+                "geocode_source": "cache",
+            })
+
+        df_misses = df_unique[[not r for r in resolvidos]].reset_index(drop=True)
+        return resultados_cache, df_misses
+
     def execute(self, filepath: str) -> dict:
         logger.info(f"📂 Lendo arquivo de input: {filepath}")
 
-        # ---------------------------------------------------------
-        # LOAD
-        # ---------------------------------------------------------
-        df = self._load_file(filepath)
+        run_id = str(uuid.uuid4())
+        run_dir = os.path.join(self.work_dir, self.tenant_id, "tmp", f"data_input_{run_id}")
+        preprocessed_path = os.path.join(run_dir, "entregas")
 
-        logger.info(f"📊 Linhas carregadas: {len(df)}")
+        colunas_geo = [
+            "addr_norm",
+            "cte_rua",
+            "cte_cidade",
+            "cte_uf",
+            "cte_cep",
+            "endereco_completo",
+        ]
 
-        # ---------------------------------------------------------
-        # BUILD GLOBAL
-        # ---------------------------------------------------------
         builder = DataFrameBuilder()
-        df = builder.build(df)
-        df["tenant_id"] = self.tenant_id
+        total_linhas = 0
+        enderecos = []
 
         # ---------------------------------------------------------
-        # NORMALIZA ENDEREÇO GLOBALMENTE
+        # LOAD + BUILD + addr_norm POR PEDAÇO -> PARTES PARQUET
         # ---------------------------------------------------------
-        df["addr_norm"] = df["endereco_completo"].apply(normalize_address)
+        for numero_parte, df in enumerate(self._iterar_arquivo(filepath)):
+
+            df = builder.build(df)
+            df["tenant_id"] = self.tenant_id
+            df["addr_norm"] = normalize_address_series(df["endereco_completo"])
 
-        # remove linhas sem endereço normalizado útil para geocode
-        df_geo = df[df["addr_norm"].notna()].copy()
+            salvar_parte_parquet(df, preprocessed_path, numero_parte)
+
+            total_linhas += len(df)
+
+            # só o necessário para o geocode fica em memória
+            enderecos.append(
+                df.loc[df["addr_norm"].notna(), colunas_geo]
+                .drop_duplicates(subset=["addr_norm"])
+            )
+
+            logger.info(f"📊 Linhas carregadas: {total_linhas} (parte {numero_parte})")
+
+        logger.info(f"💾 Partes pré-processadas salvas em: {preprocessed_path}")
 
         # ---------------------------------------------------------
         # DEDUP GLOBAL DE ENDEREÇOS
         # ---------------------------------------------------------
-        colunas_geo = [
-            "addr_norm",
-            "cte_rua",
-            "cte_cidade",
-            "cte_uf",
-            "cte_cep",
-            "endereco_completo",
-        ]
+        if enderecos:
+            df_unique = (
+                pd.concat(enderecos, ignore_index=True)
+                .drop_duplicates(subset=["addr_norm"])
+                .reset_index(drop=True)
+            )
+        else:
+            df_unique = pd.DataFrame(columns=colunas_geo)
 
-        df_unique = (
-            df_geo[colunas_geo]
-            .drop_duplicates(subset=["addr_norm"])
-            .reset_index(drop=True)
-        )
+        del enderecos
 
-        total_linhas = len(df)
         total_enderecos_unicos = len(df_unique)
 
         logger.info(
@@ -103,54 +252,60 @@ class DataInputDistributedUseCase:
         )
 
         # ---------------------------------------------------------
-        # SALVA DATAFRAME COMPLETO PRÉ-PROCESSADO
+        # CACHE-FIRST: SÓ OS MISSES VIRAM SUBJOBS
         # ---------------------------------------------------------
-        run_id = str(uuid.uuid4())
-        tmp_dir = f"/tmp/data_input/{self.tenant_id}"
-        os.makedirs(tmp_dir, exist_ok=True)
+        cache_results, df_misses = self._resolver_pelo_cache(df_unique)
 
-        preprocessed_path = os.path.join(
-            tmp_dir, f"data_input_preprocessed_{run_id}.pkl"
+        logger.info(
+            f"🗄️ Cache de endereços | hits={len(cache_results)} | misses={len(df_misses)}"
         )
 
-        df.to_pickle(preprocessed_path)
-
-        logger.info(f"💾 DataFrame pré-processado salvo em: {preprocessed_path}")
-
         # ---------------------------------------------------------
-        # CHUNKS DOS ENDEREÇOS ÚNICOS
+        # SUBJOBS: CAMINHO DO PARQUET + INTERVALO DE LINHAS
         # ---------------------------------------------------------
-        chunks = [
-            df_unique.iloc[i:i + self.chunk_size].copy()
-            for i in range(0, len(df_unique), self.chunk_size)
-        ]
-
         subjobs = []
 
-        for i, chunk in enumerate(chunks):
-            payload = {
-                "chunk_id": i,
-                "tenant_id": self.tenant_id,
-                "data": chunk.to_dict(orient="records"),
-            }
-
-            subjob = self.queue.enqueue(
-                processar_subjob,
-                payload,
-                job_timeout=3600,
-                result_ttl=86400,
-                failure_ttl=86400,
+        # lista Redis onde cada subjob avisa a conclusão (o job pai faz BLPOP)
+        completion_key = f"data_input:subjobs:{run_id}:concluidos"
+
+        if not df_misses.empty:
+            geocode_path = salvar_parquet_em_blocos(
+                df_misses,
+                os.path.join(run_dir, "geocode_pendentes.parquet"),
+                self.chunk_size,
             )
 
-            subjobs.append(subjob.id)
+            for i, inicio in enumerate(range(0, len(df_misses), self.chunk_size)):
+                payload = {
+                    "chunk_id": i,
+                    "tenant_id": self.tenant_id,
+                    "completion_key": completion_key,
+                    "path": geocode_path,
+                    "inicio": inicio,
+                    "fim": min(inicio + self.chunk_size, len(df_misses)),
+                }
+
+                subjob = self.queue.enqueue(
+                    processar_subjob,
+                    payload,
+                    job_timeout=3600,
+                    result_ttl=86400,
+                    failure_ttl=86400,
+                )
+
+                subjobs.append(subjob.id)
 
         logger.info(f"🚀 {len(subjobs)} subjobs criados")
 
         return {
             "run_id": run_id,
+            "run_dir": run_dir,
             "preprocessed_path": preprocessed_path,
             "subjobs": subjobs,
+            "completion_key": completion_key,
+            "cache_results": cache_results,
             "total_linhas": total_linhas,
             "total_enderecos_unicos": total_enderecos_unicos,
+            "total_cache_hits": len(cache_results),
             "chunk_size": self.chunk_size,
-        }
\ No newline at end of file
+        }
@@ -13,7 +13,14 @@ from data_input.domain.municipio_polygon_validator import (
 logger = logging.getLogger(__name__)
 
 
-REPROCESS_GOOGLE_SOURCES = {"cache", "nominatim", "nominatim_structured"}
+REPROCESS_GOOGLE_SOURCES = {
+    "cache",
+    "nominatim",
+    "nominatim_structured",
+    "offline_cep",
+    "offline_fuzzy",
+    "offline_centroide",
+}
 DIRECT_FALLBACK_SOURCES = {"google", "google_override"}
 
 
@@ -10,13 +10,10 @@ import re
 import logging
 import time
 
-from shapely.geometry import Point
-
 from data_input.config.config import UF_BOUNDS
 from data_input.domain.municipio_polygon_validator import (
-    ponto_dentro_municipio,
+    pontos_dentro_municipios,
     _load_polygons,
-    _get_polygon_context,
     _norm
 )
 
@@ -41,6 +38,30 @@ def _load_cidade_uf_map():
     return set(polygons.keys())
 
 
+@lru_cache(maxsize=1)
+def _load_cidade_uf_chaves():
+    """Mesmo conjunto de _load_cidade_uf_map, como chaves 'CIDADE|UF' (isin com hash)."""
+    return frozenset(f"{cidade}|{uf}" for cidade, uf in _load_cidade_uf_map())
+
+
+@lru_cache(maxsize=1)
+def _uf_bounds_frame():
+    return pd.DataFrame.from_dict(UF_BOUNDS, orient="index")[
+        ["lat_min", "lat_max", "lon_min", "lon_max"]
+    ]
+
+
+def _norm_por_valor(valores: pd.Series) -> pd.Series:
+    """Aplica _norm uma vez por valor distinto e espalha o resultado para a coluna."""
+    codigos, distintos = pd.factorize(valores, use_na_sentinel=True)
+    normalizados = [_norm(v) for v in distintos] + [None]
+    return pd.Series(
+        [normalizados[c] for c in codigos],
+        index=valores.index,
+        dtype=object,
+    )
+
+
 def _valida_cidade_uf(cidade, uf):
     """Verifica se a combinação cidade-uf é válida."""
     if not cidade or not uf:
@@ -68,7 +89,11 @@ class ValidationService:
         # "cte_volumes",  # Agora opcional
     ]
 
-    def execute(self, df: pd.DataFrame):
+    def execute(self, df: pd.DataFrame, cte_duplicados=None):
+        """
+        cte_duplicados: CT-es repetidos no upload inteiro, para validar uma parte por vez
+        sem perder a duplicidade entre partes.
+        """
 
         df = df.copy()
 
@@ -86,6 +111,10 @@ class ValidationService:
 
         df["motivo_invalidade"] = None
 
+        # cidade/UF normalizados uma única vez por valor distinto (usados em 1.5 e 6)
+        cidade_norm = _norm_por_valor(df["cte_cidade"])
+        uf_norm = _norm_por_valor(df["cte_uf"])
+
         def marcar_motivo(mask, motivo):
             mask_final = mask & df["motivo_invalidade"].isna()
             df.loc[mask_final, "motivo_invalidade"] = motivo
@@ -103,26 +132,17 @@ class ValidationService:
         mask_need_check = ~mask_already_invalid
 
         if mask_need_check.any():
-            # ⚡ PRÉ-CARREGAR MAPA UMA ÚNICA VEZ
-            valid_pairs = _load_cidade_uf_map()
-            valid_pairs_set = set(valid_pairs)
-
-            df_check = df[mask_need_check].copy()
-
-            # Normalizar cidade+uf em lote (usando _norm importada)
-            df_check["cidade_norm"] = df_check["cte_cidade"].apply(_norm)
-            df_check["uf_norm"] = df_check["cte_uf"].apply(_norm)
-
-            # Criar tuple (cidade, uf) e verificar em lote contra set
-            df_check["cidade_uf_tuple"] = list(zip(df_check["cidade_norm"], df_check["uf_norm"]))
-            df_check["cidade_uf_valido"] = df_check["cidade_uf_tuple"].isin(valid_pairs_set)
+            # ⚡ PRÉ-CARREGAR MAPA UMA ÚNICA VEZ (chaves 'CIDADE|UF')
+            valid_keys = _load_cidade_uf_chaves()
+
+            chave_cidade_uf = cidade_norm.fillna("") + "|" + uf_norm.fillna("")
+            mask_cidade_uf_valido = (
+                cidade_norm.notna()
+                & uf_norm.notna()
+                & chave_cidade_uf.isin(valid_keys)
+            )
 
-            # Aplicar resultado ao dataframe original
-            mask_cidade_uf_invalido = ~df_check["cidade_uf_valido"]
-            df.loc[
-                df[mask_need_check].index[mask_cidade_uf_invalido],
-                "motivo_invalidade",
-            ] = "cidade_uf_divergencia"
+            marcar_motivo(~mask_cidade_uf_valido, "cidade_uf_divergencia")
 
         # ---------------------------
         # 2. PESO / VOLUME
@@ -135,13 +155,18 @@ class ValidationService:
         # 3. DUPLICIDADE CTE
         # ---------------------------
         duplicados = df.duplicated(subset=["cte_numero"], keep=False)
+        if cte_duplicados:
+            duplicados |= df["cte_numero"].isin(cte_duplicados)
         marcar_motivo(duplicados, "cte_duplicado")
         # Log detalhado dos duplicados
         if duplicados.any():
             cte_duplicados = df.loc[duplicados, "cte_numero"]
             contagem = cte_duplicados.value_counts()
-            logger.warning("[VALIDACAO][DUPLICADOS] cte_numero duplicados e suas contagens:")
-            for cte, count in contagem.items():
+            logger.warning(
+                f"[VALIDACAO][DUPLICADOS] cte_numero duplicados={len(contagem)} "
+                f"linhas={int(duplicados.sum())}"
+            )
+            for cte, count in contagem.head(50).items():
                 logger.warning(f"[VALIDACAO][DUPLICADO] cte_numero={cte} count={count}")
 
         # ---------------------------
@@ -182,84 +207,43 @@ class ValidationService:
         # ---------------------------
         # 5. UF BOUNDING BOX
         # ---------------------------
-        def validar_uf(row):
-            uf = str(row["cte_uf"]).upper()
-            lat = row["destino_latitude"]
-            lon = row["destino_longitude"]
-
-            if pd.isna(lat) or pd.isna(lon):
-                return False
-
-            bounds = UF_BOUNDS.get(uf)
-
-            if not bounds:
-                return False
-
-            return (
-                bounds["lat_min"] <= lat <= bounds["lat_max"]
-                and bounds["lon_min"] <= lon <= bounds["lon_max"]
-            )
-
-        mask_uf = ~df.apply(validar_uf, axis=1)
+        bounds = _uf_bounds_frame()
+        uf_upper = df["cte_uf"].astype(str).str.upper()
+
+        lat = pd.to_numeric(df["destino_latitude"], errors="coerce")
+        lon = pd.to_numeric(df["destino_longitude"], errors="coerce")
+
+        # UF sem bounds -> NaN -> comparação False -> fora_uf (como antes)
+        mask_uf = ~(
+            (lat >= uf_upper.map(bounds["lat_min"]))
+            & (lat <= uf_upper.map(bounds["lat_max"]))
+            & (lon >= uf_upper.map(bounds["lon_min"]))
+            & (lon <= uf_upper.map(bounds["lon_max"]))
+        )
         marcar_motivo(mask_uf, "fora_uf")
 
         # =========================================================
         # 🔥 6. MUNICÍPIO (VETORIZADO) - PRÉ-CARREGAR POLÍGONOS
         # =========================================================
 
-        df_valid = df[df["motivo_invalidade"].isna()].copy()
-        df_invalid = df[df["motivo_invalidade"].notna()].copy()
+        mask_valido = df["motivo_invalidade"].isna()
+        df_valid = df[mask_valido].copy()
+        df_invalid = df[~mask_valido].copy()
 
         if not df_valid.empty:
             municipio_validation_start = time.perf_counter()
 
-            df_valid["cidade_norm"] = df_valid["cte_cidade"].apply(_norm)
-            df_valid["uf_norm"] = df_valid["cte_uf"].apply(_norm)
-            df_valid["valido_municipio"] = False
-
-            grupos_municipio = df_valid.groupby(["cidade_norm", "uf_norm"], sort=False)
-
-            for (cidade_norm, uf_norm), group in grupos_municipio:
-                if not cidade_norm or not uf_norm:
-                    continue
-
-                polygon_context = _get_polygon_context(cidade_norm, uf_norm)
-
-                if polygon_context is None:
-                    logger.debug(f"[POLYGON][NOT_FOUND] {cidade_norm}-{uf_norm}")
-                    continue
+            df_valid["cidade_norm"] = cidade_norm[mask_valido].to_numpy()
+            df_valid["uf_norm"] = uf_norm[mask_valido].to_numpy()
 
-                prepared_poly = polygon_context["prepared_poly"]
-                prepared_buffered_poly = polygon_context["prepared_buffered_poly"]
-
-                group_valid_indexes = []
-
-                for row in group.itertuples():
-                    lat = row.destino_latitude
-                    lon = row.destino_longitude
-
-                    if lat is None or lon is None or pd.isna(lat) or pd.isna(lon):
-                        continue
-
-                    point_lon = float(lon)
-                    point_lat = float(lat)
-                    ponto = Point(point_lon, point_lat)
-                    inside_strict = prepared_poly.contains(ponto)
-                    inside_buffer = prepared_buffered_poly.contains(ponto)
-
-                    if inside_strict:
-                        group_valid_indexes.append(row.Index)
-                        continue
-
-                    if inside_buffer:
-                        logger.info(
-                            f"[POLYGON][BUFFER] {cidade_norm}-{uf_norm} "
-                            f"lat={lat} lon={lon}"
-                        )
-                        group_valid_indexes.append(row.Index)
-
-                if group_valid_indexes:
-                    df_valid.loc[group_valid_indexes, "valido_municipio"] = True
+            dentro = pontos_dentro_municipios(
+                pd.to_numeric(df_valid["destino_latitude"], errors="coerce").to_numpy(),
+                pd.to_numeric(df_valid["destino_longitude"], errors="coerce").to_numpy(),
+                df_valid["cidade_norm"].to_numpy(),
+                df_valid["uf_norm"].to_numpy(),
+            )
+            # None = polígono não encontrado -> também inválido
+            df_valid["valido_municipio"] = dentro == True  # noqa: E712
 
             df_invalid_municipio = df_valid[~df_valid["valido_municipio"]].copy()
             df_valid = df_valid[df_valid["valido_municipio"]].copy()
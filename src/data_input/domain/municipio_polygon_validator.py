@@ -2,12 +2,16 @@
 
 import json
 import os
+import pickle
 import re
+import time
 import unicodedata
 import logging
 from pathlib import Path
 from functools import lru_cache
 
+import numpy as np
+import shapely
 from shapely.geometry import shape, Point
 from shapely.prepared import prep
 
@@ -23,6 +27,15 @@ BASE_PATH = Path(
     )
 )
 
+# Cache pré-serializado (WKB) dos polígonos, regenerado quando o GeoJSON muda
+CACHE_PATH = Path(
+    os.getenv(
+        "IBGE_MUNICIPIOS_CACHE",
+        str(BASE_PATH.with_suffix(".wkb.pkl"))
+    )
+)
+CACHE_VERSAO = 1
+
 def _strip_accents(txt):
     txt = unicodedata.normalize("NFKD", txt)
     return "".join(c for c in txt if not unicodedata.combining(c))
@@ -35,13 +48,53 @@ def _norm(txt):
     txt = re.sub(r"\s+", " ", txt)
     return txt.upper()
 
-@lru_cache(maxsize=1)
-def _load_polygons():
+def _assinatura_fonte():
+    stat = BASE_PATH.stat()
+    return {"mtime": stat.st_mtime, "tamanho": stat.st_size}
 
-    if not BASE_PATH.exists():
-        logger.warning(f"[POLYGON][FILE_NOT_FOUND] {BASE_PATH}")
-        return {}
+
+def _ler_cache_polygons():
+    """Lê o cache WKB (pickle) se existir e corresponder ao GeoJSON atual."""
+    if not CACHE_PATH.exists():
+        return None
 
+    try:
+        with open(CACHE_PATH, "rb") as f:
+            cache = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"[POLYGON][CACHE_READ_ERROR] {e}")
+        return None
+
+    if cache.get("versao") != CACHE_VERSAO or cache.get("fonte") != _assinatura_fonte():
+        logger.info("[POLYGON][CACHE_STALE]")
+        return None
+
+    chaves = cache["chaves"]
+    geometrias = shapely.from_wkb(cache["wkb"])
+    return dict(zip(chaves, geometrias))
+
+
+def _gravar_cache_polygons(polygons):
+    """Grava o cache de forma atômica (vários workers podem gerar ao mesmo tempo)."""
+    try:
+        chaves = list(polygons.keys())
+        cache = {
+            "versao": CACHE_VERSAO,
+            "fonte": _assinatura_fonte(),
+            "chaves": chaves,
+            "wkb": shapely.to_wkb(np.array([polygons[k] for k in chaves], dtype=object)),
+        }
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = CACHE_PATH.with_name(f"{CACHE_PATH.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, CACHE_PATH)
+        logger.info(f"[POLYGON][CACHE_WRITTEN] {CACHE_PATH}")
+    except Exception as e:
+        logger.warning(f"[POLYGON][CACHE_WRITE_ERROR] {e}")
+
+
+def _parse_geojson():
     try:
         with open(BASE_PATH, "r", encoding="utf-8") as f:
             geo = json.load(f)
@@ -65,7 +118,31 @@ def _load_polygons():
         except Exception:
             continue
 
-    logger.info(f"[POLYGON][LOADED] total={len(polygons)}")
+    return polygons
+
+
+@lru_cache(maxsize=1)
+def _load_polygons():
+
+    if not BASE_PATH.exists():
+        logger.warning(f"[POLYGON][FILE_NOT_FOUND] {BASE_PATH}")
+        return {}
+
+    inicio = time.perf_counter()
+
+    polygons = _ler_cache_polygons()
+    origem = "cache"
+
+    if polygons is None:
+        polygons = _parse_geojson()
+        origem = "geojson"
+        if polygons:
+            _gravar_cache_polygons(polygons)
+
+    logger.info(
+        f"[POLYGON][LOADED] total={len(polygons)} origem={origem} "
+        f"tempo={time.perf_counter() - inicio:.2f}s"
+    )
 
     return polygons
 
@@ -86,6 +163,9 @@ def _get_polygon_context(cidade, uf):
 
     try:
         buffered_poly = poly.buffer(BUFFER_GRAUS)
+        # prepara in-place para os predicados vetorizados (contains_xy)
+        shapely.prepare(poly)
+        shapely.prepare(buffered_poly)
         return {
             "poly": poly,
             "buffered_poly": buffered_poly,
@@ -97,7 +177,6 @@ def _get_polygon_context(cidade, uf):
 
 
 def ponto_dentro_municipio(lat, lon, cidade, uf):
-    print(f"[DEBUG][POLYGON] lat={lat} lon={lon} cidade={cidade} uf={uf}")
 
     if lat is None or lon is None:
         logger.warning(f"[POLYGON][INVALID_COORDS] lat={lat} lon={lon}")
@@ -117,39 +196,95 @@ def ponto_dentro_municipio(lat, lon, cidade, uf):
 
     if not cidade or not uf:
         logger.warning(f"[POLYGON][NORM_FAIL] cidade='{cidade_orig}' uf='{uf_orig}'")
-        print(f"[DEBUG][POLYGON] NORM_FAIL cidade_orig='{cidade_orig}' uf_orig='{uf_orig}' cidade='{cidade}' uf='{uf}'")
         return None
 
     polygon_context = _get_polygon_context(cidade, uf)
 
     if polygon_context is None:
         logger.warning(f"[POLYGON][NOT_FOUND] cidade='{cidade}' uf='{uf}' (orig: '{cidade_orig}'/'{uf_orig}')")
-        print(f"[DEBUG][POLYGON] NOT_FOUND cidade='{cidade}' uf='{uf}' (orig: '{cidade_orig}'/'{uf_orig}')")
         return None
 
     ponto = Point(lon, lat)
 
-    inside_strict = polygon_context["prepared_poly"].contains(ponto)
-    inside_buffer = polygon_context["prepared_buffered_poly"].contains(ponto)
-
-    logger.info(f"[POLYGON][CHECK] cidade='{cidade}' uf='{uf}' lat={lat} lon={lon} inside_strict={inside_strict} inside_buffer={inside_buffer} buffer={BUFFER_GRAUS}")
-    print(f"[DEBUG][POLYGON] CHECK cidade='{cidade}' uf='{uf}' lat={lat} lon={lon} inside_strict={inside_strict} inside_buffer={inside_buffer} buffer={BUFFER_GRAUS}")
-
-    if inside_strict:
-        logger.info(f"[POLYGON][INSIDE] cidade='{cidade}' uf='{uf}' lat={lat} lon={lon}")
-        print(f"[DEBUG][POLYGON] INSIDE cidade='{cidade}' uf='{uf}' lat={lat} lon={lon}")
+    if polygon_context["prepared_poly"].contains(ponto):
+        logger.debug(f"[POLYGON][INSIDE] cidade='{cidade}' uf='{uf}' lat={lat} lon={lon}")
         return True
 
-    if inside_buffer:
-        logger.warning(f"[POLYGON][BUFFER_HIT] cidade='{cidade}' uf='{uf}' lat={lat} lon={lon}")
-        print(f"[DEBUG][POLYGON] BUFFER_HIT cidade='{cidade}' uf='{uf}' lat={lat} lon={lon}")
+    if polygon_context["prepared_buffered_poly"].contains(ponto):
+        logger.debug(f"[POLYGON][BUFFER_HIT] cidade='{cidade}' uf='{uf}' lat={lat} lon={lon}")
         return True
 
-    logger.warning(f"[POLYGON][OUTSIDE] cidade='{cidade}' uf='{uf}' lat={lat} lon={lon}")
-    print(f"[DEBUG][POLYGON] OUTSIDE cidade='{cidade}' uf='{uf}' lat={lat} lon={lon}")
+    logger.debug(f"[POLYGON][OUTSIDE] cidade='{cidade}' uf='{uf}' lat={lat} lon={lon}")
     return False
 
 
+def pontos_dentro_municipios(lats, lons, cidades, ufs):
+    """
+    Versão em lote de ponto_dentro_municipio.
+    Normaliza cidade/UF uma vez por valor distinto, agrupa os pontos por município e
+    testa cada grupo com shapely.contains_xy (polígono com buffer; o estrito está contido nele).
+    Retorna array (object) com True / False / None, com a mesma semântica da versão unitária.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    cidades = list(cidades)
+    ufs = list(ufs)
+
+    resultado = np.full(len(lats), None, dtype=object)
+    if len(lats) == 0:
+        return resultado
+
+    coords_validas = ~(np.isnan(lats) | np.isnan(lons))
+    resultado[~coords_validas] = False
+
+    norm_cache = {}
+
+    def _norm_memo(valor):
+        try:
+            return norm_cache[valor]
+        except KeyError:
+            norm_cache[valor] = _norm(valor)
+            return norm_cache[valor]
+        except TypeError:
+            return _norm(valor)
+
+    grupos = {}
+    for i in np.flatnonzero(coords_validas):
+        chave = (_norm_memo(cidades[i]), _norm_memo(ufs[i]))
+        grupos.setdefault(chave, []).append(i)
+
+    buffer_hits = 0
+    nao_encontrados = 0
+    for (cidade, uf), indices in grupos.items():
+        if not cidade or not uf:
+            continue
+
+        polygon_context = _get_polygon_context(cidade, uf)
+        if polygon_context is None:
+            nao_encontrados += len(indices)
+            continue
+
+        indices = np.asarray(indices)
+        x = lons[indices]
+        y = lats[indices]
+
+        inside_buffer = shapely.contains_xy(polygon_context["buffered_poly"], x, y)
+        resultado[indices] = inside_buffer
+
+        if inside_buffer.any():
+            inside_strict = shapely.contains_xy(
+                polygon_context["poly"], x[inside_buffer], y[inside_buffer]
+            )
+            buffer_hits += int((~inside_strict).sum())
+
+    logger.info(
+        f"[POLYGON][BATCH] pontos={len(lats)} municipios={len(grupos)} "
+        f"buffer_hits={buffer_hits} nao_encontrados={nao_encontrados}"
+    )
+
+    return resultado
+
+
 def get_municipio_centroid(cidade, uf):
     cidade = _norm(cidade)
     uf = _norm(uf)
@@ -55,13 +55,16 @@ class DatabaseReader:
             logging.error(f"❌ Erro ao buscar localização no banco: {e}")
             return None
 
-    def buscar_localizacoes_em_lote(self, enderecos: list):
+    def buscar_localizacoes_em_lote(self, enderecos: list, ja_normalizados: bool = False):
 
         if not enderecos:
             return {}
 
-        # 🔥 normaliza tudo
-        enderecos_norm = [normalize_address(e) for e in enderecos if e]
+        # 🔥 normaliza tudo (a menos que já venha a chave addr_norm da ingestão)
+        if ja_normalizados:
+            enderecos_norm = [e for e in enderecos if e]
+        else:
+            enderecos_norm = [normalize_address(e) for e in enderecos if e]
 
         query = """
             SELECT endereco, latitude, longitude
@@ -86,6 +89,46 @@ class DatabaseReader:
             logging.error(f"❌ Erro ao buscar cache em lote: {e}")
             return {}
 
+    def buscar_localizacoes_similares(self, enderecos: list, limiar: float):
+        """
+        Para cada endereço normalizado, o endereço mais parecido em localizacoes
+        (pg_trgm, índice idx_localizacoes_endereco_trgm) com similaridade >= limiar.
+        Retorna {endereco: {"latitude", "longitude", "similaridade"}}.
+        """
+        if not enderecos:
+            return {}
+
+        query = """
+            SELECT q.endereco, l.latitude, l.longitude, similarity(l.endereco, q.endereco)
+            FROM unnest(%s::text[]) AS q(endereco)
+            CROSS JOIN LATERAL (
+                SELECT endereco, latitude, longitude
+                FROM localizacoes
+                WHERE endereco %% q.endereco
+                ORDER BY endereco <-> q.endereco
+                LIMIT 1
+            ) l
+        """
+
+        try:
+            with self.conexao.cursor() as cursor:
+                cursor.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, true)", (str(limiar),))
+                cursor.execute(query, (list(enderecos),))
+                rows = cursor.fetchall()
+        except Exception:
+            self.conexao.rollback()
+            raise
+
+        return {
+            row[0]: {
+                "latitude": float(row[1]),
+                "longitude": float(row[2]),
+                "similaridade": float(row[3]),
+            }
+            for row in rows
+            if row[1] is not None and row[2] is not None
+        }
+
     def buscar_entregas(self, datas: list, tenant_id: str):
         """
         Busca as entregas para uma lista de datas (envio_data) e um tenant_id.
@@ -1,17 +1,124 @@
 #hub_router_1.0.1/src/data_input/infrastructure/database_writer.py
 
 import os
+import math
 import logging
 import pandas as pd
 from decimal import Decimal
 from typing import List
-from psycopg2.extras import execute_values
 import traceback
 
 
 from data_input.domain.entities import Entrega
 from data_input.utils.address_normalizer import normalize_address
 
+
+COLUNAS_ENTREGAS = (
+    "cte_numero",
+    "transportadora",
+    "remetente_cnpj",
+    "cte_rua",
+    "cte_bairro",
+    "cte_complemento",
+    "cte_numero_endereco",
+    "cte_cidade",
+    "cte_uf",
+    "cte_cep",
+    "cte_nf",
+    "cte_volumes",
+    "cte_peso",
+    "cte_tempo_atendimento_min",
+    "cte_prazo_min",
+    "cte_valor_nf",
+    "cte_valor_frete",
+    "envio_data",
+    "endereco_completo",
+    "remetente_nome",
+    "destinatario_nome",
+    "destinatario_cnpj",
+    "destino_latitude",
+    "destino_longitude",
+    "remetente_cidade",
+    "remetente_uf",
+    "doc_min",
+    "tenant_id",
+    "geocode_source",
+)
+
+CHAVE_ENTREGAS = ("tenant_id", "cte_numero", "transportadora")
+
+COLUNAS_LOCALIZACOES = ("endereco", "latitude", "longitude", "origem")
+
+
+def _valor_copy(valor):
+    """Formata um valor para o formato texto do COPY (\\N = NULL)."""
+    if valor is None:
+        return "\\N"
+    if isinstance(valor, float):
+        if math.isnan(valor):
+            return "\\N"
+        # inteiro sem ".0" para caber também em colunas integer
+        return str(int(valor)) if valor.is_integer() else repr(valor)
+    if valor is pd.NaT:
+        return "\\N"
+    return (
+        str(valor)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class _LeitorCopy:
+    """Arquivo somente-leitura que gera as linhas do COPY sob demanda (sem montar tudo em memória)."""
+
+    def __init__(self, linhas):
+        self._linhas = iter(linhas)
+        self._buffer = ""
+
+    def read(self, size=-1):
+        partes = [self._buffer]
+        tamanho = len(self._buffer)
+        while size is None or size < 0 or tamanho < size:
+            try:
+                linha = next(self._linhas)
+            except StopIteration:
+                break
+            texto = "\t".join(_valor_copy(v) for v in linha) + "\n"
+            partes.append(texto)
+            tamanho += len(texto)
+
+        dados = "".join(partes)
+        if size is None or size < 0:
+            self._buffer = ""
+            return dados
+        self._buffer = dados[size:]
+        return dados[:size]
+
+
+def _endereco_para_cache(endereco, ja_normalizado=False):
+    """Normaliza o endereço e descarta os que não devem ir para localizacoes."""
+    if not endereco:
+        return None
+
+    endereco_norm = endereco if ja_normalizado else normalize_address(endereco)
+
+    if not endereco_norm:
+        return None
+
+    if len(endereco_norm) < 10:
+        return None
+
+    if endereco_norm in ["NAN", "NONE", "-", ""]:
+        return None
+
+    if endereco_norm.replace(" ", "").isdigit():
+        return None
+
+    return endereco_norm
+
+
 class DatabaseWriter:
 
     def __init__(self, conexao):
@@ -71,76 +178,44 @@ class DatabaseWriter:
                 logging.info(f"[DEBUG SAMPLE] {values[:3]}")
 
             # -----------------------------------------------------
-            # QUERY (SEM RETURNING!)
+            # COPY -> STAGING -> MERGE (INSERT ... ON CONFLICT)
             # -----------------------------------------------------
-            query = """
-            INSERT INTO entregas (
-                cte_numero,
-                transportadora,
-                remetente_cnpj,
-                cte_rua,
-                cte_bairro,
-                cte_complemento,
-                cte_numero_endereco,  -- ← NOVO CAMPO
-                cte_cidade,
-                cte_uf,
-                cte_cep,
-                cte_nf,
-                cte_volumes,
-                cte_peso,
-                cte_tempo_atendimento_min,
-                cte_prazo_min,
-                cte_valor_nf,
-                cte_valor_frete,
-                envio_data,
-                endereco_completo,
-                remetente_nome,
-                destinatario_nome,
-                destinatario_cnpj,
-                destino_latitude,
-                destino_longitude,
-                remetente_cidade,
-                remetente_uf,
-                doc_min,
-                tenant_id,
-                geocode_source
-            )
-            VALUES %s
+            colunas_update = [c for c in COLUNAS_ENTREGAS if c not in ("cte_numero", "transportadora")]
+            valores_update = {
+                c: (
+                    "COALESCE(EXCLUDED.envio_data, entregas.envio_data)"
+                    if c == "envio_data"
+                    else f"EXCLUDED.{c}"
+                )
+                for c in colunas_update
+            }
+
+            query_merge = f"""
+            INSERT INTO entregas ({", ".join(COLUNAS_ENTREGAS)})
+            SELECT DISTINCT ON ({", ".join(CHAVE_ENTREGAS)}) {", ".join(COLUNAS_ENTREGAS)}
+            FROM staging_entregas
+            ORDER BY {", ".join(CHAVE_ENTREGAS)}, _ordem DESC
             ON CONFLICT (tenant_id, cte_numero, transportadora)
             DO UPDATE SET
-                remetente_cnpj = EXCLUDED.remetente_cnpj,
-                cte_rua = EXCLUDED.cte_rua,
-                cte_bairro = EXCLUDED.cte_bairro,
-                cte_complemento = EXCLUDED.cte_complemento,
-                cte_numero_endereco = EXCLUDED.cte_numero_endereco,  -- ← NOVO CAMPO
-                cte_cidade = EXCLUDED.cte_cidade,
-                cte_uf = EXCLUDED.cte_uf,
-                cte_cep = EXCLUDED.cte_cep,
-                cte_nf = EXCLUDED.cte_nf,
-                cte_volumes = EXCLUDED.cte_volumes,
-                cte_peso = EXCLUDED.cte_peso,
-                cte_tempo_atendimento_min = EXCLUDED.cte_tempo_atendimento_min,
-                cte_prazo_min = EXCLUDED.cte_prazo_min,
-                cte_valor_nf = EXCLUDED.cte_valor_nf,
-                cte_valor_frete = EXCLUDED.cte_valor_frete,
-                envio_data = COALESCE(EXCLUDED.envio_data, entregas.envio_data),
-                endereco_completo = EXCLUDED.endereco_completo,
-                remetente_nome = EXCLUDED.remetente_nome,
-                destinatario_nome = EXCLUDED.destinatario_nome,
-                destinatario_cnpj = EXCLUDED.destinatario_cnpj,
-                destino_latitude = EXCLUDED.destino_latitude,
-                destino_longitude = EXCLUDED.destino_longitude,
-                remetente_cidade = EXCLUDED.remetente_cidade,
-                remetente_uf = EXCLUDED.remetente_uf,
-                doc_min = EXCLUDED.doc_min,
-                tenant_id = EXCLUDED.tenant_id,
-                geocode_source = EXCLUDED.geocode_source
+                {", ".join(f"{c} = {valores_update[c]}" for c in colunas_update)}
+            WHERE ({", ".join(f"entregas.{c}" for c in colunas_update)})
+                IS DISTINCT FROM ({", ".join(valores_update[c] for c in colunas_update)})
+            RETURNING (xmax = 0) AS inserido
             """
 
             with self.conexao.cursor() as cursor:
-                execute_values(cursor, query, values)
+                self._copiar_para_staging(cursor, "staging_entregas", "entregas", COLUNAS_ENTREGAS, values)
+                cursor.execute(query_merge)
+                resultado = self._contar_merge(cursor.fetchall(), len(values))
+                cursor.execute("DROP TABLE IF EXISTS staging_entregas")
+
+            logging.info(
+                f"📊 UPSERT entregas concluído | total_processado={len(values)} | "
+                f"inseridos={resultado['inseridos']} | atualizados={resultado['atualizados']} | "
+                f"ignorados={resultado['ignorados']}"
+            )
 
-            logging.info(f"📊 UPSERT entregas concluído | total_processado={len(values)}")
+            return resultado
 
         except Exception:
             logging.error(f"❌ Erro ao inserir dados:\n{traceback.format_exc()}")
@@ -148,23 +223,11 @@ class DatabaseWriter:
 
     def inserir_localizacao(self, endereco, latitude, longitude, origem=None):
 
-        if not endereco:
-            return
-
-        endereco_norm = normalize_address(endereco)
+        endereco_norm = _endereco_para_cache(endereco)
 
         if not endereco_norm:
             return
 
-        if len(endereco_norm) < 10:
-            return
-
-        if endereco_norm in ["NAN", "NONE", "-", ""]:
-            return
-
-        if endereco_norm.replace(" ", "").isdigit():
-            return
-
         if latitude is None or longitude is None:
             return
 
@@ -198,6 +261,104 @@ class DatabaseWriter:
         except Exception as e:
             logging.error(f"❌ Erro ao inserir localização: {e}")
 
+    def inserir_localizacoes_em_lote(self, registros, enderecos_normalizados=False):
+        """
+        Grava no cache localizacoes vários endereços de uma vez (COPY + merge).
+        registros: iterável de (endereco, latitude, longitude, origem).
+        enderecos_normalizados: True quando endereco já é o addr_norm da ingestão.
+        Retorna {"inseridos", "atualizados", "ignorados"}.
+        """
+        resultado = {"inseridos": 0, "atualizados": 0, "ignorados": 0}
+
+        if self.conexao is None:
+            return resultado
+
+        linhas = []
+        for endereco, latitude, longitude, origem in registros:
+            endereco_norm = _endereco_para_cache(endereco, enderecos_normalizados)
+            if not endereco_norm or latitude is None or longitude is None:
+                resultado["ignorados"] += 1
+                continue
+            linhas.append((endereco_norm, float(latitude), float(longitude), origem))
+
+        if not linhas:
+            return resultado
+
+        query_merge = """
+        INSERT INTO localizacoes (endereco, latitude, longitude, origem, criado_em, atualizado_em)
+        SELECT DISTINCT ON (endereco) endereco, latitude, longitude, origem, NOW(), NOW()
+        FROM staging_localizacoes
+        ORDER BY endereco, _ordem DESC
+        ON CONFLICT (endereco)
+        DO UPDATE SET
+            latitude = EXCLUDED.latitude,
+            longitude = EXCLUDED.longitude,
+            origem = COALESCE(EXCLUDED.origem, localizacoes.origem),
+            atualizado_em = NOW()
+        WHERE (localizacoes.latitude, localizacoes.longitude, localizacoes.origem)
+            IS DISTINCT FROM (EXCLUDED.latitude, EXCLUDED.longitude, COALESCE(EXCLUDED.origem, localizacoes.origem))
+        RETURNING (xmax = 0) AS inserido
+        """
+
+        try:
+            with self.conexao.cursor() as cursor:
+                # savepoint: falha no cache não invalida a transação de quem chamou
+                cursor.execute("SAVEPOINT cache_localizacoes")
+                try:
+                    self._copiar_para_staging(
+                        cursor, "staging_localizacoes", "localizacoes", COLUNAS_LOCALIZACOES, linhas
+                    )
+                    cursor.execute(query_merge)
+                    merge = self._contar_merge(cursor.fetchall(), len(linhas))
+                    cursor.execute("DROP TABLE IF EXISTS staging_localizacoes")
+                    cursor.execute("RELEASE SAVEPOINT cache_localizacoes")
+                except Exception:
+                    cursor.execute("ROLLBACK TO SAVEPOINT cache_localizacoes")
+                    raise
+
+            resultado["inseridos"] = merge["inseridos"]
+            resultado["atualizados"] = merge["atualizados"]
+            resultado["ignorados"] += merge["ignorados"]
+
+            logging.info(
+                f"📊 CACHE localizacoes | inseridos={resultado['inseridos']} | "
+                f"atualizados={resultado['atualizados']} | ignorados={resultado['ignorados']}"
+            )
+
+        except Exception as e:
+            logging.error(f"❌ Erro ao inserir localizações em lote: {e}")
+
+        return resultado
+
+    def _copiar_para_staging(self, cursor, tabela_staging, tabela_destino, colunas, linhas):
+        """
+        Cria uma tabela temporária com os tipos das colunas de tabela_destino (sem defaults)
+        e carrega as linhas via COPY FROM STDIN. _ordem preserva a ordem de chegada
+        para o DISTINCT ON manter a última ocorrência de cada chave.
+        """
+        lista_colunas = ", ".join(colunas)
+
+        cursor.execute(f"DROP TABLE IF EXISTS {tabela_staging}")
+        cursor.execute(
+            f"CREATE TEMP TABLE {tabela_staging} AS "
+            f"SELECT 0::bigint AS _ordem, {lista_colunas} FROM {tabela_destino} WITH NO DATA"
+        )
+        cursor.copy_expert(
+            f"COPY {tabela_staging} (_ordem, {lista_colunas}) FROM STDIN",
+            _LeitorCopy((ordem, *linha) for ordem, linha in enumerate(linhas)),
+        )
+
+    @staticmethod
+    def _contar_merge(linhas_retornadas, total_staging):
+        inseridos = sum(1 for (inserido,) in linhas_retornadas if inserido)
+        atualizados = len(linhas_retornadas) - inseridos
+        return {
+            "inseridos": inseridos,
+            "atualizados": atualizados,
+            # duplicados no próprio lote + linhas idênticas às já gravadas
+            "ignorados": total_staging - len(linhas_retornadas),
+        }
+
     def salvar_clusterizacao(self, clustered_data):
         if self.conexao is None:
             logging.error("❌ Conexão com o banco não está ativa!")
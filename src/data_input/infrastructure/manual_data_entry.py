@@ -116,13 +116,15 @@ def montar_entregas(df: pd.DataFrame, tenant_id: str):
 
 
 def salvar_localizacoes(writer: DatabaseWriter, entregas) -> None:
-    for entrega in entregas:
-        writer.inserir_localizacao(
+    writer.inserir_localizacoes_em_lote(
+        (
             entrega.endereco_completo,
             entrega.destino_latitude,
             entrega.destino_longitude,
-            origem="manual",
+            "manual",
         )
+        for entrega in entregas
+    )
 
 
 def process_manual_data_input(input_path: str, tenant_id: str) -> dict:
@@ -0,0 +1,110 @@
+#hub_router_1.0.1/src/data_input/infrastructure/parquet_io.py
+
+import os
+import glob
+import logging
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+logger = logging.getLogger(__name__)
+
+
+def _para_tabela_arrow(df: pd.DataFrame) -> pa.Table:
+    """
+    Converte o DataFrame para Arrow. Colunas object com tipos misturados
+    (ex.: CT-e ora int, ora texto na planilha) viram texto, como o banco já as trata.
+    """
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].map(lambda v: None if pd.isna(v) else str(v))
+
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def salvar_parte_parquet(df: pd.DataFrame, diretorio: str, numero_parte: int) -> str:
+    """Grava um pedaço do arquivo de entrada como parte-NNNNN.parquet em diretorio."""
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, f"parte-{numero_parte:05d}.parquet")
+    pq.write_table(_para_tabela_arrow(df.copy()), caminho)
+    return caminho
+
+
+def listar_partes_parquet(diretorio: str) -> list:
+    """Caminhos das partes gravadas por salvar_parte_parquet, na ordem."""
+    return sorted(glob.glob(os.path.join(diretorio, "parte-*.parquet")))
+
+
+def iterar_partes_parquet(diretorio: str):
+    """Uma parte por vez (memória limitada ao tamanho de uma parte)."""
+    for caminho in listar_partes_parquet(diretorio):
+        yield pd.read_parquet(caminho)
+
+
+def ler_coluna_partes_parquet(diretorio: str, coluna: str) -> pd.Series:
+    """Só uma coluna de todas as partes (partes sem a coluna são ignoradas)."""
+    valores = [
+        pd.read_parquet(caminho, columns=[coluna])[coluna]
+        for caminho in listar_partes_parquet(diretorio)
+        if coluna in pq.read_schema(caminho).names
+    ]
+
+    if not valores:
+        return pd.Series(dtype=object)
+
+    return pd.concat(valores, ignore_index=True)
+
+
+def colunas_partes_parquet(diretorio: str) -> list:
+    """União ordenada das colunas de todas as partes (só lê os schemas)."""
+    colunas = []
+    for caminho in listar_partes_parquet(diretorio):
+        for coluna in pq.read_schema(caminho).names:
+            if coluna not in colunas:
+                colunas.append(coluna)
+    return colunas
+
+
+def salvar_parquet_em_blocos(df: pd.DataFrame, caminho: str, linhas_por_bloco: int) -> str:
+    """
+    Grava df num único Parquet com row groups de linhas_por_bloco linhas,
+    para que cada subjob leia apenas o(s) row group(s) do seu intervalo.
+    """
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    pq.write_table(
+        _para_tabela_arrow(df.copy()),
+        caminho,
+        row_group_size=max(1, int(linhas_por_bloco)),
+    )
+    return caminho
+
+
+def ler_intervalo_parquet(caminho: str, inicio: int, fim: int) -> pd.DataFrame:
+    """Lê as linhas [inicio, fim) de um Parquet, carregando só os row groups necessários."""
+    arquivo = pq.ParquetFile(caminho)
+
+    row_groups = []
+    primeira_linha = None
+    offset = 0
+
+    for i in range(arquivo.num_row_groups):
+        linhas = arquivo.metadata.row_group(i).num_rows
+        if offset + linhas > inicio and offset < fim:
+            if primeira_linha is None:
+                primeira_linha = offset
+            row_groups.append(i)
+        offset += linhas
+
+    if not row_groups:
+        return arquivo.schema_arrow.empty_table().to_pandas()
+
+    tabela = arquivo.read_row_groups(row_groups)
+    tabela = tabela.slice(inicio - primeira_linha, fim - inicio)
+
+    return tabela.to_pandas()
@@ -0,0 +1,6 @@
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- GiST (e não GIN) para permitir ORDER BY endereco <-> %s (KNN por similaridade)
+CREATE INDEX IF NOT EXISTS idx_localizacoes_endereco_trgm
+ON public.localizacoes
+USING gist (endereco gist_trgm_ops);
@@ -43,7 +43,7 @@ def main():
                 finished += 1
 
                 if job.result:
-                    total_processed += len(job.result.get("results", []))
+                    total_processed += job.result.get("total", 0)
 
         if finished == len(subjobs):
             break
@@ -8,8 +8,10 @@ import random
 import pandas as pd
 import re
 
-from data_input.utils.address_normalizer import normalize_address
+from data_input.utils.address_normalizer import normalize_address_series
 from data_input.application.geo_validator import GeoValidator
+from data_input.services.offline_geocoder import GeocodificadorOffline, confianca_suficiente
+from utils.rate_governor import obter_governador
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import logging
@@ -20,6 +22,7 @@ class GeolocationService:
     def __init__(self, reader):
         self.reader = reader
         self.validator = GeoValidator()
+        self.offline = GeocodificadorOffline(reader)
 
         self.nominatim_url = os.getenv("NOMINATIM_LOCAL_URL")
         self.google_key = os.getenv("GMAPS_API_KEY")
@@ -31,6 +34,10 @@ class GeolocationService:
         )
         self.max_retries = 2
 
+        # limite de req/s compartilhado por todos os workers (Redis)
+        self.governador_nominatim = obter_governador("nominatim")
+        self.governador_google = obter_governador("google_geocode")
+
     # ---------------------------------------------------------
     # VALIDAÇÃO NUMÉRICA
     # ---------------------------------------------------------
@@ -107,6 +114,8 @@ class GeolocationService:
         logger.info(f"[NOMINATIM][QUERY] params={params}")
         for retry_num in range(self.max_retries + 1):
             try:
+                self.governador_nominatim.aguardar()
+
                 r = requests.get(
                     f"{self.nominatim_url}/search",
                     params=params,
@@ -115,19 +124,24 @@ class GeolocationService:
                 )
 
                 if r.status_code == 429:
-                    logger.warning(f"[NOMINATIM][RATE_LIMIT] retry_num={retry_num} aguardando 2s")
-                    time.sleep(2)
+                    # o governador reduz a taxa global; a próxima tentativa já sai espaçada
+                    logger.warning(f"[NOMINATIM][RATE_LIMIT] retry_num={retry_num}")
+                    self.governador_nominatim.registrar("throttle")
                     continue
 
                 if r.status_code == 500:
                     logger.warning(f"[NOMINATIM][SERVER_ERROR] retry_num={retry_num} aguardando 1s")
+                    self.governador_nominatim.registrar("erro")
                     time.sleep(1)
                     continue
 
                 if r.status_code != 200:
                     logger.warning(f"[NOMINATIM][HTTP_{r.status_code}] params={params}")
+                    self.governador_nominatim.registrar("erro")
                     return None
 
+                self.governador_nominatim.registrar("ok")
+
                 try:
                     data = r.json()
                 except Exception as e:
@@ -154,6 +168,7 @@ class GeolocationService:
                 return lat, lon, "nominatim_structured"
 
             except requests.exceptions.Timeout:
+                self.governador_nominatim.registrar("timeout")
                 if retry_num < self.max_retries:
                     # Backoff exponencial: retry0=1s, retry1=2s, retry2=4s + jitter
                     wait = (2 ** retry_num) + random.uniform(0, 1)
@@ -200,17 +215,30 @@ class GeolocationService:
 
         for retry_num in range(self.max_retries + 1):
             try:
+                self.governador_google.aguardar()
+
                 r = requests.get(url, params=params, timeout=self.timeout)
 
                 if r.status_code != 200:
                     logger.warning(f"[GOOGLE][HTTP_{r.status_code}] retry_num={retry_num}")
+                    self.governador_google.registrar("throttle" if r.status_code == 429 else "erro")
                     if retry_num < self.max_retries:
-                        time.sleep(0.5)
+                        if r.status_code != 429:
+                            time.sleep(0.5)
                         continue
                     return None
 
                 data = r.json()
 
+                if data.get("status") == "OVER_QUERY_LIMIT":
+                    logger.warning(f"[GOOGLE][OVER_QUERY_LIMIT] retry_num={retry_num}")
+                    self.governador_google.registrar("throttle")
+                    if retry_num < self.max_retries:
+                        continue
+                    return None
+
+                self.governador_google.registrar("ok")
+
                 if data.get("status") != "OK":
                     logger.warning(f"[GOOGLE][API_ERROR] status={data.get('status')} retry_num={retry_num}")
                     if retry_num < self.max_retries:
@@ -224,6 +252,7 @@ class GeolocationService:
                 return loc["lat"], loc["lng"], "google"
 
             except requests.exceptions.Timeout:
+                self.governador_google.registrar("timeout")
                 if retry_num < self.max_retries:
                     wait = (2 ** retry_num) + random.uniform(0, 1)
                     wait = min(wait, 10)
@@ -262,22 +291,30 @@ class GeolocationService:
 
         df = df.copy()
 
-        df["addr_norm"] = df["endereco_completo"].apply(normalize_address)
+        # addr_norm já calculado na ingestão é reaproveitado (e devolvido ao chamador)
+        addr_norm_recebido = "addr_norm" in df.columns
+        if not addr_norm_recebido:
+            df["addr_norm"] = normalize_address_series(df["endereco_completo"])
 
         df_unique = df.drop_duplicates("addr_norm")
 
         results = {}
 
-        cache_batch = {}
-        for addr_norm in df_unique["addr_norm"]:
-            cached = self.reader.buscar_localizacao(addr_norm)
-            if cached:
-                cache_batch[addr_norm] = cached
+        cache_batch = self.reader.buscar_localizacoes_em_lote(
+            df_unique["addr_norm"].dropna().tolist(),
+            ja_normalizados=True,
+        )
 
         logger.info(f"[CACHE][PRELOAD] {len(cache_batch)}/{len(df_unique['addr_norm'])} hits em batch")
 
+        # camada offline (CEP / trigramas / centroide) só para quem não está no cache
+        offline_batch = self.offline.geocodificar_lote(
+            df_unique[~df_unique["addr_norm"].isin(list(cache_batch.keys()))]
+        )
+
         # métricas
         cache_hit = 0
+        offline_hit = 0
         cache_miss = 0
         nominatim_hit = 0
         google_hit = 0
@@ -310,6 +347,23 @@ class GeolocationService:
             else:
                 logger.debug(f"[CACHE][MISS] addr={addr_norm[:40]}...")
 
+            # -----------------------------------------
+            # OFFLINE (CEP / TRIGRAMAS)
+            # -----------------------------------------
+            candidato = offline_batch.get(addr_norm)
+
+            if candidato and confianca_suficiente(candidato["confianca"]):
+                lat = candidato["lat"]
+                lon = candidato["lon"]
+                uf = row.get("cte_uf")
+
+                if self.validator.validar_ponto(lat, lon, uf) == "ok":
+                    logger.debug(
+                        f"[OFFLINE][HIT] fonte={candidato['fonte']} "
+                        f"confianca={candidato['confianca']} addr={addr_norm[:40]}..."
+                    )
+                    return addr_norm, lat, lon, candidato["fonte"], "offline"
+
             # -----------------------------------------
             # NOMINATIM
             # -----------------------------------------
@@ -373,6 +427,8 @@ class GeolocationService:
                 # métricas
                 if origem == "cache_hit":
                     cache_hit += 1
+                elif origem == "offline":
+                    offline_hit += 1
                 elif origem == "nominatim":
                     nominatim_hit += 1
                 elif origem == "google":
@@ -395,10 +451,16 @@ class GeolocationService:
             lambda x: results.get(x, (None, None, None))[2]
         )
 
-        df.drop(columns=["addr_norm"], inplace=True)
+        if not addr_norm_recebido:
+            df.drop(columns=["addr_norm"], inplace=True)
 
         logger.info(
-            f"[STATS] cache={cache_hit} | nominatim={nominatim_hit} | google={google_hit} | falha={falha}"
+            f"[STATS] cache={cache_hit} | offline={offline_hit} | nominatim={nominatim_hit} | "
+            f"google={google_hit} | falha={falha}"
+        )
+        logger.info(
+            f"[RATE] nominatim={self.governador_nominatim.metricas()} | "
+            f"google={self.governador_google.metricas()}"
         )
 
         total = len(df_unique)
@@ -406,6 +468,7 @@ class GeolocationService:
             f"[GEOCODE_BATCH_END] "
             f"total={total} | "
             f"cache={cache_hit} | "
+            f"offline={offline_hit} | "
             f"nominatim={nominatim_hit} | "
             f"google={google_hit} | "
             f"falha={falha}"
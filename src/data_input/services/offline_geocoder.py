@@ -0,0 +1,211 @@
+# src/data_input/services/offline_geocoder.py
+
+import os
+import re
+import logging
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+
+from data_input.domain.municipio_polygon_validator import (
+    get_municipio_centroid,
+    pontos_dentro_municipios,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Tabela CEP -> coordenada (csv/parquet com colunas cep, latitude, longitude)
+CEP_COORDENADAS_PATH = Path(
+    os.getenv("CEP_COORDENADAS_PATH", "/app/data/cep/cep_coordenadas.csv")
+)
+
+GEOCODE_OFFLINE_FUZZY = os.getenv("GEOCODE_OFFLINE_FUZZY", "true").lower() == "true"
+GEOCODE_OFFLINE_SIM_ALTA = float(os.getenv("GEOCODE_OFFLINE_SIM_ALTA", "0.85"))
+GEOCODE_OFFLINE_SIM_MEDIA = float(os.getenv("GEOCODE_OFFLINE_SIM_MEDIA", "0.6"))
+# Confiança mínima para dispensar Nominatim/Google: alta | media | baixa
+GEOCODE_OFFLINE_CONFIANCA_MIN = os.getenv("GEOCODE_OFFLINE_CONFIANCA_MIN", "alta").lower()
+
+NIVEIS_CONFIANCA = {"baixa": 1, "media": 2, "alta": 3}
+
+
+def confianca_suficiente(confianca: str, minimo: str = None) -> bool:
+    minimo = (minimo or GEOCODE_OFFLINE_CONFIANCA_MIN).lower()
+    return NIVEIS_CONFIANCA.get(confianca, 0) >= NIVEIS_CONFIANCA.get(minimo, 3)
+
+
+def _limpar_cep(cep):
+    if cep is None or (isinstance(cep, float) and pd.isna(cep)):
+        return None
+
+    if isinstance(cep, float) and cep.is_integer():
+        cep = int(cep)
+
+    digitos = re.sub(r"\D", "", str(cep))
+
+    if not digitos or len(digitos) > 8:
+        return None
+
+    return digitos.zfill(8)
+
+
+@lru_cache(maxsize=1)
+def _carregar_tabela_cep():
+    """Retorna ({cep8: (lat, lon)}, {cep5: (lat, lon)}) — o segundo é a média do setor."""
+    if not CEP_COORDENADAS_PATH.exists():
+        logger.info(f"[OFFLINE][CEP_FILE_NOT_FOUND] {CEP_COORDENADAS_PATH}")
+        return {}, {}
+
+    try:
+        if CEP_COORDENADAS_PATH.suffix == ".parquet":
+            df = pd.read_parquet(CEP_COORDENADAS_PATH, columns=["cep", "latitude", "longitude"])
+        else:
+            df = pd.read_csv(
+                CEP_COORDENADAS_PATH,
+                usecols=["cep", "latitude", "longitude"],
+                dtype={"cep": str},
+                sep=None,
+                engine="python",
+            )
+
+        # parquet pode trazer cep numérico (sem zeros à esquerda; float se houver nulos)
+        if pd.api.types.is_numeric_dtype(df["cep"]):
+            df["cep"] = df["cep"].astype("Int64")
+        df["cep"] = df["cep"].astype("string").str.replace(r"\D", "", regex=True).str.zfill(8)
+        df["latitude"] = pd.to_numeric(df["latitude"], errors="coerce")
+        df["longitude"] = pd.to_numeric(df["longitude"], errors="coerce")
+        df = df.dropna(subset=["cep", "latitude", "longitude"])
+        df = df[df["cep"].str.len() == 8].drop_duplicates("cep")
+    except Exception as e:
+        logger.error(f"[OFFLINE][CEP_LOAD_ERROR] {e}")
+        return {}, {}
+
+    por_cep = dict(zip(df["cep"], zip(df["latitude"], df["longitude"])))
+
+    setores = df.groupby(df["cep"].str[:5])[["latitude", "longitude"]].mean()
+    por_setor = dict(zip(setores.index, zip(setores["latitude"], setores["longitude"])))
+
+    logger.info(f"[OFFLINE][CEP_LOADED] ceps={len(por_cep)} setores={len(por_setor)}")
+
+    return por_cep, por_setor
+
+
+class GeocodificadorOffline:
+    """
+    Camada local antes dos provedores de rede:
+
+    1. CEP exato da tabela local (alta; CEP genérico de município 'xxxxx-000' = baixa)
+    2. Similaridade por trigramas contra localizacoes (pg_trgm): alta/media pela similaridade
+    3. Média do setor do CEP (5 dígitos) ou centroide do município (baixa)
+
+    Candidatos alta/media fora do polígono do município são rebaixados para baixa.
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    def _candidatos_fuzzy(self, enderecos):
+        if not GEOCODE_OFFLINE_FUZZY or not enderecos:
+            return {}
+
+        try:
+            return self.reader.buscar_localizacoes_similares(enderecos, GEOCODE_OFFLINE_SIM_MEDIA)
+        except Exception as e:
+            logger.warning(f"[OFFLINE][FUZZY_INDISPONIVEL] {e}")
+            return {}
+
+    def geocodificar_lote(self, df: pd.DataFrame) -> dict:
+        """
+        df: endereços únicos com addr_norm, cte_cep, cte_cidade, cte_uf.
+        Retorna {addr_norm: {"lat", "lon", "fonte", "confianca"}} com o melhor candidato de cada endereço.
+        """
+        if df is None or df.empty:
+            return {}
+
+        por_cep, por_setor = _carregar_tabela_cep()
+        candidatos = {}
+
+        def _propor(addr_norm, lat, lon, fonte, confianca):
+            atual = candidatos.get(addr_norm)
+            if atual is None or NIVEIS_CONFIANCA[confianca] > NIVEIS_CONFIANCA[atual["confianca"]]:
+                candidatos[addr_norm] = {
+                    "lat": float(lat),
+                    "lon": float(lon),
+                    "fonte": fonte,
+                    "confianca": confianca,
+                }
+
+        linhas = df.drop_duplicates("addr_norm")
+        linhas = linhas[linhas["addr_norm"].notna()]
+        info = {}
+
+        # -----------------------------------------
+        # 1. CEP
+        # -----------------------------------------
+        for row in linhas.itertuples(index=False):
+            cep = _limpar_cep(getattr(row, "cte_cep", None))
+            info[row.addr_norm] = (getattr(row, "cte_cidade", None), getattr(row, "cte_uf", None))
+
+            if not cep:
+                continue
+
+            if cep in por_cep:
+                lat, lon = por_cep[cep]
+                confianca = "baixa" if cep.endswith("000") else "alta"
+                _propor(row.addr_norm, lat, lon, "offline_cep", confianca)
+            elif cep[:5] in por_setor:
+                lat, lon = por_setor[cep[:5]]
+                _propor(row.addr_norm, lat, lon, "offline_cep", "baixa")
+
+        # -----------------------------------------
+        # 2. TRIGRAMAS EM localizacoes
+        # -----------------------------------------
+        pendentes = [
+            addr for addr in info
+            if addr not in candidatos or candidatos[addr]["confianca"] != "alta"
+        ]
+
+        for addr_norm, similar in self._candidatos_fuzzy(pendentes).items():
+            similaridade = similar["similaridade"]
+            if similaridade >= GEOCODE_OFFLINE_SIM_ALTA:
+                confianca = "alta"
+            elif similaridade >= GEOCODE_OFFLINE_SIM_MEDIA:
+                confianca = "media"
+            else:
+                continue
+            _propor(addr_norm, similar["latitude"], similar["longitude"], "offline_fuzzy", confianca)
+
+        # -----------------------------------------
+        # 3. CENTROIDE DO MUNICÍPIO
+        # -----------------------------------------
+        for addr_norm, (cidade, uf) in info.items():
+            if addr_norm in candidatos:
+                continue
+            lat, lon = get_municipio_centroid(cidade, uf)
+            if lat is not None and lon is not None:
+                _propor(addr_norm, lat, lon, "offline_centroide", "baixa")
+
+        # -----------------------------------------
+        # PONTO PRECISA CAIR NO MUNICÍPIO INFORMADO
+        # -----------------------------------------
+        conferir = [
+            addr for addr, c in candidatos.items()
+            if c["confianca"] != "baixa"
+        ]
+
+        if conferir:
+            dentro = pontos_dentro_municipios(
+                [candidatos[a]["lat"] for a in conferir],
+                [candidatos[a]["lon"] for a in conferir],
+                [info[a][0] for a in conferir],
+                [info[a][1] for a in conferir],
+            )
+            for addr_norm, ok in zip(conferir, dentro):
+                if ok is None or not ok:
+                    candidatos[addr_norm]["confianca"] = "baixa"
+
+        contagem = pd.Series([c["confianca"] for c in candidatos.values()], dtype=object).value_counts().to_dict()
+        logger.info(f"[OFFLINE][LOTE] enderecos={len(info)} candidatos={len(candidatos)} confianca={contagem}")
+
+        return candidatos
@@ -1,17 +1,64 @@
 #hub_router_1.0.1/src/data_input/utils/address_normalizer.py
 
+import os
+import sys
+import threading
 import unicodedata
 import re
+from collections import OrderedDict
+from functools import lru_cache
 
+import pandas as pd
 
-import unicodedata
-import re
 
+ADDRESS_NORMALIZER_CACHE_SIZE = int(os.getenv("ADDRESS_NORMALIZER_CACHE_SIZE", "200000"))
 
-def normalize_address(addr: str) -> str:
+_RE_INVALIDOS = re.compile(r"[^A-Z0-9,\- ]")
+_RE_VIRGULA_DUPLICADA = re.compile(r",\s*,+")
+_RE_ESPACO_ANTES_VIRGULA = re.compile(r"\s+,")
+_RE_SEM_ESPACO_APOS_VIRGULA = re.compile(r",(\S)")
+_RE_ESPACOS = re.compile(r"\s+")
 
-    if not addr:
-        return None
+
+class _MemoLRU:
+    """Memo LRU compartilhado entre a versão unitária e a versão em lote."""
+
+    def __init__(self, max_itens: int):
+        self.max_itens = max(1, max_itens)
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave, padrao=None):
+        with self._lock:
+            if chave not in self._itens:
+                return padrao
+            self._itens.move_to_end(chave)
+            return self._itens[chave]
+
+    def registrar_varios(self, pares):
+        with self._lock:
+            for chave, valor in pares:
+                self._itens[chave] = valor
+                self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+
+_memo = _MemoLRU(ADDRESS_NORMALIZER_CACHE_SIZE)
+_AUSENTE = object()
+
+
+@lru_cache(maxsize=1)
+def _re_combinantes():
+    """Classe regex com todos os caracteres combinantes (mesmo critério de unicodedata.combining)."""
+    chars = "".join(
+        chr(c) for c in range(sys.maxunicode + 1)
+        if unicodedata.combining(chr(c))
+    )
+    return "[" + re.escape(chars) + "]"
+
+
+def _normalizar(addr: str) -> str:
 
     addr = str(addr).strip()
 
@@ -26,18 +73,98 @@ def normalize_address(addr: str) -> str:
     addr = addr.replace(" BRASIL", "")
 
     # mantém vírgula, hífen e número
-    addr = re.sub(r"[^A-Z0-9,\- ]", " ", addr)
+    addr = _RE_INVALIDOS.sub(" ", addr)
 
     # 🔥 remove vírgula duplicada
-    addr = re.sub(r",\s*,+", ",", addr)
+    addr = _RE_VIRGULA_DUPLICADA.sub(",", addr)
 
     # 🔥 remove espaço antes da vírgula
-    addr = re.sub(r"\s+,", ",", addr)
+    addr = _RE_ESPACO_ANTES_VIRGULA.sub(",", addr)
 
     # 🔥 garante espaço após vírgula
-    addr = re.sub(r",(\S)", r", \1", addr)
+    addr = _RE_SEM_ESPACO_APOS_VIRGULA.sub(r", \1", addr)
 
     # normaliza espaços
-    addr = re.sub(r"\s+", " ", addr).strip()
+    addr = _RE_ESPACOS.sub(" ", addr).strip()
+
+    return addr
+
+
+def normalize_address(addr: str) -> str:
+
+    if not addr:
+        return None
 
-    return addr
\ No newline at end of file
+    addr = str(addr)
+
+    normalizado = _memo.obter(addr, _AUSENTE)
+    if normalizado is _AUSENTE:
+        normalizado = _normalizar(addr)
+        _memo.registrar_varios([(addr, normalizado)])
+
+    return normalizado
+
+
+def _normalizar_series(valores: pd.Series) -> pd.Series:
+    """Mesmas regras de _normalizar, com operações vetorizadas do pandas (.str)."""
+    return (
+        valores.str.strip()
+        .str.normalize("NFKD")
+        .str.replace(_re_combinantes(), "", regex=True)
+        .str.upper()
+        .str.replace(" BRASIL", "", regex=False)
+        .str.replace(_RE_INVALIDOS.pattern, " ", regex=True)
+        .str.replace(_RE_VIRGULA_DUPLICADA.pattern, ",", regex=True)
+        .str.replace(_RE_ESPACO_ANTES_VIRGULA.pattern, ",", regex=True)
+        .str.replace(_RE_SEM_ESPACO_APOS_VIRGULA.pattern, r", \1", regex=True)
+        .str.replace(_RE_ESPACOS.pattern, " ", regex=True)
+        .str.strip()
+    )
+
+
+def normalize_address_series(enderecos: pd.Series) -> pd.Series:
+    """
+    Versão em lote de normalize_address: normaliza cada endereço distinto uma única vez
+    (reaproveitando o memo LRU) e devolve a Series alinhada ao índice de entrada.
+    """
+    if enderecos.empty:
+        return pd.Series([], index=enderecos.index, dtype=object)
+
+    codigos, distintos = pd.factorize(enderecos, use_na_sentinel=True)
+
+    resultado = [None] * len(distintos)
+    pendentes_pos = []
+    pendentes_txt = []
+
+    for pos, valor in enumerate(distintos):
+        try:
+            vazio = not valor
+        except (TypeError, ValueError):
+            vazio = False
+
+        if vazio:
+            continue
+
+        texto = str(valor)
+        normalizado = _memo.obter(texto, _AUSENTE)
+
+        if normalizado is _AUSENTE:
+            pendentes_pos.append(pos)
+            pendentes_txt.append(texto)
+        else:
+            resultado[pos] = normalizado
+
+    if pendentes_txt:
+        normalizados = _normalizar_series(pd.Series(pendentes_txt, dtype=object)).tolist()
+        for pos, normalizado in zip(pendentes_pos, normalizados):
+            resultado[pos] = normalizado
+        _memo.registrar_varios(zip(pendentes_txt, normalizados))
+
+    # NaN/None ficam com código -1 -> None (como "if not addr" na versão unitária)
+    resultado.append(None)
+
+    return pd.Series(
+        [resultado[c] for c in codigos],
+        index=enderecos.index,
+        dtype=object,
+    )
@@ -1,11 +1,16 @@
 # hub_router/src/data_input/workers/data_input_job.py
 
 import os
+import json
 import time
+import shutil
 import logging
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
+import xlsxwriter
+from collections import Counter
 from redis import Redis
 from rq import get_current_job
 from rq.job import Job
@@ -14,11 +19,57 @@ from data_input.application.data_input_distributed_use_case import DataInputDist
 from data_input.application.validation_service import ValidationService
 from data_input.domain.entities import Entrega
 from data_input.infrastructure.database_writer import DatabaseWriter
-from data_input.utils.address_normalizer import normalize_address
+from data_input.infrastructure.parquet_io import (
+    colunas_partes_parquet,
+    iterar_partes_parquet,
+    ler_coluna_partes_parquet,
+    listar_partes_parquet,
+    salvar_parte_parquet,
+)
+from data_input.workers.data_input_subjob import chave_resultado_subjob
+from data_input.utils.address_normalizer import normalize_address, normalize_address_series
 from data_input.infrastructure.db_connection import get_connection_context
 
 logger = logging.getLogger(__name__)
 
+# Prioridade de fonte na consolidação (determinístico)
+PRIORIDADE_GEOCODE = {
+    "google": 3,
+    "nominatim_structured": 2,
+    "nominatim": 1,
+    "offline_cep": 1,
+    "offline_fuzzy": 1,
+    "offline_centroide": 0,
+    "cache": 0,
+    "falha": -1,
+}
+
+SUBJOB_BLPOP_TIMEOUT_SEC = int(os.getenv("DATA_INPUT_SUBJOB_BLPOP_TIMEOUT_SEC", "5"))
+
+
+def _mesclar_resultados_geocode(geo_map, results):
+    """
+    Mescla o resultado de um chunk no mapa addr_norm -> geocode,
+    mantendo a fonte de maior prioridade. O chunk pode ser descartado em seguida.
+    """
+    for r in results:
+        addr_norm = r.get("addr_norm") or normalize_address(r.get("endereco_completo"))
+        if not addr_norm:
+            continue
+
+        prioridade = PRIORIDADE_GEOCODE.get(r.get("geocode_source"), 0)
+        atual = geo_map.get(addr_norm)
+        if atual is not None and atual["priority"] >= prioridade:
+            continue
+
+        geo_map[addr_norm] = {
+            "destino_latitude": r.get("destino_latitude"),
+            "destino_longitude": r.get("destino_longitude"),
+            "geocode_source": r.get("geocode_source"),
+            "priority": prioridade,
+        }
+
+
 def salvar_historico(
     tenant_id,
     job_id,
@@ -80,14 +131,13 @@ def _persistir_entregas_validas(df_valid: pd.DataFrame):
         records = df_valid.astype(object).where(pd.notna(df_valid), None).to_dict("records")
         entregas = [Entrega(**r) for r in records]
 
-        writer.inserir_dados_entregas(entregas)
+        resultado = writer.inserir_dados_entregas(entregas)
         writer.atualizar_data_processamento_lote(entregas)
 
-        logger.info(f"✅ Entregas persistidas: {len(entregas)}")
+        logger.info(f"✅ Entregas persistidas: {len(entregas)} | {resultado}")
 
 def persistir_cache_localizacoes(df, writer):
 
-    from data_input.utils.address_normalizer import normalize_address
     import logging
 
     if df is None or df.empty:
@@ -96,7 +146,15 @@ def persistir_cache_localizacoes(df, writer):
 
     df = df.copy()
 
-    df["addr_norm"] = df["endereco_completo"].apply(normalize_address)
+    # addr_norm vem da ingestão; só calcula se faltar
+    if "addr_norm" not in df.columns:
+        df["addr_norm"] = normalize_address_series(df["endereco_completo"])
+    else:
+        faltantes = df["addr_norm"].isna() & df["endereco_completo"].notna()
+        if faltantes.any():
+            df.loc[faltantes, "addr_norm"] = normalize_address_series(
+                df.loc[faltantes, "endereco_completo"]
+            )
 
     df = df[
         [
@@ -116,415 +174,467 @@ def persistir_cache_localizacoes(df, writer):
 
     logging.info(f"📊 CACHE | persistindo={len(df)} registros")
 
-    for row in df.itertuples():
-
-        endereco = row.addr_norm
-        lat = row.destino_latitude
-        lon = row.destino_longitude
-        origem = row.geocode_source
+    return writer.inserir_localizacoes_em_lote(
+        zip(
+            df["addr_norm"],
+            df["destino_latitude"],
+            df["destino_longitude"],
+            df["geocode_source"].str.lower(),
+        ),
+        enderecos_normalizados=True,
+    )
 
-        if not endereco or lat is None or lon is None:
-            continue
+DEFAULT_LIMITE_PESO = 15000  # kg
 
-        writer.inserir_localizacao(
-            endereco,
-            float(lat),
-            float(lon),
-            origem.lower()
-        )
+# 🔒 limite de segurança (evita travar front)
+MAX_PONTOS_MAPA = 3000
 
-def processar_data_input(
-    tenant_id,
-    file_path,
-    modo_forcar=False,
-    limite_peso_kg=None
-):
-    import os
-    import time
-    import pandas as pd
-    from redis import Redis
-    from rq.job import Job
-    from rq import get_current_job
+FONTES_CACHE_LOCALIZACOES = [
+    "cache",
+    "nominatim",
+    "nominatim_structured",
+    "google",
+    "google_override",
+]
 
-    job = get_current_job()
 
-    logger.info(f"🚀 Data Input distribuído iniciado | tenant={tenant_id}")
+def _aplicar_geocode(df: pd.DataFrame, geo_map: dict) -> pd.DataFrame:
+    """Aplica o mapa addr_norm -> geocode numa parte do upload (map ao invés de merge)."""
 
-    preprocessed_path = None
+    # garante chave normalizada
+    if "addr_norm" not in df.columns:
+        df["addr_norm"] = normalize_address_series(df["endereco_completo"])
 
-    try:
-        # ---------------------------------------------------------
-        # PREP + DISTRIBUIÇÃO
-        # ---------------------------------------------------------
-        use_case = DataInputDistributedUseCase(tenant_id)
-        orchestrator = use_case.execute(file_path)
+    if geo_map:
 
-        preprocessed_path = orchestrator["preprocessed_path"]
-        subjobs = orchestrator["subjobs"]
-        total_linhas = orchestrator["total_linhas"]
-        total_enderecos_unicos = orchestrator["total_enderecos_unicos"]
+        df["destino_latitude"] = df["addr_norm"].map(
+            lambda x: geo_map.get(x, {}).get("destino_latitude")
+        )
 
-        logger.info(
-            f"📦 Subjobs criados: {len(subjobs)} | linhas={total_linhas} | únicos={total_enderecos_unicos}"
+        df["destino_longitude"] = df["addr_norm"].map(
+            lambda x: geo_map.get(x, {}).get("destino_longitude")
         )
 
-        # ---------------------------------------------------------
-        # 🔥 AGUARDA SUBJOBS (RETRY-SAFE + FETCH MANY)
-        # ---------------------------------------------------------
-        redis_conn = Redis(host="redis", port=6379)
+        df["geocode_source"] = df["addr_norm"].map(
+            lambda x: geo_map.get(x, {}).get("geocode_source", "falha")
+        )
 
-        timeout_segundos = max(900, len(subjobs) * 180)
+    else:
+        df["destino_latitude"] = None
+        df["destino_longitude"] = None
+        df["geocode_source"] = "falha"
 
-        start_time = time.time()
-        processed_jobs = set()
-        results_by_chunk = {}
-        last_status = {}
+    # 🔥 PROTEÇÃO EXTRA (evita lixo)
+    df["destino_latitude"] = pd.to_numeric(df["destino_latitude"], errors="coerce")
+    df["destino_longitude"] = pd.to_numeric(df["destino_longitude"], errors="coerce")
 
-        while True:
+    return df
 
-            if time.time() - start_time > timeout_segundos:
-                raise Exception(
-                    f"⏰ Timeout aguardando subjobs | timeout={timeout_segundos}s"
-                )
 
-            finished = 0
+def _aplicar_limite_peso(df_valid: pd.DataFrame, df_invalid: pd.DataFrame, limite_peso_kg):
+    """Move para os inválidos as entregas com cte_peso acima de limite_peso_kg."""
 
-            jobs = Job.fetch_many(subjobs, connection=redis_conn)
+    if "cte_peso" not in df_valid.columns or df_valid.empty:
+        logger.warning("⚠ Coluna cte_peso ausente ou df_valid vazio")
+        return df_valid, df_invalid
 
-            for j in jobs:
+    # -------------------------------------------------
+    # 🔍 DEBUG PESO
+    # -------------------------------------------------
+    df_valid = df_valid.copy()
 
-                jid = j.id
-                status = j.get_status()
+    df_valid["cte_peso_raw"] = df_valid["cte_peso"]
+    df_valid["cte_peso"] = pd.to_numeric(df_valid["cte_peso"], errors="coerce")
 
-                # log só quando muda (evita spam)
-                if last_status.get(jid) != status:
-                    logger.info(f"🔍 Subjob {jid} status={status}")
-                    last_status[jid] = status
+    logger.info("📊 PESO DEBUG:")
+    logger.info(df_valid["cte_peso"].describe())
 
-                if j.is_finished:
-                    finished += 1
+    logger.info(
+        f"📊 PESO AMOSTRA:\n{df_valid[['cte_numero','cte_peso_raw','cte_peso']].head(10)}"
+    )
 
-                    if jid not in processed_jobs:
-                        processed_jobs.add(jid)
+    # -------------------------------------------------
+    # 🔥 FILTRO
+    # -------------------------------------------------
+    df_peso_excedido = df_valid[df_valid["cte_peso"] > limite_peso_kg]
 
-                        if j.result and isinstance(j.result, dict):
-                            chunk_id = j.result.get("chunk_id")
-                            results = j.result.get("results", [])
+    logger.info(f"📊 Registros acima do limite: {len(df_peso_excedido)}")
 
-                            # 🔒 evita duplicação por retry
-                            results_by_chunk[chunk_id] = results
+    if df_peso_excedido.empty:
+        return df_valid, df_invalid
 
-                elif j.is_failed:
-                    raise Exception(f"❌ Subjob {jid} falhou")
+    logger.warning(
+        f"⚠ Excedidos (sample):\n"
+        f"{df_peso_excedido[['cte_numero','cte_peso_raw','cte_peso']].head(10)}"
+    )
 
-            progress = int((finished / len(subjobs)) * 70) if subjobs else 70
+    df_peso_excedido = df_peso_excedido.copy()
+    df_peso_excedido["motivo"] = f"Peso acima do limite ({limite_peso_kg} kg)"
 
-            if job:
-                job.meta["progress"] = progress
-                job.meta["step"] = f"Geocodificando ({finished}/{len(subjobs)})"
-                job.save_meta()
+    # 🔥 CONSOLIDA INVALIDOS
+    if isinstance(df_invalid, pd.DataFrame) and not df_invalid.empty:
+        df_invalid = pd.concat([df_invalid, df_peso_excedido], ignore_index=True)
+    else:
+        df_invalid = df_peso_excedido.copy()
 
-            if finished == len(subjobs):
-                break
+    # 🔥 REMOVE DOS VALIDOS
+    return df_valid[df_valid["cte_peso"] <= limite_peso_kg], df_invalid
 
-            time.sleep(0.2)
 
-        # ---------------------------------------------------------
-        # 🔥 CONSOLIDA RESULTADOS (ORDENADO)
-        # ---------------------------------------------------------
-        logger.info("🔗 Consolidando resultados de geocode")
+def _reprocessar_invalidos(df_valid: pd.DataFrame, df_invalid: pd.DataFrame):
+    """Tenta recuperar os inválidos por geocode (ReprocessInvalidsService)."""
+    from data_input.application.reprocess_invalids_service import ReprocessInvalidsService
+    from data_input.infrastructure.database_reader import DatabaseReader
+    from data_input.application.geocode_batch_service import GeocodeBatchService
 
-        geocode_results = []
+    logger.info(f"♻ Iniciando reprocessamento de inválidos: {len(df_invalid)}")
 
-        for chunk_id in sorted(results_by_chunk.keys()):
-            geocode_results.extend(results_by_chunk[chunk_id])
+    if df_invalid.empty:
+        return df_valid, df_invalid
 
-        df_geo = pd.DataFrame(geocode_results)
+    with get_connection_context() as conn:
 
-        if not df_geo.empty:
+        reader = DatabaseReader(conn)
+        writer = DatabaseWriter(conn)
 
-            # -----------------------------------------------------
-            # NORMALIZA CHAVE
-            # -----------------------------------------------------
-            df_geo["addr_norm"] = df_geo["endereco_completo"].apply(normalize_address)
+        geo = GeocodeBatchService(reader)
 
-            # -----------------------------------------------------
-            # 🔥 PRIORIDADE DE FONTE (DETERMINÍSTICO)
-            # -----------------------------------------------------
-            priority = {
-                "google": 3,
-                "nominatim_structured": 2,
-                "nominatim": 1,
-                "cache": 0,
-                "falha": -1,
-            }
+        reprocessor = ReprocessInvalidsService(
+            geolocation_service=geo,
+            database_writer=writer
+        )
 
-            df_geo["priority"] = df_geo["geocode_source"].map(priority).fillna(0)
+        df_recuperados, df_invalid = reprocessor.execute(df_invalid)
 
-            df_geo = (
-                df_geo
-                .sort_values("priority", ascending=False)
-                .drop_duplicates(subset=["addr_norm"], keep="first")
-                .drop(columns=["priority"])
-                .reset_index(drop=True)
-            )
+    if not df_recuperados.empty:
+        logger.info(f"♻ Recuperados: {len(df_recuperados)}")
+        df_valid = pd.concat([df_valid, df_recuperados], ignore_index=True)
+    else:
+        logger.info("♻ Nenhum inválido recuperado")
 
-        # ---------------------------------------------------------
-        # 🔥 CARREGA DATAFRAME ORIGINAL
-        # ---------------------------------------------------------
-        df = pd.read_pickle(preprocessed_path)
+    return df_valid, df_invalid
 
-        # garante chave normalizada
-        if "addr_norm" not in df.columns:
-            df["addr_norm"] = df["endereco_completo"].apply(normalize_address)
 
-        # ---------------------------------------------------------
-        # 🔥 APLICA GEOCODE (MAP AO INVÉS DE MERGE)
-        # ---------------------------------------------------------
-        if not df_geo.empty:
+def _persistir_cache_validos(df_valid: pd.DataFrame):
+    """Grava em cache_localizacoes os geocodes das entregas válidas (só fontes confiáveis)."""
 
-            # cria dicionário para lookup rápido
-            geo_map = df_geo.set_index("addr_norm").to_dict(orient="index")
+    with get_connection_context() as conn:
 
-            df["destino_latitude"] = df["addr_norm"].map(
-                lambda x: geo_map.get(x, {}).get("destino_latitude")
-            )
+        writer_cache = DatabaseWriter(conn)
 
-            df["destino_longitude"] = df["addr_norm"].map(
-                lambda x: geo_map.get(x, {}).get("destino_longitude")
-            )
+        df_cache_novo = df_valid[
+            df_valid["geocode_source"].isin(FONTES_CACHE_LOCALIZACOES)
+        ].copy()
 
-            df["geocode_source"] = df["addr_norm"].map(
-                lambda x: geo_map.get(x, {}).get("geocode_source", "falha")
-            )
+        df_cache_novo["geocode_source_norm"] = (
+            df_cache_novo["geocode_source"]
+            .fillna("")
+            .astype(str)
+            .str.strip()
+            .str.lower()
+        )
 
-        else:
-            df["destino_latitude"] = None
-            df["destino_longitude"] = None
-            df["geocode_source"] = "falha"
+        df_cache_novo = df_cache_novo[
+            df_cache_novo["destino_latitude"].notna() &
+            df_cache_novo["destino_longitude"].notna()
+        ]
 
-        # ---------------------------------------------------------
-        # 🔥 PROTEÇÃO EXTRA (evita lixo)
-        # ---------------------------------------------------------
-        df["destino_latitude"] = pd.to_numeric(df["destino_latitude"], errors="coerce")
-        df["destino_longitude"] = pd.to_numeric(df["destino_longitude"], errors="coerce")
+        logger.info(
+            f"📊 CACHE DEBUG | candidatos_para_cache={len(df_cache_novo)} | "
+            f"sources={df_cache_novo['geocode_source_norm'].value_counts(dropna=False).to_dict()}"
+        )
 
-        # ---------------------------------------------------------
-        # LOG DE SOURCES (debug forte)
-        # ---------------------------------------------------------
-        if "geocode_source" in df.columns:
-            logger.info(
-                f"📊 GEO SOURCES: {df['geocode_source'].value_counts(dropna=False).to_dict()}"
-            )
+        persistir_cache_localizacoes(df_cache_novo, writer_cache)
 
-        # ---------------------------------------------------------
-        # VALIDAÇÃO FINAL
-        # ---------------------------------------------------------
-        if job:
-            job.meta["progress"] = 80
-            job.meta["step"] = "Validando dados"
-            job.save_meta()
 
-        validator = ValidationService()
-        df_valid, df_invalid = validator.execute(df)
+def _limpar_datas(tenant_id, datas):
+    """OVERWRITE POR DATA (modo_forcar): remove as entregas já gravadas nessas datas."""
 
-        # ---------------------------------------------------------
-        # 🔥 REGRA DE LIMITE DE PESO (COM DEFAULT)
-        # ---------------------------------------------------------
-        DEFAULT_LIMITE_PESO = 15000  # kg
+    logger.warning(f"🔥 modo_forcar ativo | limpando datas: {datas}")
 
-        if limite_peso_kg is None:
-            limite_peso_kg = DEFAULT_LIMITE_PESO
-            logger.info(f"⚖ Limite de peso não informado. Usando default: {limite_peso_kg} kg")
-        else:
-            logger.info(f"⚖ Limite de peso informado: {limite_peso_kg} kg")
+    with get_connection_context() as conn:
+        with conn.cursor() as cur:
 
-        if "cte_peso" in df_valid.columns and not df_valid.empty:
+            placeholders = ",".join(["%s"] * len(datas))
 
-            # -------------------------------------------------
-            # 🔍 DEBUG PESO
-            # -------------------------------------------------
-            df_valid = df_valid.copy()
+            query = f"""
+                DELETE FROM entregas
+                WHERE tenant_id = %s
+                AND envio_data IN ({placeholders})
+            """
 
-            df_valid["cte_peso_raw"] = df_valid["cte_peso"]
-            df_valid["cte_peso"] = pd.to_numeric(df_valid["cte_peso"], errors="coerce")
+            cur.execute(query, (tenant_id, *datas))
+            conn.commit()
 
-            logger.info("📊 PESO DEBUG:")
-            logger.info(df_valid["cte_peso"].describe())
+    logger.info(f"🧹 Dados antigos removidos | datas={len(datas)}")
 
-            logger.info(
-                f"📊 PESO AMOSTRA:\n{df_valid[['cte_numero','cte_peso_raw','cte_peso']].head(10)}"
-            )
 
-            # -------------------------------------------------
-            # 🔥 FILTRO
-            # -------------------------------------------------
-            df_peso_excedido = df_valid[df_valid["cte_peso"] > limite_peso_kg]
+def _amostrar_pontos_mapa(amostra, df_valid: pd.DataFrame, rng):
+    """
+    Amostra uniforme de até MAX_PONTOS_MAPA entregas válidas, acumulada parte a parte:
+    cada linha recebe um sorteio e ficam os menores.
+    """
+    colunas = [
+        c for c in (
+            "destino_latitude", "destino_longitude", "cte_cidade",
+            "setor", "endereco_completo", "cte_numero",
+        )
+        if c in df_valid.columns
+    ]
+    if "destino_latitude" not in colunas or "destino_longitude" not in colunas:
+        return amostra
 
-            logger.info(f"📊 Registros acima do limite: {len(df_peso_excedido)}")
+    candidatos = df_valid[colunas].copy()
 
-            if not df_peso_excedido.empty:
+    # garante numérico
+    candidatos["destino_latitude"] = pd.to_numeric(candidatos["destino_latitude"], errors="coerce")
+    candidatos["destino_longitude"] = pd.to_numeric(candidatos["destino_longitude"], errors="coerce")
 
-                logger.warning(
-                    f"⚠ Excedidos (sample):\n"
-                    f"{df_peso_excedido[['cte_numero','cte_peso_raw','cte_peso']].head(10)}"
-                )
+    candidatos = candidatos[
+        candidatos["destino_latitude"].notna() &
+        candidatos["destino_longitude"].notna()
+    ]
+    candidatos["_sorteio"] = rng.random(len(candidatos))
+
+    if amostra is not None:
+        candidatos = pd.concat([amostra, candidatos], ignore_index=True)
+
+    return candidatos.nsmallest(MAX_PONTOS_MAPA, "_sorteio")
+
+
+def _pontos_mapa(amostra) -> list:
+    if amostra is None:
+        return []
+
+    pontos_mapa = []
+
+    for row in amostra.itertuples():
+        pontos_mapa.append({
+            "lat": float(row.destino_latitude),
+            "lon": float(row.destino_longitude),
+            "cidade": None if pd.isna(getattr(row, "cte_cidade", None)) else getattr(row, "cte_cidade", None),
+            "setor": None if pd.isna(getattr(row, "setor", None)) else getattr(row, "setor", None),
+            "endereco": None if pd.isna(getattr(row, "endereco_completo", None)) else getattr(row, "endereco_completo", None),
+            "cte": None if pd.isna(getattr(row, "cte_numero", None)) else getattr(row, "cte_numero", None),
+        })
+
+    return pontos_mapa
+
+
+def _salvar_excel_saida(output_path: str, abas: dict):
+    """
+    Monta o Excel de saída a partir das partes Parquet de cada aba ({aba: diretório}),
+    uma parte por vez: xlsxwriter em constant_memory grava cada linha direto no disco.
+    """
+    opcoes = {
+        "constant_memory": True,
+        "nan_inf_to_errors": True,
+        "remove_timezone": True,
+        "default_date_format": "yyyy-mm-dd hh:mm:ss",
+    }
+
+    with xlsxwriter.Workbook(output_path, opcoes) as workbook:
+        for aba, diretorio in abas.items():
+            colunas = colunas_partes_parquet(diretorio)
+            planilha = workbook.add_worksheet(aba)
+            planilha.write_row(0, 0, colunas)
+
+            linha = 1
+            for df in iterar_partes_parquet(diretorio):
+                df = df.reindex(columns=colunas)
+                for valores in df.astype(object).where(pd.notna(df), None).itertuples(index=False, name=None):
+                    planilha.write_row(linha, 0, valores)
+                    linha += 1
 
-                df_peso_excedido = df_peso_excedido.copy()
-                df_peso_excedido["motivo"] = f"Peso acima do limite ({limite_peso_kg} kg)"
+def processar_data_input(
+    tenant_id,
+    file_path,
+    modo_forcar=False,
+    limite_peso_kg=None
+):
+    import os
+    import time
+    import pandas as pd
+    from redis import Redis
+    from rq.job import Job
+    from rq import get_current_job
 
-                # -------------------------------------------------
-                # 🔥 CONSOLIDA INVALIDOS
-                # -------------------------------------------------
-                if isinstance(df_invalid, pd.DataFrame) and not df_invalid.empty:
-                    df_invalid = pd.concat([df_invalid, df_peso_excedido], ignore_index=True)
-                else:
-                    df_invalid = df_peso_excedido.copy()
+    job = get_current_job()
 
-                # -------------------------------------------------
-                # 🔥 REMOVE DOS VALIDOS
-                # -------------------------------------------------
-                df_valid = df_valid[df_valid["cte_peso"] <= limite_peso_kg]
+    logger.info(f"🚀 Data Input distribuído iniciado | tenant={tenant_id}")
 
-        else:
-            logger.warning("⚠ Coluna cte_peso ausente ou df_valid vazio")
+    preprocessed_path = None
+    run_dir = None
 
+    try:
         # ---------------------------------------------------------
-        # 🔥 GARANTE CONSISTÊNCIA FINAL
+        # PREP + DISTRIBUIÇÃO
         # ---------------------------------------------------------
-        df_valid = df_valid.reset_index(drop=True)
-        df_invalid = df_invalid.reset_index(drop=True) if df_invalid is not None else pd.DataFrame()
-        if not df_invalid.empty and "motivo" not in df_invalid.columns:
-            df_invalid["motivo"] = "Erro de validação"
+        use_case = DataInputDistributedUseCase(tenant_id)
+        orchestrator = use_case.execute(file_path)
+
+        preprocessed_path = orchestrator["preprocessed_path"]
+        run_dir = orchestrator.get("run_dir")
+        subjobs = orchestrator["subjobs"]
+        total_linhas = orchestrator["total_linhas"]
+        total_enderecos_unicos = orchestrator["total_enderecos_unicos"]
+
+        cache_results = orchestrator.get("cache_results", [])
+
+        logger.info(
+            f"📦 Subjobs criados: {len(subjobs)} | linhas={total_linhas} | únicos={total_enderecos_unicos} | "
+            f"resolvidos_cache={len(cache_results)}"
+        )
 
         # ---------------------------------------------------------
-        # 🔥 REPROCESSAMENTO DE INVALIDOS (NOVO)
+        # 🔥 AGUARDA SUBJOBS (CANAL DE CONCLUSÃO + MERGE INCREMENTAL)
         # ---------------------------------------------------------
-        from data_input.application.reprocess_invalids_service import ReprocessInvalidsService
-        from data_input.infrastructure.database_reader import DatabaseReader
-        from data_input.application.geocode_batch_service import GeocodeBatchService
+        redis_conn = Redis(host="redis", port=6379)
+        completion_key = orchestrator["completion_key"]
 
-        logger.info(f"♻ Iniciando reprocessamento de inválidos: {len(df_invalid)}")
+        timeout_segundos = max(900, len(subjobs) * 180)
 
-        if not df_invalid.empty:
+        start_time = time.time()
+        pendentes = set(subjobs)
+        geo_map = {}
 
-            with get_connection_context() as conn:
+        # cache primeiro: fontes externas dos subjobs têm prioridade maior
+        _mesclar_resultados_geocode(geo_map, cache_results)
 
-                reader = DatabaseReader(conn)
-                writer = DatabaseWriter(conn)
+        def _ler_resultados_subjob(jid):
+            chave = chave_resultado_subjob(completion_key, jid)
+            bruto = redis_conn.get(chave)
+            if bruto is None:
+                raise Exception(f"❌ Resultados do subjob {jid} expiraram antes da leitura")
+            redis_conn.delete(chave)
+            return json.loads(bruto)
 
-                geo = GeocodeBatchService(reader)
+        def _consumir_subjob(jid, results):
+            _mesclar_resultados_geocode(geo_map, results or [])
+            pendentes.discard(jid)
 
-                reprocessor = ReprocessInvalidsService(
-                    geolocation_service=geo,
-                    database_writer=writer
-                )
+            finished = len(subjobs) - len(pendentes)
+            logger.info(f"🔍 Subjob {jid} concluído ({finished}/{len(subjobs)})")
 
-                df_recuperados, df_invalid = reprocessor.execute(df_invalid)
+            if job:
+                job.meta["progress"] = int((finished / len(subjobs)) * 70)
+                job.meta["step"] = f"Geocodificando ({finished}/{len(subjobs)})"
+                job.save_meta()
 
-                if not df_recuperados.empty:
-                    logger.info(f"♻ Recuperados: {len(df_recuperados)}")
+        while pendentes:
 
-                    df_valid = pd.concat([df_valid, df_recuperados], ignore_index=True)
+            if time.time() - start_time > timeout_segundos:
+                raise Exception(
+                    f"⏰ Timeout aguardando subjobs | timeout={timeout_segundos}s"
+                )
 
-                else:
-                    logger.info("♻ Nenhum inválido recuperado")
+            item = redis_conn.blpop(completion_key, timeout=SUBJOB_BLPOP_TIMEOUT_SEC)
 
-        # -----------------------------------------
-        # CACHE (SÓ VALIDOS)
-        # -----------------------------------------
-        with get_connection_context() as conn:
+            if item is None:
+                # rede de segurança: subjob que terminou sem notificar (ex.: worker morto)
+                for j in Job.fetch_many(list(pendentes), connection=redis_conn):
+                    if j is None:
+                        continue
+                    if j.is_failed:
+                        raise Exception(f"❌ Subjob {j.id} falhou")
+                    if j.is_finished:
+                        _consumir_subjob(j.id, _ler_resultados_subjob(j.id))
+                continue
 
-            writer_cache = DatabaseWriter(conn)
-
-            df_cache_novo = df_valid[
-                df_valid["geocode_source"].isin([
-                    "cache",
-                    "nominatim",
-                    "nominatim_structured",
-                    "google",
-                    "google_override"
-                ])
-            ].copy()
-
-            df_cache_novo["geocode_source_norm"] = (
-                df_cache_novo["geocode_source"]
-                .fillna("")
-                .astype(str)
-                .str.strip()
-                .str.lower()
-            )
+            mensagem = json.loads(item[1])
+            jid = mensagem.get("job_id")
 
-            df_cache_novo = df_cache_novo[
-                df_cache_novo["destino_latitude"].notna() &
-                df_cache_novo["destino_longitude"].notna()
-            ]
+            # 🔒 evita duplicação por retry
+            if jid not in pendentes:
+                continue
 
-            logger.info(
-                f"📊 CACHE DEBUG | candidatos_para_cache={len(df_cache_novo)} | "
-                f"sources={df_cache_novo['geocode_source_norm'].value_counts(dropna=False).to_dict()}"
-            )
+            if mensagem.get("status") == "failed":
+                raise Exception(f"❌ Subjob {jid} falhou")
 
-            persistir_cache_localizacoes(df_cache_novo, writer_cache)
+            _consumir_subjob(jid, _ler_resultados_subjob(jid))
 
-        # -----------------------------------------
-        # LOG FINAL DE VALIDAÇÃO
-        # -----------------------------------------
-        total_valid = len(df_valid)
-        total_invalid = len(df_invalid)
-        total = total_valid + total_invalid
-
-        logger.info(
-            f"📊 Validação concluída | total={total} | validos={total_valid} | invalidos={total_invalid}"
-        )
+        redis_conn.delete(completion_key)
 
         # ---------------------------------------------------------
-        # OVERWRITE POR DATA (modo_forcar)
+        # 🔥 PARTE A PARTE: GEOCODE -> VALIDAÇÃO -> PERSISTÊNCIA
+        # (o upload inteiro nunca fica em memória de uma vez)
         # ---------------------------------------------------------
-        if modo_forcar and not df_valid.empty:
+        if limite_peso_kg is None:
+            limite_peso_kg = DEFAULT_LIMITE_PESO
+            logger.info(f"⚖ Limite de peso não informado. Usando default: {limite_peso_kg} kg")
+        else:
+            logger.info(f"⚖ Limite de peso informado: {limite_peso_kg} kg")
 
-            datas = list(df_valid["envio_data"].dropna().unique())
+        # duplicidade de CT-e é do upload inteiro: só a coluna é lida de todas as partes
+        ctes = ler_coluna_partes_parquet(preprocessed_path, "cte_numero")
+        cte_duplicados = set(ctes[ctes.duplicated()].tolist())
+        del ctes
 
-            logger.warning(f"🔥 modo_forcar ativo | limpando datas: {datas}")
+        saida_validos = os.path.join(run_dir, "saida", "validos")
+        saida_invalidos = os.path.join(run_dir, "saida", "invalidos")
 
-            with get_connection_context() as conn:
-                with conn.cursor() as cur:
+        validator = ValidationService()
+        partes = listar_partes_parquet(preprocessed_path)
+        fontes = Counter()
+        datas_limpas = set()
+        amostra_mapa = None
+        rng_mapa = np.random.default_rng(42)
+        total_valid = 0
+        total_invalid = 0
 
-                    placeholders = ",".join(["%s"] * len(datas))
+        for numero_parte, caminho_parte in enumerate(partes):
 
-                    query = f"""
-                        DELETE FROM entregas
-                        WHERE tenant_id = %s
-                        AND envio_data IN ({placeholders})
-                    """
+            if job:
+                job.meta["progress"] = 70 + int((numero_parte / len(partes)) * 20)
+                job.meta["step"] = f"Validando e persistindo ({numero_parte + 1}/{len(partes)})"
+                job.save_meta()
 
-                    cur.execute(query, (tenant_id, *datas))
-                    conn.commit()
+            df = _aplicar_geocode(pd.read_parquet(caminho_parte), geo_map)
+            fontes.update(df["geocode_source"].value_counts(dropna=False).to_dict())
 
-            logger.info(f"🧹 Dados antigos removidos | datas={len(datas)}")
+            df_valid, df_invalid = validator.execute(df, cte_duplicados=cte_duplicados)
+            del df
 
-        # ---------------------------------------------------------
-        # PERSISTÊNCIA FINAL (SÓ VALIDOS)
-        # ---------------------------------------------------------
-        if job:
-            job.meta["progress"] = 90
-            job.meta["step"] = "Persistindo entregas válidas"
-            job.save_meta()
+            df_valid, df_invalid = _aplicar_limite_peso(df_valid, df_invalid, limite_peso_kg)
 
-        # -----------------------------------------
-        # DEBUG CRÍTICO
-        # -----------------------------------------
-        logger.info(f"[DEBUG] df_valid linhas: {len(df_valid)}")
+            df_valid = df_valid.reset_index(drop=True)
+            df_invalid = df_invalid.reset_index(drop=True) if df_invalid is not None else pd.DataFrame()
+            if not df_invalid.empty and "motivo" not in df_invalid.columns:
+                df_invalid["motivo"] = "Erro de validação"
 
-        if "cte_numero" in df_valid.columns:
-            logger.info(f"[DEBUG] ctes únicos: {df_valid['cte_numero'].nunique()}")
-        else:
-            logger.warning("[DEBUG] coluna cte_numero NÃO encontrada")
+            df_valid, df_invalid = _reprocessar_invalidos(df_valid, df_invalid)
 
-        # -----------------------------------------
-        # PERSISTÊNCIA DE ENTREGAS
-        # -----------------------------------------
-        _persistir_entregas_validas(df_valid)
+            _persistir_cache_validos(df_valid)
+
+            # modo_forcar: cada data é limpa uma vez, antes da primeira parte que a grava
+            if modo_forcar and not df_valid.empty:
+                datas = set(df_valid["envio_data"].dropna().unique()) - datas_limpas
+                if datas:
+                    _limpar_datas(tenant_id, sorted(datas))
+                    datas_limpas |= datas
+
+            logger.info(
+                f"[DEBUG] parte {numero_parte + 1}/{len(partes)} | df_valid linhas: {len(df_valid)} | "
+                f"invalidos: {len(df_invalid)}"
+            )
+
+            _persistir_entregas_validas(df_valid)
+
+            total_valid += len(df_valid)
+            total_invalid += len(df_invalid)
+
+            # saída (Excel) e mapa também são montados parte a parte
+            salvar_parte_parquet(df_valid, saida_validos, numero_parte)
+            salvar_parte_parquet(df_invalid, saida_invalidos, numero_parte)
+            amostra_mapa = _amostrar_pontos_mapa(amostra_mapa, df_valid, rng_mapa)
+
+        logger.info(f"📊 GEO SOURCES: {dict(fontes)}")
+
+        total = total_valid + total_invalid
+
+        logger.info(
+            f"📊 Validação concluída | total={total} | validos={total_valid} | invalidos={total_invalid}"
+        )
 
         # ---------------------------------------------------------
         # HISTÓRICO
@@ -543,17 +653,6 @@ def processar_data_input(
 
         logger.info("✅ Data Input distribuído concluído com sucesso")
 
-        # -----------------------------------------
-        # 🔥 PREPARA DATAFRAMES PARA OUTPUT
-        # -----------------------------------------
-
-        df_valid_output = df_valid.copy()
-        df_invalid_output = df_invalid.copy()
-
-        # garante motivo nos inválidos
-        if not df_invalid_output.empty and "motivo" not in df_invalid_output.columns:
-            df_invalid_output["motivo"] = "Erro de validação"
-
         # -----------------------------------------
         # 🔥 SALVA EXCEL COMPLETO
         # -----------------------------------------
@@ -563,43 +662,14 @@ def processar_data_input(
 
         output_path = os.path.join(output_dir, f"{job.id}.xlsx")
 
-        with pd.ExcelWriter(output_path) as writer:
-            df_valid_output.to_excel(writer, sheet_name="validos", index=False)
-            df_invalid_output.to_excel(writer, sheet_name="invalidos", index=False)
+        _salvar_excel_saida(output_path, {"validos": saida_validos, "invalidos": saida_invalidos})
 
         logger.info(f"📁 OUTPUT COMPLETO salvo em: {output_path}")
 
         # -----------------------------------------
         # 🔥 PREPARA PONTOS PARA MAPA (FRONTEND)
         # -----------------------------------------
-        df_map = df_valid.copy()
-
-        # garante numérico
-        df_map["destino_latitude"] = pd.to_numeric(df_map["destino_latitude"], errors="coerce")
-        df_map["destino_longitude"] = pd.to_numeric(df_map["destino_longitude"], errors="coerce")
-
-        # filtra válidos
-        df_map = df_map[
-            df_map["destino_latitude"].notna() &
-            df_map["destino_longitude"].notna()
-        ]
-
-        # 🔒 limite de segurança (evita travar front)
-        MAX_PONTOS = 3000
-        if len(df_map) > MAX_PONTOS:
-            df_map = df_map.sample(MAX_PONTOS, random_state=42)
-
-        pontos_mapa = []
-
-        for row in df_map.itertuples():
-            pontos_mapa.append({
-                "lat": float(row.destino_latitude),
-                "lon": float(row.destino_longitude),
-                "cidade": None if pd.isna(getattr(row, "cte_cidade", None)) else getattr(row, "cte_cidade", None),
-                "setor": None if pd.isna(getattr(row, "setor", None)) else getattr(row, "setor", None),
-                "endereco": None if pd.isna(getattr(row, "endereco_completo", None)) else getattr(row, "endereco_completo", None),
-                "cte": None if pd.isna(getattr(row, "cte_numero", None)) else getattr(row, "cte_numero", None),
-            })
+        pontos_mapa = _pontos_mapa(amostra_mapa)
 
         logger.info(f"🗺️ Pontos para mapa preparados: {len(pontos_mapa)}")
 
@@ -660,8 +730,8 @@ def processar_data_input(
 
     finally:
         try:
-            if preprocessed_path and os.path.exists(preprocessed_path):
-                os.remove(preprocessed_path)
-                logger.info(f"🧹 Arquivo temporário removido: {preprocessed_path}")
+            if run_dir and os.path.exists(run_dir):
+                shutil.rmtree(run_dir)
+                logger.info(f"🧹 Arquivos temporários removidos: {run_dir}")
         except Exception as e:
             logger.warning(f"⚠ Não foi possível remover arquivo temporário: {e}")
\ No newline at end of file
@@ -1,18 +1,65 @@
 #hub_router_1.0.1/src/data_input/workers/data_input_subjob.py
 
+import os
+import json
 import logging
 import pandas as pd
 
+from redis import Redis
 from rq import get_current_job
 
 from data_input.infrastructure.db import Database
 from data_input.infrastructure.database_reader import DatabaseReader
 from data_input.infrastructure.database_writer import DatabaseWriter
+from data_input.infrastructure.parquet_io import ler_intervalo_parquet
 from data_input.application.geocode_batch_service import GeocodeBatchService
 
 
 logger = logging.getLogger(__name__)
 
+COMPLETION_KEY_TTL_SEC = 86400
+# Resultados do chunk ficam numa chave própria até o job pai ler (e apagar)
+SUBJOB_RESULTADO_TTL_SEC = int(os.getenv("DATA_INPUT_SUBJOB_RESULTADO_TTL_SEC", "3600"))
+
+
+def chave_resultado_subjob(completion_key: str, job_id: str) -> str:
+    return f"{completion_key}:resultado:{job_id}"
+
+
+def _notificar_conclusao(job, payload: dict, status: str, results: list = None):
+    """
+    Avisa o job pai pela lista de conclusão (BLPOP) — sem polling de status.
+    Os resultados do chunk vão para chave_resultado_subjob com TTL curto; a mensagem
+    e o retorno do RQ (guardado por result_ttl) levam só o resumo.
+    """
+    completion_key = payload.get("completion_key")
+    if not completion_key or not job:
+        return
+
+    try:
+        redis_conn = job.connection or Redis(host="redis", port=6379)
+        mensagem = json.dumps({
+            "job_id": job.id,
+            "chunk_id": payload.get("chunk_id"),
+            "status": status,
+        })
+        pipe = redis_conn.pipeline()
+        if status == "finished":
+            pipe.set(
+                chave_resultado_subjob(completion_key, job.id),
+                json.dumps(results or []),
+                ex=SUBJOB_RESULTADO_TTL_SEC,
+            )
+        pipe.rpush(completion_key, mensagem)
+        pipe.expire(completion_key, COMPLETION_KEY_TTL_SEC)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"⚠ Falha ao notificar conclusão do subjob: {e}")
+
+
+def _resumo(chunk_id, total: int) -> dict:
+    return {"status": "finished", "chunk_id": chunk_id, "total": total}
+
 
 def processar_subjob(payload: dict):
     """
@@ -27,21 +74,22 @@ def processar_subjob(payload: dict):
     try:
         chunk_id = payload["chunk_id"]
         tenant_id = payload["tenant_id"]
-        data = payload["data"]
+
+        if "path" in payload:
+            # payload leve: o chunk é lido do Parquet no volume compartilhado
+            df = ler_intervalo_parquet(payload["path"], payload["inicio"], payload["fim"])
+        else:
+            # compatibilidade com subjobs enfileirados no formato antigo
+            df = pd.DataFrame(payload.get("data", []))
 
         logger.info(
-            f"🚀 Subjob iniciado | chunk_id={chunk_id} | tenant={tenant_id} | linhas={len(data)}"
+            f"🚀 Subjob iniciado | chunk_id={chunk_id} | tenant={tenant_id} | linhas={len(df)}"
         )
 
-        df = pd.DataFrame(data)
-
         if df.empty:
             logger.info(f"⚠ Subjob {chunk_id} recebeu chunk vazio")
-            return {
-                "chunk_id": chunk_id,
-                "processed": 0,
-                "results": [],
-            }
+            _notificar_conclusao(job, payload, "finished", [])
+            return _resumo(chunk_id, 0)
 
         db = Database()
         db.conectar()
@@ -55,14 +103,18 @@ def processar_subjob(payload: dict):
         # geocode_batch já usa endereco_completo / addr_norm / cache / nominatim / google
         df = geo.execute(df)
 
-        resultado = df[
-            [
-                "endereco_completo",
-                "destino_latitude",
-                "destino_longitude",
-                "geocode_source",
-            ]
-        ].copy()
+        colunas_resultado = [
+            "endereco_completo",
+            "destino_latitude",
+            "destino_longitude",
+            "geocode_source",
+        ]
+
+        # devolve a chave normalizada para o job pai não recalcular
+        if "addr_norm" in df.columns:
+            colunas_resultado.insert(0, "addr_norm")
+
+        resultado = df[colunas_resultado].copy()
 
         # garante serialização segura
         resultado = resultado.astype(object).where(pd.notna(resultado), None)
@@ -76,14 +128,12 @@ def processar_subjob(payload: dict):
             f"✅ Subjob finalizado | chunk_id={chunk_id} | processados={len(resultado)}"
         )
 
-        return {
-            "chunk_id": chunk_id,
-            "processed": len(resultado),
-            "results": resultado.to_dict(orient="records"),
-        }
+        _notificar_conclusao(job, payload, "finished", resultado.to_dict(orient="records"))
+        return _resumo(chunk_id, len(resultado))
 
     except Exception as e:
         logger.error(f"❌ Erro no subjob: {e}", exc_info=True)
+        _notificar_conclusao(job, payload, "failed")
         raise
 
     finally:
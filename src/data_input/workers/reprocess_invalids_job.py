@@ -0,0 +1,195 @@
+# hub_router/src/data_input/workers/reprocess_invalids_job.py
+
+import os
+import logging
+
+import pandas as pd
+from rq import get_current_job
+
+from data_input.application.geocode_batch_service import GeocodeBatchService
+from data_input.application.reprocess_invalids_service import ReprocessInvalidsService
+from data_input.application.validation_service import ValidationService
+from data_input.infrastructure.database_reader import DatabaseReader
+from data_input.infrastructure.database_writer import DatabaseWriter
+from data_input.infrastructure.db_connection import get_connection_context
+from data_input.utils.address_normalizer import normalize_address_series
+from data_input.workers.data_input_job import (
+    DEFAULT_LIMITE_PESO,
+    _aplicar_limite_peso,
+    _persistir_entregas_validas,
+    persistir_cache_localizacoes,
+    salvar_historico,
+)
+
+logger = logging.getLogger(__name__)
+
+# Só motivos que podem mudar sem o cliente corrigir a planilha
+MOTIVOS_REPROCESSAVEIS = {"geocode_falha", "fora_uf", "fora_municipio"}
+
+# Fontes externas que vale gravar em localizacoes
+FONTES_CACHEAVEIS = {"nominatim", "nominatim_structured", "google", "google_override"}
+
+# Colunas derivadas da validação anterior (recalculadas agora)
+COLUNAS_VALIDACAO = [
+    "motivo_invalidade",
+    "motivo",
+    "valido_municipio",
+    "cidade_norm",
+    "uf_norm",
+    "status_validacao",
+]
+
+
+def _caminho_output(tenant_id: str, job_id: str) -> str:
+    base_path = os.getenv("DATA_INPUT_PATH", "/app/src/data_input")
+    return os.path.join(base_path, "tenants", tenant_id, "output", f"{job_id}.xlsx")
+
+
+def _atualizar_progresso(job, progresso: int, etapa: str):
+    if job:
+        job.meta["progress"] = progresso
+        job.meta["step"] = etapa
+        job.save_meta()
+
+
+def reprocessar_invalidos_incremental(tenant_id, job_id_origem, usar_fallback=True, limite_peso_kg=None):
+    """
+    Reprocessa apenas os inválidos de um upload anterior cujo motivo pode mudar
+    (geocode_falha / fora_uf / fora_municipio):
+
+    1. geocode em lote cache-first (cache -> offline -> Nominatim/Google) só desses endereços
+    2. validação (UF + polígono do município) só dessas linhas
+    3. opcional: cascata Google direto / centroide do ReprocessInvalidsService
+    4. regra de limite de peso, como no processar_data_input
+    5. upsert apenas das entregas recuperadas e atualização do Excel de saída
+    """
+    job = get_current_job()
+
+    if limite_peso_kg is None:
+        limite_peso_kg = DEFAULT_LIMITE_PESO
+
+    output_path = _caminho_output(tenant_id, job_id_origem)
+
+    if not os.path.exists(output_path):
+        raise FileNotFoundError(f"Resultado do job {job_id_origem} não encontrado: {output_path}")
+
+    logger.info(f"♻ Reprocessamento incremental iniciado | tenant={tenant_id} | job_origem={job_id_origem}")
+
+    df_valid_anterior = pd.read_excel(output_path, sheet_name="validos")
+    df_invalid_anterior = pd.read_excel(output_path, sheet_name="invalidos")
+
+    if df_invalid_anterior.empty or "motivo_invalidade" not in df_invalid_anterior.columns:
+        logger.info("♻ Nenhum inválido reprocessável")
+        return {"status": "done", "reprocessados": 0, "recuperados": 0}
+
+    mask_reprocessavel = df_invalid_anterior["motivo_invalidade"].isin(MOTIVOS_REPROCESSAVEIS)
+
+    df_alvo = df_invalid_anterior[mask_reprocessavel].copy()
+    df_fixos = df_invalid_anterior[~mask_reprocessavel].copy()
+
+    logger.info(
+        f"♻ Inválidos={len(df_invalid_anterior)} | reprocessáveis={len(df_alvo)} | "
+        f"mantidos={len(df_fixos)}"
+    )
+
+    if df_alvo.empty:
+        return {"status": "done", "reprocessados": 0, "recuperados": 0}
+
+    # -----------------------------------------
+    # 1. GEOCODE CACHE-FIRST (SÓ OS ALVOS)
+    # -----------------------------------------
+    _atualizar_progresso(job, 20, f"Geocodificando {len(df_alvo)} inválidos")
+
+    df_alvo = df_alvo.drop(columns=[c for c in COLUNAS_VALIDACAO if c in df_alvo.columns])
+    df_alvo["addr_norm"] = normalize_address_series(df_alvo["endereco_completo"])
+
+    with get_connection_context() as conn:
+        reader = DatabaseReader(conn)
+        geo = GeocodeBatchService(reader)
+        df_alvo = geo.execute(df_alvo)
+
+    df_alvo["destino_latitude"] = pd.to_numeric(df_alvo["destino_latitude"], errors="coerce")
+    df_alvo["destino_longitude"] = pd.to_numeric(df_alvo["destino_longitude"], errors="coerce")
+
+    # -----------------------------------------
+    # 2. VALIDAÇÃO (UF + POLÍGONO)
+    # -----------------------------------------
+    _atualizar_progresso(job, 60, "Validando")
+
+    df_recuperados, df_ainda_invalidos = ValidationService().execute(df_alvo)
+
+    # -----------------------------------------
+    # 3. CASCATA DE FALLBACK (OPCIONAL)
+    # -----------------------------------------
+    if usar_fallback and not df_ainda_invalidos.empty:
+        with get_connection_context() as conn:
+            reprocessor = ReprocessInvalidsService(
+                geolocation_service=geo,
+                database_writer=DatabaseWriter(conn),
+            )
+            df_recuperados_fallback, df_ainda_invalidos = reprocessor.execute(df_ainda_invalidos)
+
+        if not df_recuperados_fallback.empty:
+            df_recuperados = pd.concat([df_recuperados, df_recuperados_fallback], ignore_index=True)
+
+    # -----------------------------------------
+    # 4. LIMITE DE PESO (mesma regra do upload)
+    # -----------------------------------------
+    df_recuperados, df_ainda_invalidos = _aplicar_limite_peso(
+        df_recuperados, df_ainda_invalidos, limite_peso_kg
+    )
+
+    logger.info(
+        f"♻ Recuperados={len(df_recuperados)} | ainda inválidos={len(df_ainda_invalidos)}"
+    )
+
+    # -----------------------------------------
+    # 5. UPSERT SÓ DAS RECUPERADAS
+    # -----------------------------------------
+    _atualizar_progresso(job, 85, "Persistindo entregas recuperadas")
+
+    if not df_recuperados.empty:
+        df_cache_novo = df_recuperados[
+            df_recuperados["geocode_source"].isin(FONTES_CACHEAVEIS)
+            & df_recuperados["destino_latitude"].notna()
+            & df_recuperados["destino_longitude"].notna()
+        ]
+        with get_connection_context() as conn:
+            persistir_cache_localizacoes(df_cache_novo, DatabaseWriter(conn))
+
+        _persistir_entregas_validas(df_recuperados)
+
+    # -----------------------------------------
+    # EXCEL DE SAÍDA ATUALIZADO
+    # -----------------------------------------
+    df_valid_saida = pd.concat([df_valid_anterior, df_recuperados], ignore_index=True)
+    df_invalid_saida = pd.concat([df_fixos, df_ainda_invalidos], ignore_index=True)
+
+    with pd.ExcelWriter(output_path) as writer:
+        df_valid_saida.to_excel(writer, sheet_name="validos", index=False)
+        df_invalid_saida.to_excel(writer, sheet_name="invalidos", index=False)
+
+    salvar_historico(
+        tenant_id=tenant_id,
+        job_id=job.id if job else None,
+        status="done",
+        arquivo=os.path.basename(output_path),
+        total=len(df_alvo),
+        validos=len(df_recuperados),
+        invalidos=len(df_ainda_invalidos),
+        mensagem=f"Reprocessamento incremental do job {job_id_origem}",
+        tipo_processamento="reprocessamento_incremental",
+    )
+
+    _atualizar_progresso(job, 100, "Concluído")
+
+    logger.info("✅ Reprocessamento incremental concluído")
+
+    return {
+        "status": "done",
+        "tenant_id": tenant_id,
+        "job_id_origem": job_id_origem,
+        "reprocessados": len(df_alvo),
+        "recuperados": len(df_recuperados),
+        "invalidos": len(df_ainda_invalidos),
+    }
@@ -1,29 +1,26 @@
 #last_mile_routing/infrastructure/osrm_service.py
 
-import requests
+from utils.routing_http_client import obter_cliente_roteamento
 
 class OSRMRouteService:
-    def __init__(self, osrm_url="http://osrm:5000"):
+    def __init__(self, osrm_url="http://osrm:5000", timeout=None):
         self.osrm_url = osrm_url.rstrip("/")
+        # None = timeout do host em ROUTING_HTTP_TIMEOUTS_POR_HOST (ou o padrão do cliente)
+        self.timeout = timeout
 
-    def consultar_rota(self, origem, destino):
-        """
-        Consulta rota no OSRM.
-        origem, destino: (lat, lon)
-        Retorna: lista de coordenadas [{"lat": ..., "lon": ...}], distancia_km, tempo_min
-        """
+    def _requisicao(self, origem, destino):
+        coords = f"{origem[1]},{origem[0]};{destino[1]},{destino[0]}"
+        url = f"{self.osrm_url}/route/v1/driving/{coords}"
+        params = {
+            "overview": "full",
+            "geometries": "geojson"
+        }
+        return url, params
+
+    @staticmethod
+    def _interpretar(status, data):
         try:
-            coords = f"{origem[1]},{origem[0]};{destino[1]},{destino[0]}"
-            url = f"{self.osrm_url}/route/v1/driving/{coords}"
-            params = {
-                "overview": "full",
-                "geometries": "geojson"
-            }
-            r = requests.get(url, params=params, timeout=5)
-            r.raise_for_status()
-            data = r.json()
-
-            if not data.get("routes"):
+            if status != 200 or not data or not data.get("routes"):
                 return [], 0, 0
 
             route = data["routes"][0]
@@ -38,3 +35,28 @@ class OSRMRouteService:
         except Exception as e:
             print(f"❌ Erro no OSRM: {e}")
             return [], 0, 0
+
+    def consultar_rota(self, origem, destino):
+        """
+        Consulta rota no OSRM.
+        origem, destino: (lat, lon)
+        Retorna: lista de coordenadas [{"lat": ..., "lon": ...}], distancia_km, tempo_min
+        """
+        try:
+            url, params = self._requisicao(origem, destino)
+        except Exception as e:
+            print(f"❌ Erro no OSRM: {e}")
+            return [], 0, 0
+
+        status, data = obter_cliente_roteamento().get_json_sync(url, params=params, timeout=self.timeout)
+        return self._interpretar(status, data)
+
+    def consultar_rotas(self, pares):
+        """
+        Consulta várias rotas em paralelo pelo cliente compartilhado.
+        pares: [(origem, destino), ...]
+        Retorna: lista de (coordenadas, distancia_km, tempo_min) na mesma ordem
+        """
+        requisicoes = [self._requisicao(origem, destino) for origem, destino in pares]
+        respostas = obter_cliente_roteamento().get_json_varios_sync(requisicoes, timeout=self.timeout)
+        return [self._interpretar(status, data) for status, data in respostas]
@@ -2,9 +2,12 @@
 # hub_router_1.0.1/src/simulation/application/simulation_use_case.py
 
 import os
+import json
+import math
 import uuid
+import multiprocessing
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from simulation.utils.path_builder import build_output_path
 
 from simulation.visualization.plot_simulation_cluster import \
@@ -36,6 +39,8 @@ from simulation.infrastructure.simulation_database_connection import (
     conectar_clusterization_db,
     conectar_simulation_db,
 )
+from simulation.infrastructure.cache_routes import obter_rotas_detalhadas_em_lote
+from simulation.infrastructure.cache_rotas_execucao import CacheRotasExecucao
 from simulation.domain.data_cleaner_service import DataCleanerService
 from simulation.visualization.gerar_graficos_custos_simulacao import \
     gerar_graficos_custos_por_envio
@@ -47,6 +52,59 @@ from simulation.utils.export_entregas_excel import \
 from simulation.domain.entities import SimulationParams
 from simulation.domain.strategy_resolver import resolver_estrategia
 from simulation.domain.simulation_service import SimulationService
+from simulation.logs.simulation_logger import configurar_logger
+
+# spawn evita herdar threads/conexões do worker RQ; "fork" pode ser usado via env
+SIMULATION_K_POOL_START_METHOD = os.getenv("SIMULATION_K_POOL_START_METHOD", "spawn")
+
+# Limite de candidatos de k quando a busca é adaptativa (a exaustiva mantém 20)
+SIMULATION_K_MAX_CENARIOS_ADAPTATIVO = int(os.getenv("SIMULATION_K_MAX_CENARIOS_ADAPTATIVO", "200"))
+
+# Estado de cada processo do pool de cenários k (criado uma vez por processo)
+_processo_k = {}
+
+
+def _inicializar_processo_k(contexto):
+    """Abre as conexões do processo e monta um SimulationUseCase próprio, com o cache semeado pelo pai."""
+    logger = configurar_logger(contexto["logger_nome"])
+    simulation_db = conectar_simulation_db()
+    clusterization_db = conectar_clusterization_db()
+
+    use_case = SimulationUseCase(
+        tenant_id=contexto["tenant_id"],
+        envio_data=contexto["envio_data"],
+        simulation_db=simulation_db,
+        clusterization_db=clusterization_db,
+        logger=logger,
+        params=contexto["params"],
+        modo_forcar=contexto["modo_forcar"],
+        simulation_id=contexto["simulation_id"],
+        permitir_rotas_excedentes=contexto["permitir_rotas_excedentes"],
+        hub_id=contexto["hub_id"],
+    )
+    use_case.cache_rotas_execucao.importar(contexto["cache_rotas"])
+    use_case.cluster_service.importar_cache_kmeans(contexto.get("cache_kmeans"))
+
+    _processo_k["use_case"] = use_case
+    _processo_k["chaves_semeadas"] = {chave for chave, _ in contexto["cache_rotas"].get("itens", [])}
+
+
+def _executar_cenario_k_em_processo(k, df_entregas, df_hub):
+    use_case = _processo_k["use_case"]
+    use_case.cenarios_invalidados = []
+
+    resultado = use_case._executar_simulacao_para_k(k, df_entregas, df_hub, None)
+
+    # Devolve ao pai apenas os trechos novos do cache
+    snapshot = use_case.cache_rotas_execucao.exportar()
+    chaves_semeadas = _processo_k["chaves_semeadas"]
+    snapshot["itens"] = [item for item in snapshot["itens"] if item[0] not in chaves_semeadas]
+
+    return {
+        "resultado": resultado,
+        "cenarios_invalidados": list(use_case.cenarios_invalidados),
+        "cache_rotas": snapshot,
+    }
 
 
 class SimulationUseCase:
@@ -105,6 +163,11 @@ class SimulationUseCase:
 
         # cenários inválidos
         self.cenarios_invalidados = []
+        # cenários pulados pela busca adaptativa de k
+        self.cenarios_nao_avaliados = []
+
+        # 🔥 cache de rotas compartilhado por k=0 e todos os k desta execução
+        self.cache_rotas_execucao = CacheRotasExecucao(tenant_id, logger=logger)
 
         # 🔥 SERVICES PADRONIZADOS (SEM ADAPTER)
 
@@ -130,7 +193,8 @@ class SimulationUseCase:
             logger=logger,
             params=self.params,  # 🔥 aqui muda tudo
             envio_data=envio_data,
-            permitir_rotas_excedentes=permitir_rotas_excedentes
+            permitir_rotas_excedentes=permitir_rotas_excedentes,
+            cache_execucao=self.cache_rotas_execucao,
         )
 
         self.transfer_service = TransferRoutingService(
@@ -139,7 +203,8 @@ class SimulationUseCase:
             logger=logger,
             tenant_id=tenant_id,
             params=self.params,  # 🔥 aqui também
-            hub_id=hub_id
+            hub_id=hub_id,
+            cache_execucao=self.cache_rotas_execucao,
         )
 
         self.cost_last_mile_service = CostLastMileService(
@@ -222,6 +287,13 @@ class SimulationUseCase:
             f"🚫 Cenário {self._formatar_k_clusters(k)} invalidado: {motivo}{sufixo_detalhes}"
         )
 
+    def _registrar_cenario_nao_avaliado(self, k, motivo):
+        self.cenarios_nao_avaliados.append({
+            "k_clusters": k,
+            "status": "nao_avaliado",
+            "motivo": motivo,
+        })
+
     @staticmethod
     def _todas_rotas_sem_metrica_osrm(fontes_metricas):
         fontes = [fonte for fonte in fontes_metricas if fonte is not None]
@@ -246,6 +318,7 @@ class SimulationUseCase:
                 params=self.params,
                 envio_data=self.envio_data,
                 permitir_rotas_excedentes=self.permitir_rotas_excedentes,
+                cache_execucao=self.cache_rotas_execucao,
             )
             cost_last_mile_service = CostLastMileService(
                 simulation_db,
@@ -885,7 +958,7 @@ class SimulationUseCase:
 
             # Carrega tarifas de veículos
             from simulation.infrastructure.simulation_database_reader import carregar_tarifas_last_mile
-            from simulation.infrastructure.cache_routes import obter_rota_last_mile
+            from simulation.infrastructure.cache_routes import obter_metricas_rota
             from last_mile_routing.domain.routing_utils import alocar_veiculo
 
 
@@ -915,7 +988,12 @@ class SimulationUseCase:
                 coords = [(float(hub.latitude), float(hub.longitude))]
                 coords += list(zip(df_rota["latitude"], df_rota["longitude"]))
 
-                sequencia_coord = []
+                incluir_geometria = self.last_mile_service.incluir_geometria
+                # Modo só métricas: persiste os vértices (hub → entregas → hub)
+                sequencia_coord = [] if incluir_geometria else [
+                    {"lat": float(lat), "lon": float(lon)}
+                    for lat, lon in coords + [coords[0]]
+                ]
                 distancia_total = 0.0
                 tempo_total = 0.0
 
@@ -928,13 +1006,14 @@ class SimulationUseCase:
                     destino = coords[i + 1]
 
                     try:
-                        dist_km, tempo_min, rota_completa = obter_rota_last_mile(
+                        dist_km, tempo_min, rota_completa, _ = obter_metricas_rota(
                             origem,
                             destino,
                             self.tenant_id,
                             self.simulation_db,
-                            self.simulation_db,
-                            self.logger
+                            self.logger,
+                            incluir_geometria=incluir_geometria,
+                            cache_execucao=self.cache_rotas_execucao,
                         )
                     except Exception as e:
                         self.logger.warning(f"⚠️ Erro OSRM rota {rota_id}: {e}")
@@ -969,7 +1048,9 @@ class SimulationUseCase:
                         tempo_total += tempo_atendimento
 
                     # 🔥 GEOMETRIA
-                    if rota_completa and isinstance(rota_completa, list):
+                    if not incluir_geometria:
+                        pass
+                    elif rota_completa and isinstance(rota_completa, list):
                         try:
                             sequencia_coord.extend([
                                 {"lat": float(p["lat"]), "lon": float(p["lon"])}
@@ -997,13 +1078,14 @@ class SimulationUseCase:
                 destino = coords[0]
 
                 try:
-                    dist_km, tempo_min, _ = obter_rota_last_mile(
+                    dist_km, tempo_min, _, _ = obter_metricas_rota(
                         origem,
                         destino,
                         self.tenant_id,
                         self.simulation_db,
-                        self.simulation_db,
-                        self.logger
+                        self.logger,
+                        incluir_geometria=False,
+                        cache_execucao=self.cache_rotas_execucao,
                     )
                 except Exception as e:
                     self.logger.warning(f"⚠️ Erro OSRM retorno rota {rota_id}: {e}")
@@ -1264,6 +1346,174 @@ class SimulationUseCase:
             self.simulation_db.rollback()
             raise
 
+    def _gerar_mapas_cenario(self, k_clusters):
+        if k_clusters != 0:
+            try:
+                plotar_mapa_clusterizacao_simulation(
+                    simulation_db=self.simulation_db,
+                    clusterization_db=self.clusterization_db,
+                    tenant_id=self.tenant_id,
+                    envio_data=self.envio_data,
+                    k_clusters=k_clusters,
+                    modo_forcar=self.modo_forcar,
+                    logger=self.logger
+                )
+            except Exception as e:
+                self.logger.warning(f"⚠️ Erro mapa cluster: {e}")
+
+            try:
+                plotar_mapa_transferencias(
+                    simulation_db=self.simulation_db,
+                    tenant_id=self.tenant_id,
+                    envio_data=self.envio_data,
+                    k_clusters=k_clusters,
+                    modo_forcar=self.modo_forcar,
+                    logger=self.logger
+                )
+            except Exception as e:
+                self.logger.warning(f"⚠️ Erro mapa transfer: {e}")
+
+        try:
+            plotar_mapa_last_mile(
+                simulation_db=self.simulation_db,
+                clusterization_db=self.clusterization_db,
+                tenant_id=self.tenant_id,
+                envio_data=self.envio_data,
+                k_clusters=k_clusters,
+                modo_forcar=self.modo_forcar,
+                logger=self.logger
+            )
+            self.logger.info(f"🗺️ Mapa last-mile (k={k_clusters}) gerado com sucesso")
+        except Exception as e:
+            self.logger.warning(f"⚠️ Erro mapa last-mile: {e}")
+
+    @staticmethod
+    def _extrair_vertices_rota(raw):
+        if raw is None:
+            return []
+        if isinstance(raw, str):
+            try:
+                raw = json.loads(raw)
+            except Exception:
+                return []
+
+        vertices = []
+        for ponto in raw or []:
+            try:
+                if isinstance(ponto, dict):
+                    coord = (float(ponto["lat"]), float(ponto["lon"]))
+                else:
+                    coord = (float(ponto[0]), float(ponto[1]))
+            except Exception:
+                continue
+            if not vertices or vertices[-1] != coord:
+                vertices.append(coord)
+        return vertices
+
+    def _tracar_rota_por_vertices(self, vertices):
+        sequencia = []
+        trechos = list(zip(vertices, vertices[1:]))
+        resultados = obter_rotas_detalhadas_em_lote(
+            trechos,
+            self.tenant_id,
+            self.simulation_db,
+            self.logger,
+            self.params.velocidade_kmh,
+            cache_execucao=self.cache_rotas_execucao,
+        )
+        for (origem, destino), (_, _, rota_completa, _) in zip(trechos, resultados):
+            if rota_completa:
+                sequencia.extend(
+                    {"lat": float(p["lat"]), "lon": float(p["lon"])} for p in rota_completa
+                )
+            else:
+                sequencia.append({"lat": destino[0], "lon": destino[1]})
+
+        if not sequencia:
+            sequencia = [{"lat": lat, "lon": lon} for lat, lon in vertices]
+        return sequencia
+
+    def _materializar_geometria_cenario(self, k_clusters):
+        """
+        Segunda fase do modo só métricas: troca os vértices persistidos do cenário
+        escolhido pelo traçado real (OSRM/cache) das rotas last-mile e de transferência.
+        """
+        self.logger.info(f"🧭 Buscando geometria das rotas do melhor cenário (k={k_clusters})")
+        cursor = self.simulation_db.cursor()
+        try:
+            cursor.execute("""
+                SELECT rota_id, coordenadas_seq
+                FROM rotas_last_mile
+                WHERE tenant_id = %s
+                AND envio_data = %s
+                AND simulation_id = %s
+                AND k_clusters = %s
+                AND coordenadas_seq IS NOT NULL
+            """, (self.tenant_id, self.envio_data, self.simulation_id, k_clusters))
+            rotas_last_mile = cursor.fetchall()
+
+            for rota_id, raw in rotas_last_mile:
+                vertices = self._extrair_vertices_rota(raw)
+                if len(vertices) < 2:
+                    continue
+                cursor.execute("""
+                    UPDATE rotas_last_mile
+                    SET coordenadas_seq = %s
+                    WHERE tenant_id = %s
+                    AND envio_data = %s
+                    AND simulation_id = %s
+                    AND k_clusters = %s
+                    AND rota_id = %s
+                    AND coordenadas_seq IS NOT NULL
+                """, (
+                    json.dumps(self._tracar_rota_por_vertices(vertices)),
+                    self.tenant_id, self.envio_data, self.simulation_id, k_clusters, rota_id,
+                ))
+
+            rotas_transferencia = []
+            if k_clusters != 0:
+                cursor.execute("""
+                    SELECT rota_id, rota_completa_json
+                    FROM rotas_transferencias
+                    WHERE tenant_id = %s
+                    AND envio_data = %s
+                    AND k_clusters = %s
+                """, (self.tenant_id, self.envio_data, k_clusters))
+                rotas_transferencia = cursor.fetchall()
+
+            for rota_id, raw in rotas_transferencia:
+                vertices = self._extrair_vertices_rota(raw)
+                if len(vertices) < 2:
+                    continue
+                sequencia = self._tracar_rota_por_vertices(vertices)
+                rota_completa_json = json.dumps(sequencia)
+                cursor.execute("""
+                    UPDATE rotas_transferencias
+                    SET coordenadas_seq = %s, rota_completa_json = %s
+                    WHERE rota_id = %s
+                """, (rota_completa_json, rota_completa_json, rota_id))
+                cursor.execute("""
+                    UPDATE resumo_transferencias
+                    SET coordenadas_seq = %s
+                    WHERE tenant_id = %s
+                    AND simulation_id = %s
+                    AND rota_id = %s
+                """, (
+                    ";".join(f"{p['lat']:.6f},{p['lon']:.6f}" for p in sequencia),
+                    self.tenant_id, self.simulation_id, rota_id,
+                ))
+
+            self.simulation_db.commit()
+            self.logger.info(
+                f"✅ Geometria materializada | last-mile={len(rotas_last_mile)} | "
+                f"transferências={len(rotas_transferencia)}"
+            )
+        except Exception as e:
+            self.simulation_db.rollback()
+            self.logger.warning(f"⚠️ Falha ao materializar geometria do cenário k={k_clusters}: {e}")
+        finally:
+            cursor.close()
+
     def _obter_k_algoritmo(self, k_total, df_hub):
         return k_total
 
@@ -1310,6 +1560,13 @@ class SimulationUseCase:
             "is_ponto_otimo": True
         }, modo_forcar=self.modo_forcar)
 
+        # --------------------------------------------------
+        # 🔹 Geometria + mapas do melhor cenário (modo só métricas)
+        # --------------------------------------------------
+        if self.params.geometria_somente_melhor_cenario:
+            self._materializar_geometria_cenario(melhor_k)
+            self._gerar_mapas_cenario(melhor_k)
+
         # --------------------------------------------------
         # 🔹 Gráfico de custos
         # --------------------------------------------------
@@ -1369,6 +1626,8 @@ class SimulationUseCase:
                 f"⚠️ Cenários invalidados durante a execução: {resumo}"
             )
 
+        self.logger.info(f"📊 Cache de rotas da execução: {self.cache_rotas_execucao.resumo()}")
+
         # --------------------------------------------------
         # 🔹 Retorno final
         # --------------------------------------------------
@@ -1376,6 +1635,7 @@ class SimulationUseCase:
             "k_clusters": melhor_k,
             "custo_total": menor_custo,
             "cenarios_invalidados": list(self.cenarios_invalidados),
+            "cenarios_nao_avaliados": list(self.cenarios_nao_avaliados),
         }
 
     def executar_simulacao_completa(self):
@@ -1543,10 +1803,12 @@ class SimulationUseCase:
 
         total_entregas = df_entregas_original["cte_numero"].nunique()
 
+        busca_adaptativa = self.params.estrategia_busca_k == "adaptativa"
         k_values = SimulationService.gerar_range_k(
             total_entregas=total_entregas,
             min_cluster=self.params.min_entregas_por_cluster_alvo,
             max_cluster=self.params.max_entregas_por_cluster_alvo,
+            **({"max_cenarios": SIMULATION_K_MAX_CENARIOS_ADAPTATIVO} if busca_adaptativa else {}),
         )
 
         self.logger.info(f"🧪 Cenários de K gerados: {k_values}")
@@ -1593,28 +1855,27 @@ class SimulationUseCase:
         if executar_apenas_k0:
             k_values = []
 
-        total_cenarios_clusterizados = len(k_values)
-
-        for indice_cenario, k in enumerate(k_values, start=1):
-
-            if total_cenarios_clusterizados > 0:
-                progresso_cenario = 65 + int(((indice_cenario - 1) / total_cenarios_clusterizados) * 20)
-            else:
-                progresso_cenario = 65
-
-            self.logger.info(f"🧪 Executando cenário k={k}")
-            self._notify_progress(
-                progresso_cenario,
-                f"Testando cenário k={k} de {self.envio_data} ({indice_cenario}/{total_cenarios_clusterizados})",
+        if busca_adaptativa and len(k_values) > 3:
+            resultados_k = self._executar_cenarios_k_adaptativo(
+                k_values,
+                df_entregas_clusterizaveis,
+                df_hub,
             )
-
-            resultado_k = self._executar_simulacao_para_k(
-                k,
-                df_entregas_clusterizaveis,  # 🔥 base dinâmica
+        elif self.params.avaliar_k_em_paralelo and len(k_values) > 1:
+            resultados_k = self._executar_cenarios_k_em_paralelo(
+                k_values,
+                df_entregas_clusterizaveis,
+                df_hub,
+            )
+        else:
+            resultados_k = self._executar_cenarios_k_sequencial(
+                k_values,
+                df_entregas_clusterizaveis,
                 df_hub,
-                None  # 🔥 NÃO deixa passar outlier
             )
 
+        for resultado_k in resultados_k:
+
             if resultado_k is None:
                 continue
 
@@ -1657,8 +1918,135 @@ class SimulationUseCase:
             "k_clusters": None,
             "custo_total": None,
             "cenarios_invalidados": list(self.cenarios_invalidados),
+            "cenarios_nao_avaliados": list(self.cenarios_nao_avaliados),
+        }
+
+    def _executar_cenarios_k_sequencial(self, k_values, df_entregas_clusterizaveis, df_hub):
+        total_cenarios_clusterizados = len(k_values)
+
+        for indice_cenario, k in enumerate(k_values, start=1):
+
+            if total_cenarios_clusterizados > 0:
+                progresso_cenario = 65 + int(((indice_cenario - 1) / total_cenarios_clusterizados) * 20)
+            else:
+                progresso_cenario = 65
+
+            self.logger.info(f"🧪 Executando cenário k={k}")
+            self._notify_progress(
+                progresso_cenario,
+                f"Testando cenário k={k} de {self.envio_data} ({indice_cenario}/{total_cenarios_clusterizados})",
+            )
+
+            yield self._executar_simulacao_para_k(
+                k,
+                df_entregas_clusterizaveis,  # 🔥 base dinâmica
+                df_hub,
+                None  # 🔥 NÃO deixa passar outlier
+            )
+
+    def _executar_cenarios_k_adaptativo(self, k_values, df_entregas_clusterizaveis, df_hub):
+        """
+        Avalia só os k escolhidos pela busca de seção áurea (SimulationService.buscar_k_adaptativo);
+        os demais ficam registrados em cenarios_nao_avaliados.
+        """
+        resultados = []
+        estimativa_avaliacoes = min(
+            len(k_values),
+            math.ceil(math.log(len(k_values), (1 + math.sqrt(5)) / 2)) + 3 + 2 * self.params.refinamento_local_k,
+        )
+
+        def _avaliar(k):
+            progresso_cenario = 65 + int(min(len(resultados) / estimativa_avaliacoes, 1) * 20)
+            self.logger.info(f"🧪 Executando cenário k={k} (busca adaptativa)")
+            self._notify_progress(
+                progresso_cenario,
+                f"Testando cenário k={k} de {self.envio_data} (busca adaptativa, {len(resultados) + 1} avaliados)",
+            )
+            resultado_k = self._executar_simulacao_para_k(
+                k,
+                df_entregas_clusterizaveis,
+                df_hub,
+                None
+            )
+            resultados.append(resultado_k)
+            return None if resultado_k is None else resultado_k["custo_total"]
+
+        custos = SimulationService.buscar_k_adaptativo(
+            k_values,
+            _avaliar,
+            refinamento_local=self.params.refinamento_local_k,
+        )
+
+        for k in k_values:
+            if k not in custos:
+                self._registrar_cenario_nao_avaliado(k, "pulado pela busca adaptativa de k")
+
+        self.logger.info(
+            f"🔎 Busca adaptativa de k | avaliados={sorted(custos)} | "
+            f"nao_avaliados={len(k_values) - len(custos)}/{len(k_values)}"
+        )
+        return resultados
+
+    def _executar_cenarios_k_em_paralelo(self, k_values, df_entregas_clusterizaveis, df_hub):
+        """
+        Avalia os cenários k num pool de processos. Cada processo abre suas conexões e recebe
+        uma cópia do cache de rotas da execução; a escolha do melhor k e os cenários invalidados
+        ficam no processo pai. Retorna os resultados na ordem de k_values.
+        """
+        total_cenarios_clusterizados = len(k_values)
+        max_processos = min(self.params.max_processos_k, total_cenarios_clusterizados)
+
+        self.logger.info(
+            f"🧪 Executando {total_cenarios_clusterizados} cenários k em paralelo | processos={max_processos}"
+        )
+        self._notify_progress(
+            65,
+            f"Testando {total_cenarios_clusterizados} cenários de {self.envio_data} em paralelo",
+        )
+
+        contexto = {
+            "tenant_id": self.tenant_id,
+            "envio_data": self.envio_data,
+            "simulation_id": self.simulation_id,
+            "hub_id": self.hub_id,
+            "params": self.params,
+            "modo_forcar": self.modo_forcar,
+            "permitir_rotas_excedentes": self.permitir_rotas_excedentes,
+            "logger_nome": self.logger.name,
+            "cache_rotas": self.cache_rotas_execucao.exportar(),
+            # partições calculadas uma vez aqui; cada processo só recorta o seu k
+            "cache_kmeans": self.cluster_service.preparar_cache_kmeans(
+                df_entregas_clusterizaveis, max(k_values)
+            ),
         }
 
+        retornos = {}
+        with ProcessPoolExecutor(
+            max_workers=max_processos,
+            mp_context=multiprocessing.get_context(SIMULATION_K_POOL_START_METHOD),
+            initializer=_inicializar_processo_k,
+            initargs=(contexto,),
+        ) as executor:
+            futures = {
+                executor.submit(_executar_cenario_k_em_processo, k, df_entregas_clusterizaveis, df_hub): k
+                for k in k_values
+            }
+            for concluidos, future in enumerate(as_completed(futures), start=1):
+                k = futures[future]
+                retornos[k] = future.result()
+                self.cache_rotas_execucao.importar(retornos[k]["cache_rotas"])
+                self.logger.info(f"✅ Cenário k={k} avaliado ({concluidos}/{total_cenarios_clusterizados})")
+                self._notify_progress(
+                    65 + int((concluidos / total_cenarios_clusterizados) * 20),
+                    f"Cenário k={k} de {self.envio_data} avaliado ({concluidos}/{total_cenarios_clusterizados})",
+                )
+
+        resultados = []
+        for k in k_values:
+            self.cenarios_invalidados.extend(retornos[k]["cenarios_invalidados"])
+            resultados.append(retornos[k]["resultado"])
+        return resultados
+
     def _executar_simulacao_clusterizada(
         self,
         identificador_cenario,
@@ -1834,46 +2222,10 @@ class SimulationUseCase:
 
 
 
-        # Padroniza output_dir para todos os artefatos
-        output_dir_maps = "exports/simulation/maps"
-
-        try:
-            plotar_mapa_clusterizacao_simulation(
-                simulation_db=self.simulation_db,
-                clusterization_db=self.clusterization_db,
-                tenant_id=self.tenant_id,
-                envio_data=self.envio_data,
-                k_clusters=k_persistencia,
-                modo_forcar=self.modo_forcar,
-                logger=self.logger
-            )
-        except Exception as e:
-            self.logger.warning(f"⚠️ Erro mapa cluster: {e}")
-
-        try:
-            plotar_mapa_transferencias(
-                simulation_db=self.simulation_db,
-                tenant_id=self.tenant_id,
-                envio_data=self.envio_data,
-                k_clusters=k_persistencia,
-                modo_forcar=self.modo_forcar,
-                logger=self.logger
-            )
-        except Exception as e:
-            self.logger.warning(f"⚠️ Erro mapa transfer: {e}")
+        # Modo só métricas: mapas apenas do melhor cenário, em _finalizar_melhor_resultado
+        if not self.params.geometria_somente_melhor_cenario:
+            self._gerar_mapas_cenario(k_persistencia)
 
-        try:
-            plotar_mapa_last_mile(
-                simulation_db=self.simulation_db,
-                clusterization_db=self.clusterization_db,
-                tenant_id=self.tenant_id,
-                envio_data=self.envio_data,
-                k_clusters=k_persistencia,
-                modo_forcar=self.modo_forcar,
-                logger=self.logger
-            )
-        except Exception as e:
-            self.logger.warning(f"⚠️ Erro mapa last-mile: {e}")
         return {
             "k_clusters": k_persistencia,
             "custo_total": custo_total,
@@ -2034,24 +2386,7 @@ class SimulationUseCase:
 
         self.logger.info(f"💾 Resultado k=0 salvo com custo_total={custo_total:.2f}")
 
-        output_dir_maps = os.path.join(
-            "exports/simulation/maps",
-            self.tenant_id,
-            str(self.envio_data)
-        )
-
-        try:
-            plotar_mapa_last_mile(
-                simulation_db=self.simulation_db,
-                clusterization_db=self.clusterization_db,
-                tenant_id=self.tenant_id,
-                envio_data=self.envio_data,
-                k_clusters=0,
-                modo_forcar=self.modo_forcar,
-                logger=self.logger
-            )
-            self.logger.info("🗺️ Mapa last-mile (k=0) gerado com sucesso")
-        except Exception as e:
-            self.logger.warning(f"⚠️ Erro ao gerar mapa last-mile k=0: {e}")
+        if not self.params.geometria_somente_melhor_cenario:
+            self._gerar_mapas_cenario(0)
 
         return resultado_k0
@@ -0,0 +1,143 @@
+# simulation/benchmark_cache_localizacoes.py
+
+"""
+Compara o reverse aproximado em cache_localizacoes: busca legada (ABS/POWER, sem índice)
+x KNN com GiST (tenant_id, geom), com a tabela crescendo até milhões de linhas.
+
+Usa uma tabela TEMP com dados sintéticos (nada é gravado em cache_localizacoes).
+Requer PostGIS e btree_gist no simulation_db (ver infrastructure/sql/add_geom_to_cache_localizacoes.sql).
+
+Exemplo:
+    python -m simulation.benchmark_cache_localizacoes --tamanhos 10000,100000,1000000,3000000
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+from simulation.infrastructure.cache_coordinates import (
+    QUERY_REVERSE_APROXIMADO_KNN,
+    QUERY_REVERSE_APROXIMADO_LEGADA,
+)
+from simulation.infrastructure.simulation_database_connection import conectar_simulation_db
+from simulation.utils.helpers import RAIO_REVERSE_APROXIMADO_GRAUS
+
+TABELA = "bench_cache_localizacoes"
+TENANTS = 4
+# Região sintética (graus) em volta de São Paulo: densidade parecida com um tenant grande
+CENTRO_LAT, CENTRO_LON, ESPALHAMENTO = -23.55, -46.63, 4.0
+
+
+def _criar_tabela(cursor):
+    cursor.execute(f"""
+        CREATE TEMP TABLE {TABELA} (
+            endereco_completo text,
+            cidade text,
+            latitude double precision,
+            longitude double precision,
+            tenant_id text,
+            geom geometry(Point, 4326) GENERATED ALWAYS AS (
+                ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)
+            ) STORED
+        )
+    """)
+    cursor.execute(f"CREATE INDEX ON {TABELA} (tenant_id)")
+    cursor.execute(f"CREATE INDEX ON {TABELA} USING gist (tenant_id, geom)")
+
+
+def _crescer_ate(cursor, atual, alvo):
+    cursor.execute(
+        f"""
+        INSERT INTO {TABELA} (endereco_completo, cidade, latitude, longitude, tenant_id)
+        SELECT
+            'ENDERECO ' || g,
+            'CIDADE ' || (g %% 500),
+            %(lat)s + (random() - 0.5) * %(esp)s,
+            %(lon)s + (random() - 0.5) * %(esp)s,
+            'bench_' || (g %% %(tenants)s)
+        FROM generate_series(%(inicio)s, %(fim)s) AS g
+        """,
+        {
+            "lat": CENTRO_LAT, "lon": CENTRO_LON, "esp": ESPALHAMENTO,
+            "tenants": TENANTS, "inicio": atual + 1, "fim": alvo,
+        },
+    )
+    cursor.execute(f"ANALYZE {TABELA}")
+
+
+def _medir(cursor, query, pontos):
+    tempos = []
+    resultados = []
+    for lat, lon in pontos:
+        parametros = {"tenant_id": "bench_0", "lat": lat, "lon": lon, "raio": RAIO_REVERSE_APROXIMADO_GRAUS}
+        inicio = time.perf_counter()
+        cursor.execute(query, parametros)
+        row = cursor.fetchone()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        resultados.append(row[0] if row else None)
+
+    tempos.sort()
+    return {
+        "mediana_ms": statistics.median(tempos),
+        "p95_ms": tempos[int(len(tempos) * 0.95) - 1],
+        "resultados": resultados,
+    }
+
+
+def executar(tamanhos, consultas, seed=42):
+    query_legada = QUERY_REVERSE_APROXIMADO_LEGADA.replace("FROM cache_localizacoes", f"FROM {TABELA}")
+    query_knn = QUERY_REVERSE_APROXIMADO_KNN.replace("FROM cache_localizacoes", f"FROM {TABELA}")
+
+    rnd = random.Random(seed)
+    pontos = [
+        (
+            CENTRO_LAT + (rnd.random() - 0.5) * ESPALHAMENTO,
+            CENTRO_LON + (rnd.random() - 0.5) * ESPALHAMENTO,
+        )
+        for _ in range(consultas)
+    ]
+
+    conn = conectar_simulation_db()
+    linhas = []
+    try:
+        with conn.cursor() as cursor:
+            _criar_tabela(cursor)
+
+            atual = 0
+            for alvo in sorted(tamanhos):
+                print(f"⏳ Gerando {alvo:,} linhas...")
+                _crescer_ate(cursor, atual, alvo)
+                atual = alvo
+
+                legada = _medir(cursor, query_legada, pontos)
+                knn = _medir(cursor, query_knn, pontos)
+                divergentes = sum(
+                    1 for a, b in zip(legada["resultados"], knn["resultados"]) if a != b
+                )
+
+                linhas.append((alvo, legada, knn, divergentes))
+                print(
+                    f"📊 linhas={alvo:>10,} | legada mediana={legada['mediana_ms']:8.2f} ms "
+                    f"p95={legada['p95_ms']:8.2f} ms | knn mediana={knn['mediana_ms']:6.2f} ms "
+                    f"p95={knn['p95_ms']:6.2f} ms | divergências={divergentes}"
+                )
+    finally:
+        conn.rollback()
+        conn.close()
+
+    return linhas
+
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Benchmark do reverse em cache_localizacoes (legado x KNN/GiST)")
+    parser.add_argument("--tamanhos", default="10000,100000,1000000,3000000",
+                        help="Tamanhos acumulados da tabela, separados por vírgula")
+    parser.add_argument("--consultas", type=int, default=200, help="Consultas por tamanho")
+
+    args = parser.parse_args()
+    executar([int(t) for t in args.tamanhos.split(",") if t.strip()], args.consultas)
@@ -7,8 +7,13 @@ from scipy.spatial.distance import cdist
 import uuid
 
 from simulation.infrastructure.simulation_database_writer import salvar_resumo_clusters_em_db
-from simulation.infrastructure.cache_coordinates import buscar_coordenadas
-from simulation.utils.helpers import encontrar_centro_mais_denso, ajustar_para_centro_urbano, log_coordenadas
+from simulation.infrastructure.cache_centros_execucao import ResolvedorCentrosExecucao
+from simulation.utils.helpers import encontrar_centro_mais_denso, log_coordenadas
+from utils.atribuicao_capacitada import atribuir_com_capacidade, limites_de_tamanho
+from utils.kmeans_incremental import KMeansIncremental, assinatura_coordenadas
+
+
+RAIO_TERRA_KM = 6371.0
 
 
 def coordenadas_sao_validas(lat, lon):
@@ -22,6 +27,40 @@ class ClusterizationService:
         self.logger = logger
         self.tenant_id = tenant_id
 
+        # partições KMeans do dia reaproveitadas entre os cenários k
+        self.cache_kmeans = None
+        self._snapshot_kmeans = None
+
+        # endereço/cidade dos centros via KD-tree de cache_localizacoes (carregada uma vez)
+        self.resolvedor_centros = ResolvedorCentrosExecucao(simulation_db, tenant_id, logger)
+
+    def _kmeans_do_dia(self, coords):
+        coords = np.asarray(coords, dtype=float)
+
+        if self.cache_kmeans is None or self.cache_kmeans.assinatura != assinatura_coordenadas(coords):
+            self.cache_kmeans = KMeansIncremental(coords, random_state=42)
+            semeados = self.cache_kmeans.importar(self._snapshot_kmeans)
+            self.logger.info(
+                f"🧮 Cache de clusterização criado | entregas={len(coords)} | k semeados={semeados}"
+            )
+
+        return self.cache_kmeans
+
+    def preparar_cache_kmeans(self, df_entregas, k_max):
+        """Calcula as partições até k_max e devolve o snapshot para semear outros processos."""
+        df = df_entregas[["latitude", "longitude"]].apply(pd.to_numeric, errors="coerce").dropna()
+        if df.empty:
+            return None
+
+        cache = self._kmeans_do_dia(df.values)
+        cache.centros(min(int(k_max), len(df)))
+        return cache.exportar()
+
+    def importar_cache_kmeans(self, snapshot):
+        self._snapshot_kmeans = snapshot
+        if self.cache_kmeans is not None:
+            self.cache_kmeans.importar(snapshot)
+
     def _normalizar_coluna_cluster(self, df):
         if "cluster" not in df.columns:
             return df
@@ -83,102 +122,84 @@ class ClusterizationService:
         df_validas["cluster_cidade"] = pd.Series(None, index=df_validas.index, dtype="object")
         return df_validas
 
-    def _atribuir_centros_a_clusters(self, df_clusterizado):
-        for cluster_id in sorted(df_clusterizado["cluster"].astype(str).unique()):
-            df_cluster = df_clusterizado[df_clusterizado["cluster"].astype(str) == str(cluster_id)]
-            if df_cluster.empty:
-                continue
+    def _bbox_entregas(self, df):
+        coords = df[["latitude", "longitude"]].astype(float)
+        return (
+            coords["latitude"].min(), coords["latitude"].max(),
+            coords["longitude"].min(), coords["longitude"].max(),
+        )
 
-            centro_lat, centro_lon = encontrar_centro_mais_denso(df_cluster)
-            endereco, cidade = ajustar_para_centro_urbano(
-                centro_lat,
-                centro_lon,
-                self.simulation_db,
-                self.tenant_id,
-            )
+    def _resolver_centros(self, centros, df, prefixo_log="Cluster"):
+        """
+        centros: {cluster_id: (lat, lon)} calculados. Resolve todos de uma vez e devolve
+        {cluster_id: (endereco, cidade, lat, lon)} com o centro calculado quando não houver coordenada.
+        """
+        resolvidos = self.resolvedor_centros.resolver(centros, self._bbox_entregas(df))
+
+        finais = {}
+        for cluster_id, (centro_lat, centro_lon) in centros.items():
+            endereco, cidade, lat, lon = resolvidos[cluster_id]
 
             if cidade == "Fora da UF":
                 self.logger.warning(
-                    f"⚠️ Cluster {cluster_id}: coordenada fora da UF → ({centro_lat:.5f}, {centro_lon:.5f})"
+                    f"⚠️ {prefixo_log} {cluster_id}: coordenada fora da UF → ({centro_lat:.5f}, {centro_lon:.5f})"
                 )
 
-            self.logger.info(f"📍 Buscando coordenadas para Cluster {cluster_id}: {endereco}")
-            lat, lon = buscar_coordenadas(
-                endereco,
-                self.tenant_id,
-                self.simulation_db,
-                self.logger,
-            )
-
             if not coordenadas_sao_validas(lat, lon):
                 self.logger.warning(
-                    f"⚠️ Coordenadas inválidas. Usando ponto denso para Cluster {cluster_id}."
+                    f"⚠️ Coordenadas inválidas. Usando centro calculado para {prefixo_log} {cluster_id}."
                 )
                 lat, lon = centro_lat, centro_lon
 
             lat = float(lat)
             lon = float(lon)
 
-            log_coordenadas(self.logger, cluster_id, lat, lon)
-
-            mascara_cluster = df_clusterizado["cluster"].astype(str) == str(cluster_id)
-            df_clusterizado.loc[mascara_cluster, "centro_lat"] = lat
-            df_clusterizado.loc[mascara_cluster, "centro_lon"] = lon
-            df_clusterizado.loc[mascara_cluster, "cluster_endereco"] = endereco
-            df_clusterizado.loc[mascara_cluster, "cluster_cidade"] = cidade
-
-        return df_clusterizado
-
-    def _balanced_kmeans(self, df, k, max_iter=10, tolerance=2):
-
-        df = df.copy()
-        coords = df[["latitude", "longitude"]].values
-
-        # KMeans inicial
-        modelo = KMeans(n_clusters=k, n_init='auto', random_state=42)
-        df["cluster"] = modelo.fit_predict(coords)
+            log_coordenadas(self.logger, cluster_id, lat, lon, prefixo=prefixo_log)
+            finais[cluster_id] = (endereco, cidade, lat, lon)
 
-        target = int(len(df) / k)
-
-        for _ in range(max_iter):
-            sizes = df["cluster"].value_counts().to_dict()
+        self.logger.info(
+            f"📍 Centros resolvidos: {len(centros)} | cache local={self.resolvedor_centros.hits} | "
+            f"rede={self.resolvedor_centros.rede} (acumulado da execução)"
+        )
+        return finais
 
-            excesso = [c for c, s in sizes.items() if s > target + tolerance]
-            deficit = [c for c, s in sizes.items() if s < target - tolerance]
+    def _atribuir_centros_a_clusters(self, df_clusterizado):
+        chave_cluster = df_clusterizado["cluster"].astype(str)
 
-            if not excesso or not deficit:
-                break
+        centros = {}
+        for cluster_id, df_cluster in df_clusterizado.groupby(chave_cluster, sort=True):
+            centro_lat, centro_lon = encontrar_centro_mais_denso(df_cluster)
+            if centro_lat is not None:
+                centros[cluster_id] = (centro_lat, centro_lon)
 
-            for c_ex in excesso:
-                sobra = sizes[c_ex] - target
+        finais = self._resolver_centros(centros, df_clusterizado)
 
-                pontos = df[df["cluster"] == c_ex].copy()
+        for posicao, coluna in enumerate(["cluster_endereco", "cluster_cidade", "centro_lat", "centro_lon"]):
+            valores = chave_cluster.map({cid: dados[posicao] for cid, dados in finais.items()})
+            if coluna in ("centro_lat", "centro_lon"):
+                valores = valores.astype("float64")
+            df_clusterizado[coluna] = valores
 
-                centro = pontos[["latitude", "longitude"]].mean().values
-                pontos["dist"] = np.linalg.norm(
-                    pontos[["latitude", "longitude"]].values - centro,
-                    axis=1
-                )
-
-                mover = pontos.sort_values("dist", ascending=False).head(sobra)
+        return df_clusterizado
 
-                for idx, row in mover.iterrows():
+    def _balanced_kmeans(self, df, k, max_iter=10, tolerance=2):
 
-                    melhor_cluster = None
-                    melhor_dist = float("inf")
+        df = df.copy()
+        coords = df[["latitude", "longitude"]].values.astype(float)
 
-                    for c_def in deficit:
-                        centro_def = df[df["cluster"] == c_def][["latitude", "longitude"]].mean().values
-                        dist = np.linalg.norm(
-                            row[["latitude", "longitude"]].values - centro_def
-                        )
+        # centros iniciais da partição compartilhada entre os cenários do dia
+        centros = self._kmeans_do_dia(coords).centros(k)
 
-                        if dist < melhor_dist:
-                            melhor_dist = dist
-                            melhor_cluster = c_def
+        # tamanhos entre target - tolerance e target + tolerance via fluxo de custo mínimo
+        minimo, maximo = limites_de_tamanho(len(df), k, tolerance)
+        rotulos, _ = atribuir_com_capacidade(coords, centros, minimo, maximo, max_iter=max_iter)
+        df["cluster"] = rotulos
 
-                    if melhor_cluster is not None:
-                        df.at[idx, "cluster"] = melhor_cluster
+        tamanhos = np.bincount(rotulos, minlength=k)
+        self.logger.info(
+            f"⚖️ Balanced KMeans k={k} | limites={minimo}..{maximo} | "
+            f"tamanhos={int(tamanhos.min())}..{int(tamanhos.max())}"
+        )
 
         return df
 
@@ -217,10 +238,9 @@ class ClusterizationService:
             )
 
         if algoritmo == "kmeans":
-            modelo = KMeans(n_clusters=k, n_init='auto', random_state=42)
-            df_validas['cluster'] = modelo.fit_predict(
+            df_validas['cluster'] = self._kmeans_do_dia(
                 df_validas[["latitude", "longitude"]].values
-            )
+            ).rotulos(k)
 
         elif algoritmo == "balanced_kmeans":
             df_validas = self._balanced_kmeans(df_validas, k)
@@ -237,47 +257,35 @@ class ClusterizationService:
 
         df_clusterizado = self._normalizar_coluna_cluster(df_clusterizado)
 
-        novos_centros = []
-        for cluster_id in sorted(df_clusterizado['cluster'].unique()):
-            df_cluster = df_clusterizado[df_clusterizado['cluster'] == cluster_id]
-
-            if df_cluster.empty:
-                self.logger.warning(f"⚠️ Cluster {cluster_id} sem entregas.")
-                continue
-
-            # 📍 Centro calculado = média simples das coordenadas (ponderado por entregas)
-            centro_lat = df_cluster["latitude"].mean()
-            centro_lon = df_cluster["longitude"].mean()
-
-            if pd.isna(centro_lat) or pd.isna(centro_lon):
-                self.logger.warning(f"⚠️ Cluster {cluster_id} sem coordenadas válidas.")
-                continue
+        # 📍 Centro calculado = média simples das coordenadas (ponderado por entregas)
+        medias = df_clusterizado.groupby("cluster", sort=True)[["latitude", "longitude"]].mean()
+        sem_coordenadas = medias[medias.isna().any(axis=1)].index.tolist()
+        if sem_coordenadas:
+            self.logger.warning(f"⚠️ Clusters sem coordenadas válidas: {sem_coordenadas}")
 
-            # 🔄 Ajuste para centro urbano
-            endereco_urbano, cidade = ajustar_para_centro_urbano(
-                centro_lat, centro_lon, self.simulation_db, self.tenant_id
-            )
-
-            self.logger.info(f"📍 Buscando coordenadas para cluster {cluster_id}: {endereco_urbano}")
-            lat, lon = buscar_coordenadas(endereco_urbano, self.tenant_id, self.simulation_db, self.logger)
-
-            if not coordenadas_sao_validas(lat, lon):
-                self.logger.warning(f"⚠️ Coordenadas inválidas. Usando centro calculado.")
-                lat, lon = centro_lat, centro_lon
-
-            lat = float(lat)
-            lon = float(lon)
+        medias = medias.dropna()
+        centros = {
+            cluster_id: (float(lat), float(lon))
+            for cluster_id, lat, lon in zip(medias.index, medias["latitude"], medias["longitude"])
+        }
 
-            log_coordenadas(self.logger, cluster_id, lat, lon, prefixo="Cluster ajustado")
-            novos_centros.append({
-                'cluster': cluster_id,
-                'cluster_cidade': cidade,
-                'centro_lat': lat,
-                'centro_lon': lon
-            })
+        # 🔄 Ajuste para centro urbano (todos os clusters de uma vez)
+        finais = self._resolver_centros(centros, df_clusterizado, prefixo_log="Cluster ajustado")
+
+        df_centros = pd.DataFrame(
+            [
+                {
+                    'cluster': cluster_id,
+                    'cluster_cidade': cidade,
+                    'centro_lat': lat,
+                    'centro_lon': lon
+                }
+                for cluster_id, (_, cidade, lat, lon) in finais.items()
+            ],
+            columns=['cluster', 'cluster_cidade', 'centro_lat', 'centro_lon'],
+        )
 
         # 🔁 Atualiza DataFrame com os novos centros
-        df_centros = pd.DataFrame(novos_centros)
         df_clusterizado = df_clusterizado.drop(columns=[
             "centro_lat", "centro_lon", "cluster_endereco", "cluster_cidade"
         ], errors='ignore')
@@ -542,28 +550,48 @@ class ClusterizationService:
     def atribuir_entregas_proximas_ao_hub_central(df_entregas, hubs, raio_km=80.0):
         """
         Atribui cluster '9999' (texto) às entregas dentro do raio de um hub central.
+        Com vários hubs, cada entrega fica com o hub mais próximo dentro do raio
+        (matriz haversine entregas x hubs, numa única passada).
         """
-        import numpy as np
-        from geopy.distance import geodesic
-
         df_entregas = df_entregas.copy()
         df_entregas['cluster'] = pd.Series([None] * len(df_entregas), dtype='object')
 
-        for hub in hubs:
-            hub_coord = (hub["latitude"], hub["longitude"])
-            for i, entrega in df_entregas.iterrows():
-                if pd.isnull(entrega['latitude']) or pd.isnull(entrega['longitude']):
-                    continue
-                entrega_coord = (entrega['latitude'], entrega['longitude'])
-                distancia = geodesic(entrega_coord, hub_coord).km
-                if distancia <= raio_km:
-                    df_entregas.at[i, 'cluster'] = '9999'
-                    df_entregas.at[i, 'cluster_cidade'] = 'HUB CENTRAL'
-                    df_entregas.at[i, 'centro_lat'] = hub["latitude"]
-                    df_entregas.at[i, 'centro_lon'] = hub["longitude"]
-
-        df_hub = df_entregas[df_entregas['cluster'] == '9999'].copy()
-        df_restante = df_entregas[df_entregas['cluster'] != '9999'].copy()
+        hubs_validos = [
+            (float(hub["latitude"]), float(hub["longitude"]))
+            for hub in hubs or []
+            if hub.get("latitude") is not None and hub.get("longitude") is not None
+        ]
+
+        if df_entregas.empty or not hubs_validos:
+            return df_entregas.iloc[0:0].copy(), df_entregas
+
+        lat = pd.to_numeric(df_entregas['latitude'], errors='coerce').to_numpy(dtype=float)
+        lon = pd.to_numeric(df_entregas['longitude'], errors='coerce').to_numpy(dtype=float)
+        hubs_coord = np.asarray(hubs_validos, dtype=float)
+
+        lat_r, lon_r = np.radians(lat)[:, None], np.radians(lon)[:, None]
+        hub_lat_r, hub_lon_r = np.radians(hubs_coord[:, 0])[None, :], np.radians(hubs_coord[:, 1])[None, :]
+
+        a = (
+            np.sin((hub_lat_r - lat_r) / 2) ** 2
+            + np.cos(lat_r) * np.cos(hub_lat_r) * np.sin((hub_lon_r - lon_r) / 2) ** 2
+        )
+        dist_km = 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+        # coordenada nula -> NaN -> nunca entra no raio
+        dist_km = np.where(np.isnan(dist_km), np.inf, dist_km)
+        hub_mais_proximo = dist_km.argmin(axis=1)
+        dentro = dist_km[np.arange(len(dist_km)), hub_mais_proximo] <= raio_km
+
+        if dentro.any():
+            idx_hub = hub_mais_proximo[dentro]
+            df_entregas.loc[dentro, 'cluster'] = '9999'
+            df_entregas.loc[dentro, 'cluster_cidade'] = 'HUB CENTRAL'
+            df_entregas.loc[dentro, 'centro_lat'] = hubs_coord[idx_hub, 0]
+            df_entregas.loc[dentro, 'centro_lon'] = hubs_coord[idx_hub, 1]
+
+        df_hub = df_entregas[dentro].copy()
+        df_restante = df_entregas[~dentro].copy()
 
         return df_hub, df_restante
 
@@ -133,6 +133,23 @@ class SimulationParams(BaseModel):
     permitir_rotas_excedentes: bool = True
     permitir_veiculo_leve_intermunicipal: bool = False
 
+    # ==========================================================
+    # ROTEAMENTO (OSRM)
+    # ==========================================================
+    usar_matriz_osrm: bool = True
+    # Cenários perdedores são avaliados só com métricas; o traçado é buscado para o melhor k
+    geometria_somente_melhor_cenario: bool = True
+
+    # ==========================================================
+    # EXECUÇÃO DOS CENÁRIOS k
+    # ==========================================================
+    # Avalia os cenários k em processos separados (cada um com suas conexões)
+    avaliar_k_em_paralelo: bool = False
+    max_processos_k: int = Field(4, ge=1)
+    # "adaptativa": busca de seção áurea sobre k + refinamento local (menos cenários avaliados)
+    estrategia_busca_k: Literal["exaustiva", "adaptativa"] = "exaustiva"
+    refinamento_local_k: int = Field(1, ge=0)
+
     # ==========================================================
     # TIME WINDOWS
     # ==========================================================
@@ -140,6 +157,18 @@ class SimulationParams(BaseModel):
     tempo_especial_max: int = Field(300, ge=0)
     max_especiais_por_rota: int = Field(1, ge=0)
 
+    # Solver OR-Tools: matriz por estrada (OSRM /table), tempo limite e estratégia inicial
+    tw_usar_matriz_osrm: bool = False
+    tw_tempo_limite_solver_seg: int = Field(10, ge=1)
+    tw_estrategia_primeira_solucao: Literal[
+        "AUTOMATIC",
+        "PATH_CHEAPEST_ARC",
+        "SAVINGS",
+        "PARALLEL_CHEAPEST_INSERTION",
+        "LOCAL_CHEAPEST_INSERTION",
+        "CHRISTOFIDES",
+    ] = "PATH_CHEAPEST_ARC"
+
     # ==========================================================
     # REFINAMENTO
     # ==========================================================
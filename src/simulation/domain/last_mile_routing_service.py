@@ -17,7 +17,10 @@ from simulation.infrastructure.simulation_database_reader import (
     buscar_latlon_ctes
 )
 from simulation.infrastructure.cache_routes import (
-    obter_rota_last_mile_detalhada,
+    carregar_matriz_rotas,
+    montar_pares_rota,
+    obter_metricas_rota,
+    obter_rotas_detalhadas_em_lote,
 )
 
 from simulation.domain.entities import SimulationParams
@@ -25,7 +28,8 @@ from simulation.utils.service_time import calcular_tempo_servico
 
 class LastMileRoutingService:
     def __init__(self, simulation_db, clusterization_db, tenant_id: str, logger,
-                 params: SimulationParams, envio_data: str, permitir_rotas_excedentes: bool = True):
+                 params: SimulationParams, envio_data: str, permitir_rotas_excedentes: bool = True,
+                 cache_execucao=None):
         self.simulation_db = simulation_db
         self.clusterization_db = clusterization_db
         self.tenant_id = tenant_id
@@ -34,6 +38,9 @@ class LastMileRoutingService:
         self.envio_data = envio_data
         self.permitir_rotas_excedentes = permitir_rotas_excedentes
         self._route_attempts_by_cluster = {}
+        self._matriz_rotas = None
+        self.incluir_geometria = not params.geometria_somente_melhor_cenario
+        self.cache_execucao = cache_execucao
 
     def _registrar_tentativa_rota(
         self,
@@ -343,6 +350,60 @@ class LastMileRoutingService:
             'depth': depth,
         }]
 
+    @staticmethod
+    def _segmento_rota(origem, destino, rota_completa, fonte_rota, ida: bool):
+        # Trechos sem geometria (matriz OSRM / modo só métricas) ficam pendentes até a rota ser aceita
+        if rota_completa is None:
+            return {"origem": origem, "destino": destino, "ida": ida, "coords": None}
+        if ida:
+            coords = (
+                [{"lat": p["lat"], "lon": p["lon"]} for p in rota_completa]
+                if rota_completa
+                else [{"lat": destino[0], "lon": destino[1]}]
+            )
+        else:
+            coords = [(p["lat"], p["lon"]) for p in rota_completa] if rota_completa else [destino]
+        return {"coords": coords}
+
+    def _resolver_geometria_segmentos(self, segmentos, velocidade_media_kmh):
+        segmentos = [segmento for segmento in segmentos if segmento is not None]
+        pendentes = [segmento for segmento in segmentos if segmento["coords"] is None]
+
+        if pendentes and not self.incluir_geometria:
+            # Só os vértices: o traçado é materializado depois, apenas para o melhor cenário
+            for segmento in pendentes:
+                origem, destino = segmento["origem"], segmento["destino"]
+                segmento["coords"] = (
+                    [{"lat": origem[0], "lon": origem[1]}, {"lat": destino[0], "lon": destino[1]}]
+                    if segmento["ida"]
+                    else [origem, destino]
+                )
+        elif pendentes:
+            # Trechos da rota buscados em paralelo no OSRM (apenas os ausentes do cache)
+            resultados = obter_rotas_detalhadas_em_lote(
+                [(segmento["origem"], segmento["destino"]) for segmento in pendentes],
+                self.tenant_id,
+                self.simulation_db,
+                self.logger,
+                velocidade_media_kmh,
+                cache_execucao=self.cache_execucao,
+            )
+            for segmento, (_, _, rota_completa, fonte_rota) in zip(pendentes, resultados):
+                segmento.update(
+                    self._segmento_rota(
+                        segmento["origem"],
+                        segmento["destino"],
+                        rota_completa,
+                        fonte_rota,
+                        ida=segmento["ida"],
+                    )
+                )
+
+        sequencia_coord = []
+        for segmento in segmentos:
+            sequencia_coord.extend(segmento["coords"] or [])
+        return sequencia_coord
+
     def _montar_detalhes_rota(
         self,
         cluster_id,
@@ -355,8 +416,7 @@ class LastMileRoutingService:
     ):
         rota_id = f"ROTA_{cluster_id}_{rota_label}"
         origem = (df_ordenado['centro_lat'].iloc[0], df_ordenado['centro_lon'].iloc[0])
-        sequencia_coord = []
-        rota_ida_coords = []
+        segmentos_ida = []
         anterior = origem
         ctes_mesma_origem_destino = []
         peso_total_rota = float(df_ordenado['cte_peso'].sum())
@@ -371,18 +431,20 @@ class LastMileRoutingService:
 
             if anterior == atual:
                 ctes_mesma_origem_destino.append(str(df_ordenado.iloc[i]['cte_numero']))
-                rota_ida_coords.append(atual)
+                segmentos_ida.append({"coords": [atual]})
                 anterior = atual
                 continue
 
-            dist_km, tempo_min, rota_completa, fonte_rota = obter_rota_last_mile_detalhada(
+            dist_km, tempo_min, rota_completa, fonte_rota = obter_metricas_rota(
                 anterior,
                 atual,
                 self.tenant_id,
                 self.simulation_db,
-                self.simulation_db,
                 self.logger,
                 velocidade_media_kmh,
+                self._matriz_rotas,
+                incluir_geometria=self.incluir_geometria,
+                cache_execucao=self.cache_execucao,
             )
 
             if dist_km is None or tempo_min is None:
@@ -401,10 +463,9 @@ class LastMileRoutingService:
                 )
                 return {"excedeu": True, "df": df_ordenado}
 
-            if rota_completa:
-                rota_ida_coords.extend([{"lat": p["lat"], "lon": p["lon"]} for p in rota_completa])
-            else:
-                rota_ida_coords.append({"lat": atual[0], "lon": atual[1]})
+            segmentos_ida.append(
+                self._segmento_rota(anterior, atual, rota_completa, fonte_rota, ida=True)
+            )
 
             anterior = atual
 
@@ -420,21 +481,23 @@ class LastMileRoutingService:
             for _, row in df_ordenado.iterrows()
         )
 
-        rota_volta_coords = []
+        segmento_volta = None
         if anterior == origem:
             self.logger.warning("⚠️ Ignorando retorno: origem == último ponto.")
-            rota_volta_coords.append(origem)
+            segmento_volta = {"coords": [origem]}
             tempo_back = 0.0
             dist_back = 0.0
         else:
-            dist_back, tempo_back, rota_back, fonte_rota_back = obter_rota_last_mile_detalhada(
+            dist_back, tempo_back, rota_back, fonte_rota_back = obter_metricas_rota(
                 anterior,
                 origem,
                 self.tenant_id,
                 self.simulation_db,
-                self.simulation_db,
                 self.logger,
                 velocidade_media_kmh,
+                self._matriz_rotas,
+                incluir_geometria=self.incluir_geometria,
+                cache_execucao=self.cache_execucao,
             )
             if dist_back is None or tempo_back is None:
                 self.logger.warning(
@@ -450,20 +513,9 @@ class LastMileRoutingService:
                 self.logger.error(f"❌ Erro ao converter retorno da rota {rota_id}: {e}")
                 return {"excedeu": True, "df": df_ordenado}
 
-            if rota_back:
-                rota_volta_coords.extend([(p["lat"], p["lon"]) for p in rota_back])
-            else:
-                rota_volta_coords.append(origem)
-
-        if rota_ida_coords:
-            sequencia_coord.extend(rota_ida_coords)
-        if rota_volta_coords:
-            sequencia_coord.extend(rota_volta_coords)
-        if not sequencia_coord:
-            self.logger.warning(
-                f"⚠️ Coordenadas ausentes na ida e volta da rota {rota_id}. Marcando coordenadas_seq como None."
+            segmento_volta = self._segmento_rota(
+                anterior, origem, rota_back, fonte_rota_back, ida=False
             )
-            sequencia_coord = None
 
         tempo_total_real = tempo_parcial + tempo_back
         self.logger.info(
@@ -509,6 +561,17 @@ class LastMileRoutingService:
             status='fallback_excedente' if tempo_total_real > tempo_limite else 'viavel_sla',
         )
 
+        # Geometria só é buscada para rotas aceitas; as métricas já vieram da matriz
+        sequencia_coord = self._resolver_geometria_segmentos(
+            segmentos_ida + [segmento_volta],
+            velocidade_media_kmh,
+        )
+        if not sequencia_coord:
+            self.logger.warning(
+                f"⚠️ Coordenadas ausentes na ida e volta da rota {rota_id}. Marcando coordenadas_seq como None."
+            )
+            sequencia_coord = None
+
         detalhes_cluster = []
         for posicao_rota, (_, row) in enumerate(df_ordenado.iterrows()):
             origem_igual_destino = (
@@ -533,7 +596,7 @@ class LastMileRoutingService:
                 "tempo_parcial_min": round(tempo_parcial, 2) if posicao_rota == 0 else None,
                 "fonte_metricas": (
                     "osrm"
-                    if fontes_metricas.issubset({"osrm", "cache_osrm"})
+                    if fontes_metricas.issubset({"osrm", "cache_osrm", "osrm_table"})
                     else "fallback"
                     if "manual_haversine" in fontes_metricas or "google" in fontes_metricas
                     else "misto"
@@ -622,6 +685,21 @@ class LastMileRoutingService:
                 )
 
             velocidade_media_kmh = self._obter_velocidade_media_kmh()
+            self._matriz_rotas = None
+            if self.params.usar_matriz_osrm:
+                self._matriz_rotas = carregar_matriz_rotas(
+                    [(df_coords['centro_lat'].iloc[0], df_coords['centro_lon'].iloc[0])]
+                    + list(zip(coordenadas['destino_latitude'], coordenadas['destino_longitude'])),
+                    logger=self.logger,
+                )
+            if self._matriz_rotas is None and self.cache_execucao is not None:
+                self.cache_execucao.prefetch(
+                    self.simulation_db,
+                    montar_pares_rota(
+                        [(df_coords['centro_lat'].iloc[0], df_coords['centro_lon'].iloc[0])]
+                        + list(zip(coordenadas['destino_latitude'], coordenadas['destino_longitude']))
+                    ),
+                )
             tempo_limite = (
                 self.params.tempo_max_k0
                 if k_clusters == 0
@@ -715,4 +715,57 @@ class SimulationService:
             step = math.ceil(len(k_values) / max_cenarios)
             k_values = k_values[::step]
 
-        return k_values
\ No newline at end of file
+        return k_values
+
+    @staticmethod
+    def buscar_k_adaptativo(k_values, avaliar, refinamento_local: int = 1):
+        """
+        Busca de seção áurea sobre os índices de k_values (curva de custo supostamente unimodal),
+        seguida de refinamento local ±refinamento_local em torno do melhor k.
+        avaliar(k) -> custo ou None (cenário inválido, tratado como custo infinito).
+        Retorna {k: custo} apenas dos k efetivamente avaliados.
+        """
+        custos = {}
+
+        def custo(idx):
+            k = k_values[idx]
+            if k not in custos:
+                valor = avaliar(k)
+                custos[k] = float("inf") if valor is None else float(valor)
+            return custos[k]
+
+        if not k_values:
+            return custos
+
+        razao = (math.sqrt(5) - 1) / 2
+        inicio, fim = 0, len(k_values) - 1
+
+        while fim - inicio > 2:
+            passo = int(round((fim - inicio) * razao))
+            a = fim - passo
+            b = inicio + passo
+            if a >= b:
+                a, b = b - 1, b
+            if custo(a) <= custo(b):
+                fim = b
+            else:
+                inicio = a
+
+        for idx in range(inicio, fim + 1):
+            custo(idx)
+
+        # 🔹 refinamento local: repete enquanto o melhor k mudar
+        indice_por_k = {k: idx for idx, k in enumerate(k_values)}
+        melhor_idx = None
+        while True:
+            # empate (ex.: todos inválidos = inf) fica com o menor k
+            atual = min((indice_por_k[k] for k in custos), key=lambda idx: (custos[k_values[idx]], idx))
+            if atual == melhor_idx:
+                break
+            melhor_idx = atual
+            for delta in range(1, refinamento_local + 1):
+                for idx in (melhor_idx - delta, melhor_idx + delta):
+                    if 0 <= idx < len(k_values):
+                        custo(idx)
+
+        return custos
@@ -8,7 +8,13 @@ import json
 
 from simulation.utils.format_utils import formatar
 from simulation.utils.route_helpers import gerar_rotas_savings_transfer, expandir_pontos_por_capacidade_veiculo
-from simulation.infrastructure.cache_routes import obter_rota_real, obter_rota_real_detalhada
+from simulation.infrastructure.cache_routes import (
+    carregar_matriz_rotas,
+    montar_pares_rota,
+    obter_metricas_rota,
+    obter_rota_real_detalhada,
+    obter_rota_real_metricas,
+)
 from simulation.infrastructure.simulation_database_reader import (
     carregar_hub_por_id,
     definir_tipo_veiculo_transferencia,
@@ -23,13 +29,16 @@ from simulation.domain.entities import SimulationParams
 
 
 class TransferRoutingService:
-    def __init__(self, clusterization_db, simulation_db, logger, tenant_id, params: SimulationParams, hub_id):
+    def __init__(self, clusterization_db, simulation_db, logger, tenant_id, params: SimulationParams, hub_id,
+                 cache_execucao=None):
         self.params = params
         self.clusterization_db = clusterization_db
         self.simulation_db = simulation_db
         self.logger = logger
         self.tenant_id = tenant_id
         self.hub_id = hub_id
+        self.incluir_geometria = not params.geometria_somente_melhor_cenario
+        self.cache_execucao = cache_execucao
 
     @staticmethod
     def _retorno_vazio():
@@ -122,6 +131,22 @@ class TransferRoutingService:
             persistir=persistir,
         )
 
+    def _obter_geometria_trecho(self, origem, destino, velocidade_media_kmh):
+        # Métricas do trecho já foram calculadas; aqui só interessa o traçado para o mapa
+        if not self.incluir_geometria:
+            # Modo só métricas: guarda os vértices, o traçado é buscado apenas para o melhor cenário
+            return [origem, destino]
+        _, _, rota_completa, _ = obter_rota_real_detalhada(
+            origem,
+            destino,
+            self.tenant_id,
+            self.simulation_db,
+            self.logger,
+            velocidade_media_kmh,
+            cache_execucao=self.cache_execucao,
+        )
+        return rota_completa
+
     def rotear_transferencias_para_dataframe(
         self,
         df_clusterizado: pd.DataFrame,
@@ -186,12 +211,26 @@ class TransferRoutingService:
             self.logger,
         )
 
+        matriz_rotas = None
+        if self.params.usar_matriz_osrm:
+            matriz_rotas = carregar_matriz_rotas(
+                [origem] + [(p["lat"], p["lon"]) for p in pontos],
+                logger=self.logger,
+            )
+        if matriz_rotas is None and self.cache_execucao is not None:
+            self.cache_execucao.prefetch(
+                self.simulation_db,
+                montar_pares_rota([origem] + [(p["lat"], p["lon"]) for p in pontos]),
+            )
+
         obter_rota = partial(
-            obter_rota_real,
+            obter_rota_real_metricas,
             tenant_id=self.tenant_id,
             db_conn=self.simulation_db,
             logger=self.logger,
             velocidade_media_kmh=velocidade_media_kmh,
+            matriz_rotas=matriz_rotas,
+            cache_execucao=self.cache_execucao,
         )
 
         rotas = gerar_rotas_savings_transfer(
@@ -258,14 +297,19 @@ class TransferRoutingService:
 
             for ponto in rota:
                 atual = (ponto["lat"], ponto["lon"])
-                dist, tempo, rota_completa, fonte_rota = obter_rota_real_detalhada(
+                dist, tempo, rota_completa, fonte_rota = obter_metricas_rota(
                     anterior,
                     atual,
                     self.tenant_id,
                     self.simulation_db,
                     self.logger,
                     velocidade_media_kmh,
+                    matriz_rotas,
+                    incluir_geometria=self.incluir_geometria,
+                    cache_execucao=self.cache_execucao,
                 )
+                if rota_completa is None:
+                    rota_completa = self._obter_geometria_trecho(anterior, atual, velocidade_media_kmh)
                 dist_real += dist or 0.0
                 tempo_real += tempo or 0.0
                 fontes_metricas.add(fonte_rota)
@@ -275,14 +319,19 @@ class TransferRoutingService:
                 else:
                     sequencia_coord.append(atual)
 
-            dist_back, tempo_back, rota_back, fonte_rota_back = obter_rota_real_detalhada(
+            dist_back, tempo_back, rota_back, fonte_rota_back = obter_metricas_rota(
                 anterior,
                 origem,
                 self.tenant_id,
                 self.simulation_db,
                 self.logger,
                 velocidade_media_kmh,
+                matriz_rotas,
+                incluir_geometria=self.incluir_geometria,
+                cache_execucao=self.cache_execucao,
             )
+            if rota_back is None:
+                rota_back = self._obter_geometria_trecho(anterior, origem, velocidade_media_kmh)
             dist_real += dist_back or 0.0
             tempo_real += tempo_back or 0.0
             fontes_metricas.add(fonte_rota_back)
@@ -346,11 +395,12 @@ class TransferRoutingService:
                 coordenadas_seq=";".join([f"{lat:.6f},{lon:.6f}" for lat, lon in sequencia_coord]),
                 fonte_metricas=(
                     "osrm"
-                    if fontes_metricas.issubset({"osrm", "cache_osrm", "fallback_minimo"})
+                    if fontes_metricas.issubset({"osrm", "cache_osrm", "osrm_table", "fallback_minimo"})
                     else "fallback"
                     if fontes_metricas.issubset({
                         "osrm",
                         "cache_osrm",
+                        "osrm_table",
                         "fallback_minimo",
                         "google",
                         "manual_haversine",
@@ -0,0 +1,237 @@
+# simulation/infrastructure/cache_centros_execucao.py
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from simulation.infrastructure.cache_coordinates import (
+    buscar_coordenadas,
+    cache_localizacoes_tem_geom,
+    salvar_localizacao_cache,
+)
+from simulation.utils.helpers import (
+    RAIO_REVERSE_APROXIMADO_GRAUS,
+    dentro_do_brasil,
+    endereco_centro_desconhecido,
+    reverse_geocode_rede,
+)
+
+SIMULATION_CENTROS_REDE_MAX_WORKERS = int(os.getenv("SIMULATION_CENTROS_REDE_MAX_WORKERS", "4"))
+# Folga (graus) em volta da área das entregas ao carregar cache_localizacoes
+SIMULATION_CENTROS_MARGEM_GRAUS = float(os.getenv("SIMULATION_CENTROS_MARGEM_GRAUS", "0.1"))
+
+
+class ResolvedorCentrosExecucao:
+    """
+    Resolve em lote o endereço/cidade/coordenada dos centros de cluster de uma execução.
+
+    Mesmo critério de ajustar_para_centro_urbano + buscar_coordenadas, mas contra uma
+    KD-tree de cache_localizacoes do tenant carregada uma vez (área das entregas + folga).
+    Só os centros sem vizinho na janela de RAIO_REVERSE_APROXIMADO_GRAUS vão para a rede,
+    em paralelo; o resultado é gravado no cache e entra na árvore para os próximos k.
+    """
+
+    def __init__(self, db_conn, tenant_id, logger=None, max_workers: int = None):
+        self.db_conn = db_conn
+        self.tenant_id = tenant_id
+        self.logger = logger
+        self.max_workers = max(1, int(max_workers or SIMULATION_CENTROS_REDE_MAX_WORKERS))
+
+        self._bbox = None
+        self._coords = np.empty((0, 2), dtype=float)
+        self._enderecos = []
+        self._cidades = []
+        self._coords_por_endereco = {}
+        self._arvore = None
+        self._arvore_cidades = None
+        self._indices_cidades = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.rede = 0
+
+    def _cobre(self, bbox):
+        if self._bbox is None:
+            return False
+        return (
+            self._bbox[0] <= bbox[0] and bbox[1] <= self._bbox[1]
+            and self._bbox[2] <= bbox[2] and bbox[3] <= self._bbox[3]
+        )
+
+    def _carregar(self, bbox):
+        if self._bbox is not None:
+            bbox = (
+                min(bbox[0], self._bbox[0]), max(bbox[1], self._bbox[1]),
+                min(bbox[2], self._bbox[2]), max(bbox[3], self._bbox[3]),
+            )
+
+        margem = SIMULATION_CENTROS_MARGEM_GRAUS
+        bbox = (bbox[0] - margem, bbox[1] + margem, bbox[2] - margem, bbox[3] + margem)
+
+        # com geom, o recorte da área usa o GiST (tenant_id, geom)
+        if cache_localizacoes_tem_geom(self.db_conn):
+            filtro_area = "geom && ST_MakeEnvelope(%(lon_min)s, %(lat_min)s, %(lon_max)s, %(lat_max)s, 4326)"
+        else:
+            filtro_area = (
+                "latitude BETWEEN %(lat_min)s AND %(lat_max)s "
+                "AND longitude BETWEEN %(lon_min)s AND %(lon_max)s"
+            )
+
+        cursor = self.db_conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT endereco_completo, cidade, latitude, longitude
+            FROM cache_localizacoes
+            WHERE tenant_id = %(tenant_id)s
+              AND endereco_completo IS NOT NULL
+              AND {filtro_area}
+            """,
+            {
+                "tenant_id": self.tenant_id,
+                "lat_min": float(bbox[0]), "lat_max": float(bbox[1]),
+                "lon_min": float(bbox[2]), "lon_max": float(bbox[3]),
+            },
+        )
+        linhas = cursor.fetchall()
+        cursor.close()
+
+        self._bbox = bbox
+        self._enderecos = [linha[0] for linha in linhas]
+        self._cidades = [linha[1] for linha in linhas]
+        self._coords = np.array(
+            [(float(linha[2]), float(linha[3])) for linha in linhas],
+            dtype=float,
+        ).reshape(-1, 2)
+        self._coords_por_endereco = {
+            endereco: (lat, lon) for endereco, (lat, lon) in zip(self._enderecos, self._coords.tolist())
+        }
+        self._invalidar_arvores()
+
+        if self.logger:
+            self.logger.info(
+                f"🌳 cache_localizacoes carregado para os centros | registros={len(linhas)} | "
+                f"lat=[{bbox[0]:.3f}, {bbox[1]:.3f}] lon=[{bbox[2]:.3f}, {bbox[3]:.3f}]"
+            )
+
+    def _adicionar(self, endereco, cidade, lat, lon):
+        self._enderecos.append(endereco)
+        self._cidades.append(cidade)
+        self._coords = np.vstack([self._coords, [[lat, lon]]])
+        self._coords_por_endereco.setdefault(endereco, (lat, lon))
+        self._invalidar_arvores()
+
+    def _invalidar_arvores(self):
+        self._arvore = None
+        self._arvore_cidades = None
+        self._indices_cidades = None
+
+    def _construir_arvores(self):
+        # árvore completa para o HIT exato; a de cidades só com registros que têm cidade,
+        # já que buscar_coordenadas grava linhas sem cidade que o reverse aproximado ignora
+        self._arvore = cKDTree(self._coords)
+        self._indices_cidades = np.array(
+            [idx for idx, cidade in enumerate(self._cidades) if cidade is not None], dtype=int
+        )
+        if len(self._indices_cidades):
+            self._arvore_cidades = cKDTree(self._coords[self._indices_cidades])
+
+    def _reverse_local(self, pontos):
+        """Para cada ponto: índice do registro de cache escolhido ou None."""
+        if not len(self._coords) or not len(pontos):
+            return [None] * len(pontos)
+
+        if self._arvore is None:
+            self._construir_arvores()
+
+        # ponto idêntico vale como HIT exato (com ou sem cidade)
+        distancias, indices = self._arvore.query(pontos, k=1)
+        escolhidos = [int(idx) if dist == 0 else None for dist, idx in zip(distancias, indices)]
+
+        if self._arvore_cidades is None:
+            return escolhidos
+
+        # aproximado: todos os registros com cidade na janela quadrada (p=inf), o mais próximo vence
+        raio = RAIO_REVERSE_APROXIMADO_GRAUS
+        janelas = self._arvore_cidades.query_ball_point(pontos, r=raio, p=np.inf)
+        for i, (ponto, janela) in enumerate(zip(pontos, janelas)):
+            if escolhidos[i] is not None or not janela:
+                continue
+            candidatos = self._indices_cidades[janela]
+            dist2 = ((self._coords[candidatos] - ponto) ** 2).sum(axis=1)
+            escolhidos[i] = int(candidatos[np.argmin(dist2)])
+
+        return escolhidos
+
+    def resolver(self, centros: dict, bbox=None) -> dict:
+        """
+        centros: {cluster_id: (lat, lon)}; bbox: (lat_min, lat_max, lon_min, lon_max) das entregas.
+        Retorna {cluster_id: (endereco, cidade, lat, lon)} — lat/lon None quando não houver
+        coordenada para o endereço (o chamador mantém o centro calculado).
+        """
+        resultado = {}
+        pendentes = {}
+
+        for cluster_id, (lat, lon) in centros.items():
+            lat, lon = float(lat), float(lon)
+            if not dentro_do_brasil(lat, lon):
+                resultado[cluster_id] = (
+                    f"Coordenada fora do Brasil ({lat:.5f}, {lon:.5f})", "Fora da UF", None, None
+                )
+            else:
+                pendentes[cluster_id] = (lat, lon)
+
+        if not pendentes:
+            return resultado
+
+        with self._lock:
+            pontos = np.array(list(pendentes.values()), dtype=float)
+            if bbox is None:
+                bbox = (pontos[:, 0].min(), pontos[:, 0].max(), pontos[:, 1].min(), pontos[:, 1].max())
+            if not self._cobre(bbox):
+                self._carregar(bbox)
+
+            sem_cache = {}
+            for (cluster_id, (lat, lon)), idx in zip(pendentes.items(), self._reverse_local(pontos)):
+                if idx is None:
+                    sem_cache[cluster_id] = (lat, lon)
+                    continue
+                endereco = self._enderecos[idx]
+                lat_cache, lon_cache = self._coords_por_endereco[endereco]
+                resultado[cluster_id] = (endereco, self._cidades[idx], lat_cache, lon_cache)
+                self.hits += 1
+
+            if sem_cache:
+                self._resolver_na_rede(sem_cache, resultado)
+
+        return resultado
+
+    def _resolver_na_rede(self, sem_cache: dict, resultado: dict):
+        if self.logger:
+            self.logger.info(f"🔍 Centros sem cache próximo: {len(sem_cache)} → reverse geocoding em paralelo")
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(sem_cache))) as executor:
+            respostas = dict(zip(
+                sem_cache,
+                executor.map(lambda ponto: reverse_geocode_rede(ponto[0], ponto[1], self.logger), sem_cache.values()),
+            ))
+
+        # gravação no banco fica na thread do chamador (conexão única)
+        for cluster_id, (endereco, cidade, fonte) in respostas.items():
+            lat, lon = sem_cache[cluster_id]
+            self.rede += 1
+
+            if not endereco:
+                endereco = endereco_centro_desconhecido(lat, lon)
+                lat_end, lon_end = buscar_coordenadas(endereco, self.tenant_id, self.db_conn, self.logger)
+                resultado[cluster_id] = (endereco, "Desconhecido", lat_end, lon_end)
+                continue
+
+            if endereco not in self._coords_por_endereco:
+                salvar_localizacao_cache(self.db_conn, endereco, lat, lon, fonte, self.tenant_id, cidade=cidade)
+                self._adicionar(endereco, cidade, lat, lon)
+
+            lat_end, lon_end = self._coords_por_endereco[endereco]
+            resultado[cluster_id] = (endereco, cidade, lat_end, lon_end)
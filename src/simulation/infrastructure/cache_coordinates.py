@@ -1,5 +1,6 @@
 # infrastructure/cache_coordinates.py
 import re
+import threading
 
 from geopy.geocoders import Nominatim
 
@@ -12,6 +13,95 @@ PADRAO_CENTRO_DESCONHECIDO = re.compile(
 )
 
 
+# Reverse aproximado: mesma janela quadrada e mesma ordenação (distância euclidiana em graus).
+# A versão legada não usa índice; a KNN usa o GiST (tenant_id, geom) de add_geom_to_cache_localizacoes.sql.
+QUERY_REVERSE_APROXIMADO_LEGADA = """
+    SELECT endereco_completo, cidade, latitude, longitude
+    FROM cache_localizacoes
+    WHERE tenant_id = %(tenant_id)s
+      AND endereco_completo IS NOT NULL
+      AND cidade IS NOT NULL
+      AND ABS(latitude - %(lat)s) <= %(raio)s
+      AND ABS(longitude - %(lon)s) <= %(raio)s
+    ORDER BY POWER(latitude - %(lat)s, 2) + POWER(longitude - %(lon)s, 2)
+    LIMIT 1
+"""
+
+QUERY_REVERSE_APROXIMADO_KNN = """
+    SELECT endereco_completo, cidade, latitude, longitude
+    FROM cache_localizacoes
+    WHERE tenant_id = %(tenant_id)s
+      AND endereco_completo IS NOT NULL
+      AND cidade IS NOT NULL
+      AND geom && ST_Expand(ST_SetSRID(ST_MakePoint(%(lon)s, %(lat)s), 4326), %(raio)s)
+    ORDER BY geom <-> ST_SetSRID(ST_MakePoint(%(lon)s, %(lat)s), 4326)
+    LIMIT 1
+"""
+
+QUERY_REVERSE_EXATO_LEGADA = """
+    SELECT endereco_completo, cidade, latitude, longitude
+    FROM cache_localizacoes
+    WHERE latitude = %(lat)s AND longitude = %(lon)s AND tenant_id = %(tenant_id)s
+"""
+
+QUERY_REVERSE_EXATO_KNN = """
+    SELECT endereco_completo, cidade, latitude, longitude
+    FROM cache_localizacoes
+    WHERE tenant_id = %(tenant_id)s
+      AND geom && ST_SetSRID(ST_MakePoint(%(lon)s, %(lat)s), 4326)
+      AND latitude = %(lat)s AND longitude = %(lon)s
+"""
+
+_colunas_geom = {}
+_colunas_geom_lock = threading.Lock()
+
+
+def cache_localizacoes_tem_geom(db_conn):
+    """True quando a migração add_geom_to_cache_localizacoes.sql já foi aplicada (verificado uma vez por banco)."""
+    chave = getattr(db_conn, "dsn", id(db_conn))
+
+    with _colunas_geom_lock:
+        if chave not in _colunas_geom:
+            cursor = db_conn.cursor()
+            cursor.execute(
+                """
+                SELECT 1
+                FROM information_schema.columns
+                WHERE table_name = 'cache_localizacoes' AND column_name = 'geom'
+                LIMIT 1
+                """
+            )
+            _colunas_geom[chave] = cursor.fetchone() is not None
+            cursor.close()
+
+        return _colunas_geom[chave]
+
+
+def buscar_reverse_em_cache(db_conn, tenant_id, lat, lon, raio_graus):
+    """
+    Reverse em cache_localizacoes: ponto idêntico ou o mais próximo na janela de raio_graus.
+    Retorna (endereco, cidade, latitude, longitude, exato) ou None.
+    """
+    knn = cache_localizacoes_tem_geom(db_conn)
+    parametros = {"tenant_id": tenant_id, "lat": float(lat), "lon": float(lon), "raio": float(raio_graus)}
+
+    cursor = db_conn.cursor()
+    try:
+        cursor.execute(QUERY_REVERSE_EXATO_KNN if knn else QUERY_REVERSE_EXATO_LEGADA, parametros)
+        row = cursor.fetchone()
+        if row:
+            return row[0], row[1], row[2], row[3], True
+
+        cursor.execute(QUERY_REVERSE_APROXIMADO_KNN if knn else QUERY_REVERSE_APROXIMADO_LEGADA, parametros)
+        row = cursor.fetchone()
+        if row:
+            return row[0], row[1], row[2], row[3], False
+    finally:
+        cursor.close()
+
+    return None
+
+
 def _extrair_coordenadas_de_centro_desconhecido(endereco):
     if not isinstance(endereco, str):
         return None
@@ -0,0 +1,138 @@
+# simulation/infrastructure/cache_rotas_execucao.py
+
+import os
+import threading
+from collections import OrderedDict
+
+SIMULATION_ROUTE_CACHE_MAX_ITENS = int(os.getenv("SIMULATION_ROUTE_CACHE_MAX_ITENS", "100000"))
+
+
+class CacheRotasExecucao:
+    """
+    Cache de métricas de rota (distância/tempo) com escopo de uma execução da simulação.
+    Evita repetir o SELECT em cache_rotas para os mesmos trechos em k=0 e em cada k.
+    Chave: par de coordenadas formatadas ('lon,lat', 'lon,lat').
+    """
+
+    def __init__(self, tenant_id: str, logger=None, max_itens: int = None):
+        self.tenant_id = tenant_id
+        self.logger = logger
+        self.max_itens = max(1, int(max_itens or SIMULATION_ROUTE_CACHE_MAX_ITENS))
+        self._itens = OrderedDict()
+        self._ausentes = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.prefetch_consultas = 0
+        self.prefetch_carregados = 0
+
+    def obter(self, origem_str: str, destino_str: str):
+        """Retorna (distancia_km, tempo_min, fonte) ou None, atualizando os contadores."""
+        chave = (origem_str, destino_str)
+        with self._lock:
+            metricas = self._itens.get(chave)
+            if metricas is None:
+                self.misses += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.hits += 1
+            return metricas
+
+    def sabidamente_ausente(self, origem_str: str, destino_str: str) -> bool:
+        """True quando o prefetch já confirmou que o trecho não existe em cache_rotas."""
+        with self._lock:
+            return (origem_str, destino_str) in self._ausentes
+
+    def registrar(self, origem_str: str, destino_str: str, distancia_km, tempo_min, fonte="osrm"):
+        if distancia_km is None or tempo_min is None:
+            return
+        chave = (origem_str, destino_str)
+        with self._lock:
+            self._ausentes.discard(chave)
+            self._itens[chave] = (float(distancia_km), float(tempo_min), fonte)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def prefetch(self, db_conn, pares):
+        """
+        Carrega de uma vez, via unnest, os trechos de cache_rotas (fonte OSRM) dos pares informados.
+        pares: iterável de (origem_str, destino_str) já formatados.
+        """
+        with self._lock:
+            pendentes = list({
+                par for par in pares
+                if par[0] != par[1] and par not in self._itens and par not in self._ausentes
+            })
+        if not pendentes:
+            return 0
+
+        query = """
+            SELECT c.origem, c.destino, c.distancia_km, c.tempo_minutos
+            FROM cache_rotas c
+            JOIN unnest(%s::text[], %s::text[]) AS p(origem, destino)
+              ON c.origem = p.origem AND c.destino = p.destino
+            WHERE c.tenant_id = %s
+              AND COALESCE(c.fonte, c.rota_json::jsonb ->> 'fonte') = 'osrm'
+        """
+        cursor = db_conn.cursor()
+        try:
+            cursor.execute(query, (
+                [origem for origem, _ in pendentes],
+                [destino for _, destino in pendentes],
+                self.tenant_id,
+            ))
+            rows = cursor.fetchall()
+        except Exception as e:
+            db_conn.rollback()
+            if self.logger:
+                self.logger.warning(f"⚠️ Prefetch de cache_rotas falhou: {e}")
+            return 0
+        finally:
+            cursor.close()
+
+        encontrados = set()
+        for origem_str, destino_str, distancia_km, tempo_min in rows:
+            if distancia_km is None or tempo_min is None:
+                continue
+            self.registrar(origem_str, destino_str, distancia_km, tempo_min, "cache_osrm")
+            encontrados.add((origem_str, destino_str))
+
+        with self._lock:
+            self._ausentes.update(par for par in pendentes if par not in encontrados)
+            self.prefetch_consultas += 1
+            self.prefetch_carregados += len(encontrados)
+
+        if self.logger:
+            self.logger.info(
+                f"📥 Prefetch cache_rotas | pares={len(pendentes)} | encontrados={len(encontrados)}"
+            )
+        return len(encontrados)
+
+    def exportar(self) -> dict:
+        """Snapshot serializável (para semear/mesclar o cache entre processos de cenários k)."""
+        with self._lock:
+            return {"itens": list(self._itens.items()), "ausentes": list(self._ausentes)}
+
+    def importar(self, snapshot: dict):
+        if not snapshot:
+            return
+        for (origem_str, destino_str), (distancia_km, tempo_min, fonte) in snapshot.get("itens", []):
+            self.registrar(origem_str, destino_str, distancia_km, tempo_min, fonte)
+        with self._lock:
+            self._ausentes.update(
+                tuple(par) for par in snapshot.get("ausentes", [])
+                if tuple(par) not in self._itens
+            )
+
+    def resumo(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "taxa_hit": round(self.hits / total, 4) if total else 0.0,
+                "itens": len(self._itens),
+                "prefetch_consultas": self.prefetch_consultas,
+                "prefetch_carregados": self.prefetch_carregados,
+            }
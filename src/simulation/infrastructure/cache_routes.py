@@ -2,17 +2,24 @@
 
 import json
 import math
+import os
 from geopy.distance import geodesic
+from googlemaps.convert import decode_polyline, encode_polyline
 from simulation.utils.google_api import buscar_rota_google
-from simulation.utils.osrm_api import buscar_rota_osrm  # 🔹 Import OSRM
-from simulation.utils.rate_limiter import RateLimiter
+from simulation.utils.osrm_api import (  # 🔹 Import OSRM
+    buscar_matriz_osrm,
+    buscar_rota_osrm,
+    buscar_rotas_osrm_em_lote,
+)
+from utils.rate_governor import obter_governador
 
 # 🚦 Valores mínimos para evitar rotas "zeradas"
 MIN_DIST_KM = 0.03   # 30 metros
 MIN_TIME_MIN = 0.2   # 12 segundos
 MANUAL_ROUTE_DISTANCE_FACTOR = 1.2
 DEFAULT_MANUAL_FALLBACK_SPEED_KMH = 60.0
-GOOGLE_RATE_LIMITER = RateLimiter(max_calls_per_sec=10)
+# Limite de pontos por requisição /table (max-table-size padrão do osrm-routed é 100)
+OSRM_TABLE_MAX_PONTOS = int(os.getenv("OSRM_TABLE_MAX_PONTOS", "100"))
 
 
 def _formatar_coord(coord: tuple) -> str:
@@ -77,15 +84,26 @@ def _calcular_rota_manual(origem, destino, velocidade_media_kmh=None, logger=Non
     return distancia_km, tempo_min, coordenadas
 
 
-def _montar_rota_json(origem_str, destino_str, distancia_km, tempo_min, rota_completa_dicts):
-    return {
+def _montar_rota_json(origem_str, destino_str, distancia_km, tempo_min, rota_completa_dicts=None):
+    rota_json = {
         "origem": origem_str,
         "destino": destino_str,
         "distancia_km": float(distancia_km),
         "tempo_minutos": float(tempo_min),
-        "coordenadas": rota_completa_dicts,
         "fonte": "osrm",
     }
+    # Formato novo: geometria fica em rota_polyline; rota_json guarda só os metadados
+    if rota_completa_dicts is not None:
+        rota_json["coordenadas"] = rota_completa_dicts
+    return rota_json
+
+
+def _codificar_polyline(rota_completa_dicts):
+    return encode_polyline([(float(p["lat"]), float(p["lon"])) for p in rota_completa_dicts])
+
+
+def _decodificar_polyline(rota_polyline):
+    return [{"lat": p["lat"], "lon": p["lng"]} for p in decode_polyline(rota_polyline)]
 
 
 def _extrair_rota_cache(rota_json):
@@ -123,25 +141,27 @@ def _salvar_cache(db_conn, origem_str, destino_str, tenant_id,
         destino_str,
         distancia_km,
         tempo_min,
-        rota_completa_dicts,
     )
     rota_json["fonte"] = fonte
 
     insert = """
         INSERT INTO cache_rotas (
-            origem, destino, distancia_km, tempo_minutos, rota_json, tenant_id
+            origem, destino, distancia_km, tempo_minutos, rota_json, rota_polyline, fonte, tenant_id
         )
-        VALUES (%s, %s, %s, %s, %s, %s)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         ON CONFLICT (origem, destino, tenant_id) DO UPDATE SET
             distancia_km = EXCLUDED.distancia_km,
             tempo_minutos = EXCLUDED.tempo_minutos,
-            rota_json = EXCLUDED.rota_json
+            rota_json = EXCLUDED.rota_json,
+            rota_polyline = EXCLUDED.rota_polyline,
+            fonte = EXCLUDED.fonte
     """
     cursor = db_conn.cursor()
     cursor.execute(insert, (
         origem_str, destino_str,
         float(distancia_km), float(tempo_min),
-        json.dumps(rota_json), tenant_id
+        json.dumps(rota_json), _codificar_polyline(rota_completa_dicts),
+        fonte, tenant_id
     ))
     db_conn.commit()
     cursor.close()
@@ -150,11 +170,86 @@ def _salvar_cache(db_conn, origem_str, destino_str, tenant_id,
         logger.info(f"✅ Cache salvo para {origem_str} -> {destino_str}")
 
 
+def _migrar_linha_cache(db_conn, origem_str, destino_str, tenant_id, rota_json, coordenadas, logger=None):
+    """Converte uma linha antiga (coordenadas em rota_json) para rota_polyline + metadados."""
+    try:
+        rota_json_compacto = {k: v for k, v in rota_json.items() if k not in ("coordenadas", "rota_completa")}
+        cursor = db_conn.cursor()
+        cursor.execute("""
+            UPDATE cache_rotas
+            SET rota_polyline = %s, fonte = %s, rota_json = %s
+            WHERE origem = %s AND destino = %s AND tenant_id = %s
+        """, (
+            _codificar_polyline(coordenadas),
+            rota_json.get("fonte"),
+            json.dumps(rota_json_compacto),
+            origem_str, destino_str, tenant_id,
+        ))
+        db_conn.commit()
+        cursor.close()
+    except Exception as e:
+        db_conn.rollback()
+        if logger:
+            logger.warning(f"⚠️ Falha ao migrar cache_rotas {origem_str} -> {destino_str}: {e}")
+
+
+def _buscar_rota_cache(db_conn, origem_str, destino_str, tenant_id, incluir_geometria=True, logger=None):
+    """
+    Lê um trecho de cache_rotas. Retorna (distancia_km, tempo_min, coordenadas, fonte) ou None.
+    Sem geometria, lê apenas as colunas numéricas (não traz nem decodifica o traçado).
+    """
+    cursor = db_conn.cursor()
+    if not incluir_geometria:
+        cursor.execute("""
+            SELECT distancia_km, tempo_minutos, COALESCE(fonte, rota_json::jsonb ->> 'fonte')
+            FROM cache_rotas
+            WHERE origem = %s AND destino = %s AND tenant_id = %s
+        """, (origem_str, destino_str, tenant_id))
+        row = cursor.fetchone()
+        cursor.close()
+        if not row or row[0] is None or row[1] is None:
+            return None
+        return float(row[0]), float(row[1]), None, row[2]
+
+    cursor.execute("""
+        SELECT distancia_km, tempo_minutos, fonte, rota_polyline,
+               CASE WHEN rota_polyline IS NULL THEN rota_json END
+        FROM cache_rotas
+        WHERE origem = %s AND destino = %s AND tenant_id = %s
+    """, (origem_str, destino_str, tenant_id))
+    row = cursor.fetchone()
+    cursor.close()
+    if not row:
+        return None
+
+    distancia_km, tempo_min, fonte, rota_polyline, rota_json_raw = row
+    if rota_polyline:
+        if distancia_km is None or tempo_min is None:
+            return None
+        return float(distancia_km), float(tempo_min), _decodificar_polyline(rota_polyline), fonte
+
+    # Linha no formato antigo: usa rota_json e migra para polyline
+    rota_json = json.loads(rota_json_raw) if isinstance(rota_json_raw, str) else rota_json_raw
+    rota_cache = _extrair_rota_cache(rota_json)
+    if not rota_cache:
+        if logger:
+            logger.warning(f"⚠️ Cache inválido ignorado {origem_str} -> {destino_str}")
+        return None
+
+    _migrar_linha_cache(
+        db_conn, origem_str, destino_str, tenant_id, rota_json, rota_cache[2], logger
+    )
+    return rota_cache
+
+
 def _buscar_rota_google_rate_limited(origem, destino, logger=None):
     if logger:
         logger.info("🚦 Aplicando rate limit antes da chamada ao Google.")
-    GOOGLE_RATE_LIMITER.wait()
-    return buscar_rota_google(origem, destino)
+    governador = obter_governador("google_routes")
+    governador.aguardar()
+    resultado = buscar_rota_google(origem, destino)
+    governador.registrar("ok" if resultado and resultado[0] is not None else "erro")
+    return resultado
 
 
 def _obter_rota_detalhada(
@@ -164,7 +259,17 @@ def _obter_rota_detalhada(
     db_conn,
     logger=None,
     velocidade_media_kmh=None,
+    incluir_geometria=True,
+    cache_execucao=None,
+    resultado_osrm=None,
 ):
+    """
+    Retorna (distancia_km, tempo_min, coordenadas, fonte).
+    Com incluir_geometria=False, rotas OSRM/cache retornam coordenadas None
+    (somente métricas, sem baixar/decodificar o traçado).
+    cache_execucao (CacheRotasExecucao) evita repetir consultas ao banco na mesma execução.
+    resultado_osrm: resposta OSRM já obtida em lote (evita nova requisição no cache miss).
+    """
     # 🔥 VALIDAR ANTES DE QUALQUER COISA
     if not origem or not destino:
         if logger:
@@ -186,42 +291,49 @@ def _obter_rota_detalhada(
         distancia_km, tempo_min, coordenadas = _rota_minima(origem, destino, logger)
         return distancia_km, tempo_min, coordenadas, "fallback_minimo"
 
-    query = """
-        SELECT rota_json
-        FROM cache_rotas
-        WHERE origem = %s AND destino = %s AND tenant_id = %s
-    """
-    cursor = db_conn.cursor()
-    cursor.execute(query, (origem_str, destino_str, tenant_id))
-    row = cursor.fetchone()
-    cursor.close()
+    if cache_execucao is not None and not incluir_geometria:
+        metricas = cache_execucao.obter(origem_str, destino_str)
+        if metricas:
+            return metricas[0], metricas[1], None, metricas[2]
 
-    if row:
-        rota_json = json.loads(row[0]) if isinstance(row[0], str) else row[0]
-        rota_cache = _extrair_rota_cache(rota_json)
-        if rota_cache:
-            distancia_km, tempo_min, coordenadas, fonte_cache = rota_cache
+    rota_cache = None
+    if cache_execucao is None or not cache_execucao.sabidamente_ausente(origem_str, destino_str):
+        rota_cache = _buscar_rota_cache(
+            db_conn, origem_str, destino_str, tenant_id, incluir_geometria, logger
+        )
 
-            if distancia_km is None or tempo_min is None:
-                if logger:
-                    logger.warning(f"⚠️ Cache inválido descartado {origem_str} -> {destino_str}")
-            else:
-                if fonte_cache == "osrm":
-                    if logger:
-                        logger.info(f"🚗 Cache HIT OSRM: {origem_str} → {destino_str}")
-                    return distancia_km, tempo_min, coordenadas, "cache_osrm"
-
-                if logger:
-                    logger.warning(
-                        f"⚠️ Cache sem fonte OSRM para {origem_str} -> {destino_str}. Recalculando rota."
-                    )
-        elif logger:
-            logger.warning(f"⚠️ Cache inválido ignorado {origem_str} -> {destino_str}")
+    if rota_cache:
+        distancia_km, tempo_min, coordenadas, fonte_cache = rota_cache
+
+        if fonte_cache == "osrm":
+            if logger:
+                logger.info(f"🚗 Cache HIT OSRM: {origem_str} → {destino_str}")
+            if cache_execucao is not None:
+                cache_execucao.registrar(
+                    origem_str, destino_str, distancia_km, tempo_min, "cache_osrm"
+                )
+            return distancia_km, tempo_min, coordenadas, "cache_osrm"
+
+        if logger:
+            logger.warning(
+                f"⚠️ Cache sem fonte OSRM para {origem_str} -> {destino_str}. Recalculando rota."
+            )
 
     if logger:
         logger.info(f"🔍 Cache MISS (rota): {origem_str} → {destino_str} → tentando OSRM...")
 
-    distancia_km, tempo_min, rota_raw = buscar_rota_osrm(origem, destino)
+    if not incluir_geometria:
+        distancia_km, tempo_min, _ = buscar_rota_osrm(origem, destino, incluir_geometria=False)
+        if distancia_km is not None and tempo_min is not None:
+            # Sem traçado não há o que gravar em cache_rotas; fica só no cache da execução
+            if cache_execucao is not None:
+                cache_execucao.registrar(origem_str, destino_str, distancia_km, tempo_min, "osrm")
+            return float(distancia_km), float(tempo_min), None, "osrm"
+
+    if resultado_osrm is not None:
+        distancia_km, tempo_min, rota_raw = resultado_osrm
+    else:
+        distancia_km, tempo_min, rota_raw = buscar_rota_osrm(origem, destino)
     if (
         distancia_km is not None
         and tempo_min is not None
@@ -243,6 +355,8 @@ def _obter_rota_detalhada(
                 logger,
                 fonte="osrm",
             )
+            if cache_execucao is not None:
+                cache_execucao.registrar(origem_str, destino_str, distancia_km, tempo_min, "osrm")
             return float(distancia_km), float(tempo_min), rota_completa_dicts, "osrm"
 
     if logger:
@@ -280,6 +394,295 @@ def _obter_rota_detalhada(
     return distancia_km, tempo_min, coordenadas, "manual_haversine"
 
 
+def obter_rotas_detalhadas_em_lote(
+    pares,
+    tenant_id: str,
+    db_conn,
+    logger=None,
+    velocidade_media_kmh=None,
+    cache_execucao=None,
+):
+    """
+    Versão em lote de obter_rota_real_detalhada (com geometria).
+    Os trechos ausentes de cache_rotas são buscados no OSRM em paralelo;
+    o restante do fluxo (cache, gravação, Google, manual) segue trecho a trecho.
+    Retorna lista de (distancia_km, tempo_min, coordenadas, fonte) na ordem de `pares`.
+    """
+    candidatos = {}
+    for origem, destino in pares:
+        try:
+            o = (float(origem[0]), float(origem[1]))
+            d = (float(destino[0]), float(destino[1]))
+        except Exception:
+            continue
+        chave = (_formatar_coord(o), _formatar_coord(d))
+        if chave[0] == chave[1] or _distancia_haversine_km(o, d) * 1000 < 30:
+            continue
+        candidatos[chave] = (o, d)
+
+    em_cache = set()
+    if candidatos:
+        query = """
+            SELECT c.origem, c.destino
+            FROM cache_rotas c
+            JOIN unnest(%s::text[], %s::text[]) AS p(origem, destino)
+              ON c.origem = p.origem AND c.destino = p.destino
+            WHERE c.tenant_id = %s
+              AND COALESCE(c.fonte, c.rota_json::jsonb ->> 'fonte') = 'osrm'
+        """
+        cursor = db_conn.cursor()
+        try:
+            cursor.execute(query, (
+                [origem_str for origem_str, _ in candidatos],
+                [destino_str for _, destino_str in candidatos],
+                tenant_id,
+            ))
+            em_cache = {(row[0], row[1]) for row in cursor.fetchall()}
+        except Exception as e:
+            db_conn.rollback()
+            if logger:
+                logger.warning(f"⚠️ Consulta em lote de cache_rotas falhou: {e}")
+        finally:
+            cursor.close()
+
+    faltantes = [chave for chave in candidatos if chave not in em_cache]
+    resultados_osrm = {}
+    if faltantes:
+        if logger:
+            logger.info(f"🌐 OSRM em lote | trechos={len(faltantes)} | em cache={len(em_cache)}")
+        resultados_osrm = dict(zip(
+            faltantes,
+            buscar_rotas_osrm_em_lote([candidatos[chave] for chave in faltantes]),
+        ))
+
+    resultados = []
+    for origem, destino in pares:
+        try:
+            chave = (
+                _formatar_coord((float(origem[0]), float(origem[1]))),
+                _formatar_coord((float(destino[0]), float(destino[1]))),
+            )
+        except Exception:
+            chave = None
+        resultados.append(_obter_rota_detalhada(
+            origem,
+            destino,
+            tenant_id,
+            db_conn,
+            logger,
+            velocidade_media_kmh,
+            cache_execucao=cache_execucao,
+            resultado_osrm=resultados_osrm.get(chave),
+        ))
+    return resultados
+
+
+class MatrizRotasOSRM:
+    """
+    Matriz de distância/tempo (OSRM /table) de um conjunto de pontos,
+    indexada pela coordenada formatada.
+    """
+
+    def __init__(self, chaves, distancias_km, tempos_min):
+        self._indice = {chave: i for i, chave in enumerate(chaves)}
+        self._distancias_km = distancias_km
+        self._tempos_min = tempos_min
+
+    def __len__(self):
+        return len(self._indice)
+
+    def obter(self, origem, destino):
+        """Retorna (distancia_km, tempo_min) do trecho ou None se não houver valor válido."""
+        try:
+            i = self._indice.get(_formatar_coord((float(origem[0]), float(origem[1]))))
+            j = self._indice.get(_formatar_coord((float(destino[0]), float(destino[1]))))
+        except Exception:
+            return None
+        if i is None or j is None or i == j:
+            return None
+
+        distancia_km = self._distancias_km[i][j]
+        tempo_min = self._tempos_min[i][j]
+        if distancia_km is None or tempo_min is None:
+            return None
+        # Rotas zeradas entre pontos distintos não são confiáveis (mesmo critério do /route)
+        if distancia_km <= 0.0 or tempo_min <= 0.0:
+            return None
+        return float(distancia_km), float(tempo_min)
+
+    def tempos_para(self, pontos):
+        """Submatriz de tempos (min) na ordem de `pontos`; None onde não houver valor."""
+        indices = []
+        for ponto in pontos:
+            try:
+                indices.append(self._indice.get(_formatar_coord((float(ponto[0]), float(ponto[1])))))
+            except Exception:
+                indices.append(None)
+        return [
+            [
+                self._tempos_min[i][j] if i is not None and j is not None and i != j else None
+                for j in indices
+            ]
+            for i in indices
+        ]
+
+
+def carregar_matriz_rotas(pontos, logger=None, max_pontos=None):
+    """
+    Monta a matriz de rotas de todos os pontos com o mínimo de requisições /table.
+    Conjuntos maiores que `max_pontos` são divididos em blocos origem x destino.
+    Retorna MatrizRotasOSRM ou None quando não houver pontos/valores suficientes.
+    """
+    max_pontos = max(2, int(max_pontos or OSRM_TABLE_MAX_PONTOS))
+
+    chaves = []
+    coords = []
+    vistos = set()
+    for ponto in pontos:
+        try:
+            lat, lon = float(ponto[0]), float(ponto[1])
+        except Exception:
+            continue
+        if math.isnan(lat) or math.isnan(lon):
+            continue
+        chave = _formatar_coord((lat, lon))
+        if chave in vistos:
+            continue
+        vistos.add(chave)
+        chaves.append(chave)
+        coords.append((lat, lon))
+
+    total = len(coords)
+    if total < 2:
+        return None
+
+    distancias_km = [[None] * total for _ in range(total)]
+    tempos_min = [[None] * total for _ in range(total)]
+
+    tamanho_bloco = total if total <= max_pontos else max_pontos // 2
+    blocos = [list(range(ini, min(ini + tamanho_bloco, total))) for ini in range(0, total, tamanho_bloco)]
+
+    requisicoes = 0
+    falhas = 0
+    for bloco_origem in blocos:
+        for bloco_destino in blocos:
+            if bloco_origem is bloco_destino:
+                indices = bloco_origem
+                fontes = destinos = None
+            else:
+                indices = bloco_origem + bloco_destino
+                fontes = list(range(len(bloco_origem)))
+                destinos = list(range(len(bloco_origem), len(indices)))
+
+            requisicoes += 1
+            dist_bloco, tempo_bloco = buscar_matriz_osrm(
+                [coords[i] for i in indices],
+                fontes=fontes,
+                destinos=destinos,
+            )
+            if dist_bloco is None:
+                falhas += 1
+                continue
+
+            for a, i in enumerate(bloco_origem):
+                for b, j in enumerate(bloco_destino):
+                    distancias_km[i][j] = dist_bloco[a][b]
+                    tempos_min[i][j] = tempo_bloco[a][b]
+
+    if falhas == requisicoes:
+        if logger:
+            logger.warning(
+                f"⚠️ OSRM /table indisponível para {total} pontos. Usando cálculo trecho a trecho."
+            )
+        return None
+
+    if logger:
+        logger.info(
+            f"🧮 Matriz OSRM carregada | pontos={total} | requisições={requisicoes} | falhas={falhas}"
+        )
+    return MatrizRotasOSRM(chaves, distancias_km, tempos_min)
+
+
+def montar_pares_rota(pontos):
+    """Todos os pares ordenados (origem_str, destino_str) entre os pontos distintos informados."""
+    chaves = []
+    for ponto in pontos:
+        try:
+            lat, lon = float(ponto[0]), float(ponto[1])
+        except Exception:
+            continue
+        if math.isnan(lat) or math.isnan(lon):
+            continue
+        chaves.append(_formatar_coord((lat, lon)))
+    chaves = list(dict.fromkeys(chaves))
+    return [(a, b) for a in chaves for b in chaves if a != b]
+
+
+def obter_metricas_rota(
+    origem: tuple,
+    destino: tuple,
+    tenant_id: str,
+    db_conn,
+    logger=None,
+    velocidade_media_kmh=None,
+    matriz_rotas=None,
+    incluir_geometria=True,
+    cache_execucao=None,
+):
+    """
+    Igual a _obter_rota_detalhada, mas lê distância/tempo da matriz quando disponível.
+    Trechos vindos da matriz retornam coordenadas None e fonte 'osrm_table'.
+    """
+    if matriz_rotas is not None and origem and destino:
+        try:
+            distancia_metros = _distancia_haversine_km(
+                (float(origem[0]), float(origem[1])),
+                (float(destino[0]), float(destino[1])),
+            ) * 1000
+        except Exception:
+            distancia_metros = None
+
+        if distancia_metros is not None and distancia_metros >= 30:
+            metricas = matriz_rotas.obter(origem, destino)
+            if metricas:
+                return metricas[0], metricas[1], None, "osrm_table"
+
+    return _obter_rota_detalhada(
+        origem,
+        destino,
+        tenant_id,
+        db_conn,
+        logger,
+        velocidade_media_kmh,
+        incluir_geometria,
+        cache_execucao,
+    )
+
+
+def obter_rota_real_metricas(
+    origem: tuple,
+    destino: tuple,
+    tenant_id: str,
+    db_conn,
+    logger=None,
+    velocidade_media_kmh=None,
+    matriz_rotas=None,
+    cache_execucao=None,
+):
+    distancia_km, tempo_min, coordenadas, _ = obter_metricas_rota(
+        origem,
+        destino,
+        tenant_id,
+        db_conn,
+        logger,
+        velocidade_media_kmh,
+        matriz_rotas,
+        incluir_geometria=False,
+        cache_execucao=cache_execucao,
+    )
+    return distancia_km, tempo_min, coordenadas or []
+
+
 def obter_rota_real_detalhada(
     origem: tuple,
     destino: tuple,
@@ -287,6 +690,7 @@ def obter_rota_real_detalhada(
     db_conn,
     logger=None,
     velocidade_media_kmh=None,
+    cache_execucao=None,
 ):
     return _obter_rota_detalhada(
         origem,
@@ -295,6 +699,7 @@ def obter_rota_real_detalhada(
         db_conn,
         logger,
         velocidade_media_kmh,
+        cache_execucao=cache_execucao,
     )
 
 
@@ -306,6 +711,7 @@ def obter_rota_last_mile_detalhada(
     db_conn,
     logger=None,
     velocidade_media_kmh=None,
+    cache_execucao=None,
 ):
     return _obter_rota_detalhada(
         origem,
@@ -314,6 +720,7 @@ def obter_rota_last_mile_detalhada(
         db_conn,
         logger,
         velocidade_media_kmh,
+        cache_execucao=cache_execucao,
     )
 
 
@@ -324,6 +731,7 @@ def obter_rota_real(
     db_conn,
     logger=None,
     velocidade_media_kmh=None,
+    cache_execucao=None,
 ):
     distancia_km, tempo_min, coordenadas, _ = obter_rota_real_detalhada(
         origem,
@@ -332,6 +740,7 @@ def obter_rota_real(
         db_conn,
         logger,
         velocidade_media_kmh,
+        cache_execucao,
     )
     return distancia_km, tempo_min, coordenadas
 
@@ -343,6 +752,7 @@ def obter_rota_last_mile(
     db_conn,
     logger=None,
     velocidade_media_kmh=None,
+    cache_execucao=None,
 ):
     distancia_km, tempo_min, coordenadas, _ = obter_rota_last_mile_detalhada(
         origem,
@@ -352,5 +762,6 @@ def obter_rota_last_mile(
         db_conn,
         logger,
         velocidade_media_kmh,
+        cache_execucao,
     )
     return distancia_km, tempo_min, coordenadas
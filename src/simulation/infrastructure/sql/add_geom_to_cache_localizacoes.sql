@@ -0,0 +1,20 @@
+CREATE EXTENSION IF NOT EXISTS postgis;
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- Coluna gerada: preenche as linhas existentes no ALTER (reescreve a tabela) e
+-- acompanha qualquer INSERT/UPDATE de latitude/longitude sem mudar quem grava.
+ALTER TABLE public.cache_localizacoes
+ADD COLUMN IF NOT EXISTS geom geometry(Point, 4326)
+GENERATED ALWAYS AS (
+    ST_SetSRID(ST_MakePoint(longitude::double precision, latitude::double precision), 4326)
+) STORED;
+
+-- (tenant_id, geom): filtro por tenant + ORDER BY geom <-> ponto (KNN) no mesmo índice
+CREATE INDEX IF NOT EXISTS idx_cache_localizacoes_tenant_geom
+ON public.cache_localizacoes
+USING gist (tenant_id, geom);
+
+ANALYZE public.cache_localizacoes;
+
+-- Consultas usadas por simulation.utils.helpers.ajustar_para_centro_urbano e pelo
+-- ResolvedorCentrosExecucao; simulation/benchmark_cache_localizacoes.py compara com a busca antiga.
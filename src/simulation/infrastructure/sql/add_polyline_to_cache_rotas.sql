@@ -0,0 +1,8 @@
+ALTER TABLE public.cache_rotas
+ADD COLUMN IF NOT EXISTS rota_polyline text;
+
+ALTER TABLE public.cache_rotas
+ADD COLUMN IF NOT EXISTS fonte text;
+
+-- Linhas antigas (rota_json com lista de coordenadas) são migradas sob demanda na leitura
+-- por simulation.infrastructure.cache_routes.
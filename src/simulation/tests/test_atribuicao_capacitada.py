@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+import utils.atribuicao_capacitada as atribuicao
+from utils.atribuicao_capacitada import atribuir_com_capacidade, limites_de_tamanho
+
+
+def _coordenadas(n, seed=0):
+    rng = np.random.default_rng(seed)
+    # dois grupos desbalanceados (70% / 30%) perto de Fortaleza
+    grande = rng.normal([-3.73, -38.52], 0.02, (int(n * 0.7), 2))
+    pequeno = rng.normal([-3.80, -38.45], 0.01, (n - len(grande), 2))
+    return np.vstack([grande, pequeno])
+
+
+@pytest.mark.parametrize("total", [1, 7, 10, 97, 100])
+@pytest.mark.parametrize("k", [1, 3, 7])
+@pytest.mark.parametrize("tolerancia", [0, 1, 2])
+def test_limites_de_tamanho_sempre_viaveis(total, k, tolerancia):
+    if k > total:
+        pytest.skip("k maior que o total de pontos")
+
+    minimo, maximo = limites_de_tamanho(total, k, tolerancia)
+
+    assert 0 <= minimo <= total // k <= maximo
+    assert k * minimo <= total <= k * maximo
+
+
+@pytest.mark.parametrize("n, k, tolerancia", [(60, 3, 0), (97, 5, 1), (200, 7, 2)])
+def test_tamanhos_dentro_dos_limites(n, k, tolerancia):
+    coords = _coordenadas(n)
+    centros = coords[np.linspace(0, n - 1, k).astype(int)]
+    minimo, maximo = limites_de_tamanho(n, k, tolerancia)
+
+    rotulos, centros_finais = atribuir_com_capacidade(coords, centros, minimo, maximo)
+
+    tamanhos = np.bincount(rotulos, minlength=k)
+    assert len(rotulos) == n
+    assert tamanhos.sum() == n
+    assert tamanhos.min() >= minimo
+    assert tamanhos.max() <= maximo
+    assert centros_finais.shape == (k, 2)
+
+
+def test_fallback_para_todos_os_centros_quando_vizinhos_inviavel(monkeypatch):
+    # todos os pontos perto do centro 0: só com o vizinho mais próximo o fluxo é inviável
+    rng = np.random.default_rng(1)
+    coords = rng.normal([-3.73, -38.52], 0.001, (30, 2))
+    centros = np.array([[-3.73, -38.52], [-3.90, -38.70], [-3.50, -38.30]])
+    minimo, maximo = limites_de_tamanho(len(coords), len(centros), 0)
+
+    chamadas = []
+    original = atribuicao._resolver_fluxo
+
+    def espiao(dist2, minimo_, maximo_, vizinhos):
+        resultado = original(dist2, minimo_, maximo_, vizinhos)
+        chamadas.append((vizinhos, resultado is None))
+        return resultado
+
+    monkeypatch.setattr(atribuicao, "_resolver_fluxo", espiao)
+
+    rotulos, _ = atribuir_com_capacidade(coords, centros, minimo, maximo, vizinhos=1)
+
+    assert chamadas[0] == (1, True)
+    assert chamadas[1] == (0, False)
+    assert np.bincount(rotulos, minlength=3).tolist() == [10, 10, 10]
+
+
+def test_subconjunto_de_vizinhos_viavel_nao_usa_fallback(monkeypatch):
+    coords = _coordenadas(90)
+    centros = coords[[0, 45, 80]]
+    minimo, maximo = limites_de_tamanho(len(coords), 3, 5)
+
+    vizinhos_usados = []
+    original = atribuicao._resolver_fluxo
+
+    def espiao(dist2, minimo_, maximo_, vizinhos):
+        vizinhos_usados.append(vizinhos)
+        return original(dist2, minimo_, maximo_, vizinhos)
+
+    monkeypatch.setattr(atribuicao, "_resolver_fluxo", espiao)
+
+    atribuir_com_capacidade(coords, centros, minimo, maximo, vizinhos=3)
+
+    assert vizinhos_usados and all(v == 3 for v in vizinhos_usados)
+
+
+@pytest.mark.parametrize(
+    "minimo, maximo",
+    [
+        (4, 5),  # 3 x 4 = 12 > 10 pontos
+        (0, 3),  # 3 x 3 = 9 < 10 pontos
+    ],
+)
+def test_limites_inviaveis_levantam_value_error(minimo, maximo):
+    coords = _coordenadas(10)
+    centros = coords[:3]
+
+    with pytest.raises(ValueError):
+        atribuir_com_capacidade(coords, centros, minimo, maximo)
@@ -0,0 +1,81 @@
+import pytest
+
+from simulation.domain.simulation_service import SimulationService
+
+
+def _avaliador(funcao):
+    avaliados = []
+
+    def avaliar(k):
+        avaliados.append(k)
+        return funcao(k)
+
+    return avaliar, avaliados
+
+
+def _melhor_k(custos):
+    return min(custos, key=lambda k: (custos[k], k))
+
+
+def test_curva_unimodal_encontra_minimo_com_menos_avaliacoes():
+    k_values = list(range(1, 41))
+    avaliar, avaliados = _avaliador(lambda k: (k - 23) ** 2 + 5)
+
+    custos = SimulationService.buscar_k_adaptativo(k_values, avaliar)
+
+    assert _melhor_k(custos) == 23
+    assert custos[23] == 5
+    assert len(avaliados) < len(k_values)
+    assert len(avaliados) == len(set(avaliados)), "cada k deve ser avaliado uma única vez"
+
+
+@pytest.mark.parametrize("minimo", [1, 2, 39, 40])
+def test_curva_unimodal_com_minimo_na_borda(minimo):
+    k_values = list(range(1, 41))
+    avaliar, avaliados = _avaliador(lambda k: abs(k - minimo))
+
+    custos = SimulationService.buscar_k_adaptativo(k_values, avaliar)
+
+    assert _melhor_k(custos) == minimo
+    assert len(avaliados) < len(k_values)
+
+
+@pytest.mark.parametrize("invalido", [lambda k: None, lambda k: float("inf")])
+def test_todos_invalidos_fica_no_inicio(invalido):
+    k_values = list(range(1, 41))
+    avaliar, avaliados = _avaliador(invalido)
+
+    custos = SimulationService.buscar_k_adaptativo(k_values, avaliar)
+
+    assert all(valor == float("inf") for valor in custos.values())
+    assert k_values[0] in custos
+    assert _melhor_k(custos) == k_values[0]
+    # depois de chegar ao início da faixa, o refinamento local não volta para o meio
+    depois_do_inicio = avaliados[avaliados.index(k_values[0]):]
+    assert all(k <= k_values[1] for k in depois_do_inicio)
+    assert len(avaliados) < len(k_values)
+
+
+def test_lista_vazia_nao_avalia():
+    avaliar, avaliados = _avaliador(lambda k: k)
+
+    assert SimulationService.buscar_k_adaptativo([], avaliar) == {}
+    assert avaliados == []
+
+
+@pytest.mark.parametrize(
+    "k_values, custos_por_k, esperado",
+    [
+        ([5], {5: 7.0}, 5),
+        ([5, 6], {5: 3.0, 6: 1.0}, 6),
+        ([4, 5, 6], {4: 2.0, 5: 1.0, 6: 3.0}, 5),
+    ],
+)
+def test_listas_curtas_avaliam_todos(k_values, custos_por_k, esperado):
+    avaliar, avaliados = _avaliador(custos_por_k.get)
+
+    custos = SimulationService.buscar_k_adaptativo(k_values, avaliar)
+
+    assert sorted(avaliados) == k_values
+    assert custos == custos_por_k
+    assert _melhor_k(custos) == esperado
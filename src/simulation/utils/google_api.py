@@ -2,7 +2,8 @@
 
 import googlemaps
 import os
-import requests
+
+from utils.routing_http_client import obter_cliente_roteamento
 
 GOOGLE_MAPS_API_KEY = (
     os.getenv("GOOGLE_API_KEY")
@@ -50,11 +51,10 @@ def buscar_endereco_google(lat: float, lon: float):
     }
 
     try:
-        response = requests.get(base_url, params=params, timeout=10)
-        if response.status_code != 200:
+        status, data = obter_cliente_roteamento().get_json_sync(base_url, params=params)
+        if status != 200 or not data:
             return None, None
 
-        data = response.json()
         if data.get("status") != "OK" or not data.get("results"):
             return None, None
 
@@ -91,12 +91,11 @@ def buscar_rota_google(origem: tuple, destino: tuple):
         "key": GOOGLE_MAPS_API_KEY
     }
 
-    response = requests.get(base_url, params=params)
-    if response.status_code != 200:
+    status, data = obter_cliente_roteamento().get_json_sync(base_url, params=params)
+    if status != 200 or not data:
         return None, None, []
 
-    data = response.json()
-    if not data["routes"]:
+    if not data.get("routes"):
         return None, None, []
 
     route = data["routes"][0]
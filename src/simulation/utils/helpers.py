@@ -5,10 +5,12 @@ import pandas as pd
 from sklearn.neighbors import KernelDensity
 from geopy.geocoders import Nominatim
 from geopy.distance import geodesic
+from geopy.exc import GeocoderQuotaExceeded, GeocoderRateLimited, GeocoderTimedOut
 
 from simulation.config import UF_BOUNDS
-from simulation.infrastructure.cache_coordinates import salvar_localizacao_cache
+from simulation.infrastructure.cache_coordinates import buscar_reverse_em_cache, salvar_localizacao_cache
 from simulation.utils.google_api import buscar_endereco_google
+from utils.rate_governor import obter_governador
 
 from datetime import date
 import pandas as pd
@@ -87,84 +89,85 @@ def encontrar_centro_mais_denso(df_cluster):
 
 
 
+BRASIL_BOUNDS = {
+    "min_lat": -33.7500,
+    "max_lat": 5.3000,
+    "min_lon": -73.9900,
+    "max_lon": -34.7500
+}
+
+# Janela (graus) da busca aproximada do reverse em cache_localizacoes
+RAIO_REVERSE_APROXIMADO_GRAUS = 0.03
+
+
+def dentro_do_brasil(lat, lon):
+    return (
+        BRASIL_BOUNDS["min_lat"] <= lat <= BRASIL_BOUNDS["max_lat"]
+        and BRASIL_BOUNDS["min_lon"] <= lon <= BRASIL_BOUNDS["max_lon"]
+    )
+
+
 def ajustar_para_centro_urbano(lat, lon, db_conn, tenant_id, logger=None):
     """
     Ajusta um ponto denso para o centro urbano mais próximo usando reverse geocoding com cache.
     Se já existir no cache, usa o cache. Se falhar, retorna uma string padrão.
     """
 
-    BRASIL_BOUNDS = {
-        "min_lat": -33.7500,
-        "max_lat": 5.3000,
-        "min_lon": -73.9900,
-        "max_lon": -34.7500
-    }
-
-    if not (BRASIL_BOUNDS["min_lat"] <= lat <= BRASIL_BOUNDS["max_lat"] and
-            BRASIL_BOUNDS["min_lon"] <= lon <= BRASIL_BOUNDS["max_lon"]):
+    if not dentro_do_brasil(lat, lon):
         return f"Coordenada fora do Brasil ({lat:.5f}, {lon:.5f})", "Fora da UF"
 
-    # 🔍 Verificar cache
-    cursor = db_conn.cursor()
-    query = """
-        SELECT endereco_completo, cidade
-        FROM cache_localizacoes
-        WHERE latitude = %s AND longitude = %s AND tenant_id = %s
-    """
-    cursor.execute(query, (lat, lon, tenant_id))
-    row = cursor.fetchone()
+    # 🔍 Verificar cache (ponto exato ou mais próximo na janela; KNN/GiST quando houver geom)
+    row = buscar_reverse_em_cache(db_conn, tenant_id, lat, lon, RAIO_REVERSE_APROXIMADO_GRAUS)
 
     if row:
-        if logger: logger.info(f"📍 Reverse cache HIT: {row[0]}")
-        cursor.close()
-        return row[0], row[1]
-
-    query_aproximada = """
-        SELECT endereco_completo, cidade, latitude, longitude
-        FROM cache_localizacoes
-        WHERE tenant_id = %s
-          AND endereco_completo IS NOT NULL
-          AND cidade IS NOT NULL
-          AND ABS(latitude - %s) <= %s
-          AND ABS(longitude - %s) <= %s
-        ORDER BY POWER(latitude - %s, 2) + POWER(longitude - %s, 2)
-        LIMIT 1
-    """
-    raio_aproximado_graus = 0.03
-    cursor.execute(
-        query_aproximada,
-        (
-            tenant_id,
-            lat,
-            raio_aproximado_graus,
-            lon,
-            raio_aproximado_graus,
-            lat,
-            lon,
-        ),
-    )
-    row_aproximada = cursor.fetchone()
-
-    if row_aproximada:
+        endereco, cidade, lat_cache, lon_cache, exato = row
         if logger:
-            logger.info(
-                "📍 Reverse cache HIT aproximado: "
-                f"{row_aproximada[0]} "
-                f"(~{abs(float(row_aproximada[2]) - float(lat)) + abs(float(row_aproximada[3]) - float(lon)):.5f} graus)"
-            )
-        cursor.close()
-        return row_aproximada[0], row_aproximada[1]
+            if exato:
+                logger.info(f"📍 Reverse cache HIT: {endereco}")
+            else:
+                logger.info(
+                    "📍 Reverse cache HIT aproximado: "
+                    f"{endereco} "
+                    f"(~{abs(float(lat_cache) - float(lat)) + abs(float(lon_cache) - float(lon)):.5f} graus)"
+                )
+        return endereco, cidade
 
-    cursor.close()
     if logger:
         logger.info("🔍 Reverse cache MISS: tentando Nominatim...")
 
-    # 🔁 Tentar Nominatim reverse geocoding
+    endereco, cidade, fonte = reverse_geocode_rede(lat, lon, logger)
+    if endereco:
+        salvar_localizacao_cache(
+            db_conn,
+            endereco,
+            lat,
+            lon,
+            fonte,
+            tenant_id,
+            cidade=cidade,
+        )
+        return endereco, cidade
+
+    return endereco_centro_desconhecido(lat, lon), "Desconhecido"
+
+
+def endereco_centro_desconhecido(lat, lon):
+    return f"Centro desconhecido ({lat:.5f}, {lon:.5f})"
+
+
+def reverse_geocode_rede(lat, lon, logger=None):
+    """
+    Reverse geocoding sem tocar no banco: Nominatim e, se falhar, Google.
+    Retorna (endereco, cidade, fonte) ou (None, None, None).
+    """
+    # 🔁 Tentar Nominatim reverse geocoding (endpoint público: taxa compartilhada entre workers)
+    governador_nominatim = obter_governador("nominatim_publico")
     try:
         geolocator = Nominatim(user_agent="cluster_router_sim")
+        governador_nominatim.aguardar()
         location = geolocator.reverse((lat, lon), timeout=10, language="pt")
+        governador_nominatim.registrar("ok")
         if location and location.address:
-            address = location.address
             cidade = (
                 location.raw["address"].get("city")
                 or location.raw["address"].get("town")
@@ -174,45 +177,38 @@ def ajustar_para_centro_urbano(lat, lon, db_conn, tenant_id, logger=None):
                 or location.raw["address"].get("state_district")
                 or "Desconhecido"
             )
-
-            salvar_localizacao_cache(
-                db_conn,
-                address,
-                lat,
-                lon,
-                "reverse_nominatim",
-                tenant_id,
-                cidade=cidade,
-            )
-            return address, cidade
+            return location.address, cidade, "reverse_nominatim"
+    except (GeocoderRateLimited, GeocoderQuotaExceeded) as e:
+        governador_nominatim.registrar("throttle")
+        if logger:
+            logger.warning(f"Nominatim limitou a taxa: {e}")
+    except GeocoderTimedOut as e:
+        governador_nominatim.registrar("timeout")
+        if logger:
+            logger.warning(f"Nominatim timeout: {e}")
     except Exception as e:
+        governador_nominatim.registrar("erro")
         if logger:
             logger.warning(f"Nominatim falhou: {e}")
 
     if logger:
         logger.info("⚠️ Reverse Nominatim falhou. Tentando Google Maps...")
 
+    governador_google = obter_governador("google_geocode")
+    governador_google.aguardar()
     endereco_google, cidade_google = buscar_endereco_google(lat, lon)
+    governador_google.registrar("ok" if endereco_google else "erro")
     if endereco_google:
-        salvar_localizacao_cache(
-            db_conn,
-            endereco_google,
-            lat,
-            lon,
-            "reverse_google",
-            tenant_id,
-            cidade=cidade_google,
-        )
         if logger:
             logger.info(f"📍 Reverse Google HIT: {endereco_google}")
-        return endereco_google, cidade_google
+        return endereco_google, cidade_google, "reverse_google"
 
     # Falha total
     if logger:
         logger.warning(
             f"⚠️ Reverse geocoding falhou para ({lat:.5f}, {lon:.5f})"
         )
-    return f"Centro desconhecido ({lat:.5f}, {lon:.5f})", "Desconhecido"
+    return None, None, None
 
 
 
@@ -1,8 +1,60 @@
 # hub_router_1.0.1/src/simulation/utils/ortools_time_windows.py
 
+import numpy as np
+
 from simulation.domain.entities import SimulationParams
 from ortools.constraint_solver import pywrapcp, routing_enums_pb2
 
+RAIO_TERRA_KM = 6371.0
+
+
+def compute_haversine_time_matrix(points, velocidade_kmh=45.0, fator_correcao=1.3):
+    """
+    Matriz de tempo (min, inteiros >= 1 fora da diagonal) via haversine vetorizado.
+    points: [(lat, lon), ...]
+    """
+    coords = np.radians(np.asarray(points, dtype=float).reshape(-1, 2))
+    lat = coords[:, 0]
+    lon = coords[:, 1]
+
+    dlat = lat[None, :] - lat[:, None]
+    dlon = lon[None, :] - lon[:, None]
+    a = (
+        np.sin(dlat / 2) ** 2
+        + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    )
+    dist_km = 2 * RAIO_TERRA_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    velocidade = max(float(velocidade_kmh or 45.0), 1)
+    tempo_min = (dist_km * float(fator_correcao) / velocidade) * 60.0
+
+    matrix = np.maximum(1, np.rint(tempo_min)).astype(np.int64)
+    np.fill_diagonal(matrix, 0)
+    return matrix
+
+
+def compute_osrm_time_matrix(points, fallback_matrix, logger=None):
+    """
+    Matriz de tempo (min) por estrada via OSRM /table (em blocos, ver carregar_matriz_rotas).
+    Células sem valor válido usam fallback_matrix (haversine).
+    """
+    from simulation.infrastructure.cache_routes import carregar_matriz_rotas
+
+    matriz_rotas = carregar_matriz_rotas(points, logger=logger)
+    if matriz_rotas is None:
+        return fallback_matrix
+
+    tempos = np.array(matriz_rotas.tempos_para(points), dtype=float)
+    tempos[~(tempos > 0)] = np.nan
+
+    matrix = np.where(
+        np.isnan(tempos),
+        fallback_matrix,
+        np.maximum(1, np.rint(np.nan_to_num(tempos))),
+    ).astype(np.int64)
+    np.fill_diagonal(matrix, 0)
+    return matrix
+
 
 def solve_time_windows_vrp(
     locations,
@@ -16,14 +68,14 @@ def solve_time_windows_vrp(
     delivery_debug_rows=None,
     retry_depth=0,
     max_retry_depth=1,
+    time_matrix=None,
 ):
     """
     Retorna rotas como lista de listas de índices DAS ENTREGAS ORIGINAIS.
     Ex.: [[0, 5, 2], [1, 3, 4]]
+    time_matrix: matriz de tempo já calculada (depot na posição 0), reaproveitada no retry.
     """
 
-    import math
-
     max_special_per_route = params.max_especiais_por_rota
     route_time_limit_min = (
         int(route_time_limit_min)
@@ -55,46 +107,6 @@ def solve_time_windows_vrp(
     if max_special_per_route <= 0:
         raise ValueError("max_special_per_route deve ser maior que zero.")
 
-    # ------------------------------------------------------------------
-    # Função auxiliar: matriz de tempo via haversine
-    # ------------------------------------------------------------------
-    def compute_haversine_time_matrix(points, velocidade_kmh=45.0):
-        n = len(points)
-        matrix = [[0] * n for _ in range(n)]
-        r_km = 6371.0
-
-        for i in range(n):
-            lat1, lon1 = points[i]
-
-            for j in range(n):
-                if i == j:
-                    continue
-
-                lat2, lon2 = points[j]
-
-                dlat = math.radians(lat2 - lat1)
-                dlon = math.radians(lon2 - lon1)
-
-                a = (
-                    math.sin(dlat / 2) ** 2
-                    + math.cos(math.radians(lat1))
-                    * math.cos(math.radians(lat2))
-                    * math.sin(dlon / 2) ** 2
-                )
-
-                c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-                dist_km = r_km * c
-
-                fator = getattr(params, "fator_correcao_distancia", 1.3)
-                velocidade = max(float(params.velocidade_kmh or 45.0), 1)
-
-                dist_real = dist_km * fator
-                tempo_min = (dist_real / velocidade) * 60.0
-
-                matrix[i][j] = max(1, int(round(tempo_min)))
-
-        return matrix
-
     # ------------------------------------------------------------------
     # Monta nós com depot real na posição 0
     # ------------------------------------------------------------------
@@ -111,10 +123,15 @@ def solve_time_windows_vrp(
     # ------------------------------------------------------------------
     # Matriz de tempo
     # ------------------------------------------------------------------
-    time_matrix = compute_haversine_time_matrix(
-        all_locations,
-        velocidade_kmh=velocidade_kmh,
-    )
+    if time_matrix is None:
+        time_matrix = compute_haversine_time_matrix(
+            all_locations,
+            velocidade_kmh=velocidade_kmh,
+            fator_correcao=getattr(params, "fator_correcao_distancia", 1.3),
+        )
+        if params.tw_usar_matriz_osrm:
+            time_matrix = compute_osrm_time_matrix(all_locations, time_matrix)
+    time_matrix = np.asarray(time_matrix, dtype=np.int64)
 
     # ------------------------------------------------------------------
     # Quantidade de veículos (CONTROLADO PELO PIPELINE)
@@ -145,14 +162,9 @@ def solve_time_windows_vrp(
         routing.SetFixedCostOfVehicle(int(fixed_cost), v)
 
     # ------------------------------------------------------------------
-    # Callback de custo base: tempo de deslocamento
+    # Custo base: tempo de deslocamento (matriz registrada no solver, sem callback Python)
     # ------------------------------------------------------------------
-    def distance_callback(from_index, to_index):
-        from_node = manager.IndexToNode(from_index)
-        to_node = manager.IndexToNode(to_index)
-        return time_matrix[from_node][to_node]
-
-    transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+    transit_callback_index = routing.RegisterTransitMatrix(time_matrix.tolist())
     routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
 
     # ------------------------------------------------------------------
@@ -160,13 +172,7 @@ def solve_time_windows_vrp(
     # ------------------------------------------------------------------
     special_demands = [1 if flag else 0 for flag in all_special_flags]
 
-    def special_demand_callback(from_index):
-        node = manager.IndexToNode(from_index)
-        return special_demands[node]
-
-    special_callback_index = routing.RegisterUnaryTransitCallback(
-        special_demand_callback
-    )
+    special_callback_index = routing.RegisterUnaryTransitVector(special_demands)
 
     routing.AddDimensionWithVehicleCapacity(
         special_callback_index,
@@ -187,13 +193,7 @@ def solve_time_windows_vrp(
     # ------------------------------------------------------------------
     delivery_demands = [0] + [1] * len(locations)
 
-    def delivery_demand_callback(from_index):
-        node = manager.IndexToNode(from_index)
-        return delivery_demands[node]
-
-    delivery_callback_index = routing.RegisterUnaryTransitCallback(
-        delivery_demand_callback
-    )
+    delivery_callback_index = routing.RegisterUnaryTransitVector(delivery_demands)
 
     routing.AddDimensionWithVehicleCapacity(
         delivery_callback_index,
@@ -206,13 +206,9 @@ def solve_time_windows_vrp(
     # ------------------------------------------------------------------
     # Time dimension = deslocamento + tempo de serviço
     # ------------------------------------------------------------------
-    def time_callback(from_index, to_index):
-        from_node = manager.IndexToNode(from_index)
-        travel_time = time_matrix[from_node][manager.IndexToNode(to_index)]
-        service_time = all_service_times[from_node]
-        return int(travel_time + service_time)
+    service_matrix = time_matrix + np.asarray(all_service_times, dtype=np.int64)[:, None]
 
-    time_callback_index = routing.RegisterTransitCallback(time_callback)
+    time_callback_index = routing.RegisterTransitMatrix(service_matrix.tolist())
 
     routing.AddDimension(
         time_callback_index,
@@ -268,13 +264,14 @@ def solve_time_windows_vrp(
     # Busca
     # ------------------------------------------------------------------
     search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-    search_parameters.first_solution_strategy = (
-        routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
+    search_parameters.first_solution_strategy = getattr(
+        routing_enums_pb2.FirstSolutionStrategy,
+        params.tw_estrategia_primeira_solucao,
     )
     search_parameters.local_search_metaheuristic = (
         routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
     )
-    search_parameters.time_limit.FromSeconds(10)
+    search_parameters.time_limit.FromSeconds(int(params.tw_tempo_limite_solver_seg))
 
     print(f"[TW DEBUG] tempo_max={route_time_limit_min} | vehicles={num_vehicles}")
     print(f"[TW DEBUG] maior_service_time={max(service_times) if service_times else 0}")
@@ -355,6 +352,7 @@ def solve_time_windows_vrp(
                     delivery_debug_rows=delivery_debug_rows,
                     retry_depth=retry_depth + 1,
                     max_retry_depth=max_retry_depth,
+                    time_matrix=time_matrix,
                 )
 
         print(
@@ -369,7 +367,7 @@ def solve_time_windows_vrp(
                     detalhe = dict(delivery_debug_rows[original_idx])
                     detalhe["solver_idx"] = original_idx
                     node_idx = original_idx + 1
-                    tempo_unitario = (
+                    tempo_unitario = int(
                         time_matrix[0][node_idx]
                         + all_service_times[node_idx]
                         + time_matrix[node_idx][0]
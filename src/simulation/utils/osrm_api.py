@@ -1,12 +1,14 @@
 # simulation/utils/osrm_api.py
 
 import os
-import requests
+
+from utils.routing_http_client import obter_cliente_roteamento
 
 # Lê host e porta do .env, com valores padrão
 OSRM_HOST = os.getenv("OSRM_HOST", "osrm_service")
 OSRM_PORT = os.getenv("OSRM_PORT", "5000")
 OSRM_MAX_SNAP_DISTANCE_METERS = float(os.getenv("OSRM_MAX_SNAP_DISTANCE_METERS", "5000"))
+OSRM_TABLE_TIMEOUT_SEC = float(os.getenv("OSRM_TABLE_TIMEOUT_SEC", "30"))
 
 
 def _rota_osrm_invalida(data, origem, destino):
@@ -43,31 +45,69 @@ def _rota_osrm_invalida(data, origem, destino):
 
     return False
 
-def buscar_rota_osrm(origem: tuple, destino: tuple):
+def buscar_rota_osrm(origem: tuple, destino: tuple, incluir_geometria: bool = True):
     """
     Busca rota no OSRM.
 
     Args:
         origem (tuple): (lat, lon)
         destino (tuple): (lat, lon)
+        incluir_geometria (bool): se False, pede overview=false e retorna só as métricas
 
     Returns:
         tuple: (distancia_km, tempo_min, rota_completa)
     """
     try:
-        lat1, lon1 = origem
-        lat2, lon2 = destino
+        url, params = _montar_requisicao_rota(origem, destino, incluir_geometria)
+    except Exception as e:
+        print(f"❌ Erro no OSRM: {e}")
+        return None, None, []
 
-        url = (
-            f"http://{OSRM_HOST}:{OSRM_PORT}/route/v1/driving/"
-            f"{lon1},{lat1};{lon2},{lat2}?overview=full&geometries=geojson"
-        )
+    status, data = obter_cliente_roteamento().get_json_sync(url, params=params)
+    return _interpretar_resposta_rota(status, data, origem, destino, incluir_geometria)
 
-        response = requests.get(url, timeout=10)
-        if response.status_code != 200:
+
+def buscar_rotas_osrm_em_lote(pares: list, incluir_geometria: bool = True):
+    """
+    Busca várias rotas no OSRM em paralelo (conexões reaproveitadas, concorrência limitada).
+
+    Args:
+        pares (list): [((lat, lon), (lat, lon)), ...]
+
+    Returns:
+        list: [(distancia_km, tempo_min, rota_completa), ...] na mesma ordem de `pares`
+    """
+    requisicoes = [
+        _montar_requisicao_rota(origem, destino, incluir_geometria)
+        for origem, destino in pares
+    ]
+    respostas = obter_cliente_roteamento().get_json_varios_sync(requisicoes)
+    return [
+        _interpretar_resposta_rota(status, data, origem, destino, incluir_geometria)
+        for (status, data), (origem, destino) in zip(respostas, pares)
+    ]
+
+
+def _montar_requisicao_rota(origem, destino, incluir_geometria):
+    lat1, lon1 = origem
+    lat2, lon2 = destino
+    url = (
+        f"http://{OSRM_HOST}:{OSRM_PORT}/route/v1/driving/"
+        f"{lon1},{lat1};{lon2},{lat2}"
+    )
+    params = (
+        {"overview": "full", "geometries": "geojson"}
+        if incluir_geometria
+        else {"overview": "false"}
+    )
+    return url, params
+
+
+def _interpretar_resposta_rota(status, data, origem, destino, incluir_geometria):
+    try:
+        if status != 200 or not data:
             return None, None, []
 
-        data = response.json()
         if "routes" not in data or not data["routes"]:
             return None, None, []
         if _rota_osrm_invalida(data, origem, destino):
@@ -77,6 +117,9 @@ def buscar_rota_osrm(origem: tuple, destino: tuple):
         distancia_km = round(route["distance"] / 1000, 2)
         tempo_min = round(route["duration"] / 60, 2)
 
+        if not incluir_geometria:
+            return distancia_km, tempo_min, []
+
         # Usa geometry diretamente, que sempre vem preenchido
         rota_completa = [(lat, lon) for lon, lat in route["geometry"]["coordinates"]]
 
@@ -86,3 +129,82 @@ def buscar_rota_osrm(origem: tuple, destino: tuple):
         print(f"❌ Erro no OSRM: {e}")
         return None, None, []
 
+
+
+def _snap_osrm_invalido(waypoint):
+    return float((waypoint or {}).get("distance") or 0.0) > OSRM_MAX_SNAP_DISTANCE_METERS
+
+
+def buscar_matriz_osrm(pontos: list, fontes: list = None, destinos: list = None):
+    """
+    Busca matriz de distâncias/tempos no OSRM (/table) em uma única requisição.
+
+    Args:
+        pontos (list): [(lat, lon), ...]
+        fontes (list): índices de `pontos` usados como origem (padrão: todos)
+        destinos (list): índices de `pontos` usados como destino (padrão: todos)
+
+    Returns:
+        tuple: (distancias_km, tempos_min) como listas de listas [fonte][destino],
+        com None nas células sem rota válida; (None, None) em caso de falha.
+    """
+    try:
+        if len(pontos) < 2:
+            return None, None
+
+        coords = ";".join(f"{float(lon)},{float(lat)}" for lat, lon in pontos)
+        url = f"http://{OSRM_HOST}:{OSRM_PORT}/table/v1/driving/{coords}"
+        params = {"annotations": "distance,duration"}
+        if fontes is not None:
+            params["sources"] = ";".join(str(i) for i in fontes)
+        if destinos is not None:
+            params["destinations"] = ";".join(str(i) for i in destinos)
+
+        status, data = obter_cliente_roteamento().get_json_sync(
+            url,
+            params=params,
+            timeout=OSRM_TABLE_TIMEOUT_SEC,
+        )
+        if status != 200 or not data:
+            print(f"⚠️ OSRM /table retornou status {status}")
+            return None, None
+
+        if data.get("code") != "Ok" or "distances" not in data or "durations" not in data:
+            print(f"⚠️ OSRM /table sem matriz válida: {data.get('code')}")
+            return None, None
+
+        fontes_invalidas = {i for i, wp in enumerate(data.get("sources") or []) if _snap_osrm_invalido(wp)}
+        destinos_invalidos = {
+            j for j, wp in enumerate(data.get("destinations") or []) if _snap_osrm_invalido(wp)
+        }
+        if fontes_invalidas or destinos_invalidos:
+            print(
+                "⚠️ OSRM /table descartou pontos por snap distante demais | "
+                f"origens={len(fontes_invalidas)} | destinos={len(destinos_invalidos)}"
+            )
+
+        distancias_km = []
+        tempos_min = []
+        for i, (linha_dist, linha_tempo) in enumerate(zip(data["distances"], data["durations"])):
+            linha_km = []
+            linha_min = []
+            for j, (dist_m, tempo_s) in enumerate(zip(linha_dist, linha_tempo)):
+                if (
+                    i in fontes_invalidas
+                    or j in destinos_invalidos
+                    or dist_m is None
+                    or tempo_s is None
+                ):
+                    linha_km.append(None)
+                    linha_min.append(None)
+                else:
+                    linha_km.append(round(dist_m / 1000, 2))
+                    linha_min.append(round(tempo_s / 60, 2))
+            distancias_km.append(linha_km)
+            tempos_min.append(linha_min)
+
+        return distancias_km, tempos_min
+
+    except Exception as e:
+        print(f"❌ Erro no OSRM /table: {e}")
+        return None, None
@@ -1,17 +1,9 @@
 #transfer_routing/domain/route_planning.py
 
 from copy import deepcopy
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from functools import partial
 
 from transfer_routing.infrastructure.vehicle_selector import obter_tipo_veiculo_por_peso
-from transfer_routing.infrastructure.geolocation import get_route
-from transfer_routing.infrastructure.database_connection import conectar_banco_routing, fechar_conexao
-
-def calcular_distancia_e_tempo(p1, p2, obter_rota):
-    distancia, tempo, _ = obter_rota((p1["lat"], p1["lon"]), (p2["lat"], p2["lon"]))
-    return distancia or 0.0, tempo or 0.0
-
+from transfer_routing.infrastructure.geolocation import obter_matriz_rotas
 
 def expandir_pontos_por_capacidade(pontos, conn, tenant_id, logger):
     with conn.cursor() as cursor:
@@ -96,6 +88,97 @@ def expandir_pontos_por_capacidade(pontos, conn, tenant_id, logger):
     return novos_pontos
 
 
+def _juntar_rotas_por_savings(
+    pontos,
+    savings,
+    tempo_pontos,
+    ida_tempo,
+    volta_tempo,
+    tempo_maximo,
+    tempo_parada_leve,
+    tempo_parada_pesada,
+    tempo_por_volume,
+    peso_leve_max,
+):
+    """
+    Clarke-Wright: junta a rota que termina em i com a rota que começa em j.
+    Cada rota guarda peso, volumes, cargas e o tempo de trânsito interno (entre seus pontos),
+    e os índices por ponto inicial/final tornam a busca e a checagem de cada saving O(1).
+    Retorna a lista de rotas (listas de índices) na mesma ordem da junção sequencial.
+    """
+    rota_por_inicio = {}
+    rota_por_fim = {}
+    for idx, ponto in enumerate(pontos):
+        rota = {
+            "ordem": idx,
+            "pontos": [idx],
+            "peso": ponto["peso"],
+            "volumes": ponto["volumes"],
+            "transito": 0.0,
+            "cargas": {ponto.get("carga_id", ponto.get("cluster_id"))},
+            "capacidade": float(ponto.get("capacidade_maxima_veiculo") or 0.0),
+        }
+        rota_por_inicio[idx] = rota
+        rota_por_fim[idx] = rota
+
+    proxima_ordem = len(pontos)
+    for _, i, j in savings:
+        rota_i = rota_por_fim.get(i)
+        rota_j = rota_por_inicio.get(j)
+        if rota_i is None or rota_j is None or rota_i is rota_j:
+            continue
+
+        if not rota_i["cargas"].isdisjoint(rota_j["cargas"]):
+            continue
+
+        peso_total_rota = rota_i["peso"] + rota_j["peso"]
+        capacidade_maxima_rota = max(rota_i["capacidade"], rota_j["capacidade"])
+        if capacidade_maxima_rota > 0 and peso_total_rota > capacidade_maxima_rota:
+            continue
+
+        # Tempo de trânsito sem volta: hub -> início de i ... i -> j ... fim de j
+        transito = rota_i["transito"] + tempo_pontos[i][j] + rota_j["transito"]
+        tempo_transito = ida_tempo[rota_i["pontos"][0]] + transito
+        tempo_volta = volta_tempo[rota_j["pontos"][-1]]
+
+        # Tempo de parada: leve/pesada é definido pela carga total embarcada
+        # no veículo e aplicado uniformemente em todas as paradas da rota.
+        parada_rota = (
+            tempo_parada_pesada
+            if peso_total_rota > peso_leve_max
+            else tempo_parada_leve
+        )
+        qtd_paradas = len(rota_i["pontos"]) + len(rota_j["pontos"])
+        volumes_total = rota_i["volumes"] + rota_j["volumes"]
+        tempo_total = (
+            tempo_transito
+            + qtd_paradas * parada_rota
+            + volumes_total * tempo_por_volume
+            + tempo_volta
+        )
+        if tempo_total > tempo_maximo:
+            continue
+
+        nova_rota = {
+            "ordem": proxima_ordem,
+            "pontos": rota_i["pontos"] + rota_j["pontos"],
+            "peso": peso_total_rota,
+            "volumes": volumes_total,
+            "transito": transito,
+            "cargas": rota_i["cargas"] | rota_j["cargas"],
+            "capacidade": capacidade_maxima_rota,
+        }
+        proxima_ordem += 1
+
+        del rota_por_fim[i]
+        del rota_por_inicio[j]
+        rota_por_inicio[nova_rota["pontos"][0]] = nova_rota
+        rota_por_fim[nova_rota["pontos"][-1]] = nova_rota
+
+    rotas = sorted(rota_por_inicio.values(), key=lambda rota: rota["ordem"])
+    return [rota["pontos"] for rota in rotas]
+
+
 def gerar_rotas_transferencias(
     df_entregas,
     origem,
@@ -104,7 +187,6 @@ def gerar_rotas_transferencias(
     tempo_parada_pesada,
     tempo_por_volume,
     peso_leve_max,
-    obter_rota,
     conn,
     tenant_id,
     logger,
@@ -145,50 +227,43 @@ def gerar_rotas_transferencias(
     pontos = expandir_pontos_por_capacidade(pontos, conn, tenant_id, logger)
     logger.info(f"Total de pontos após expansão por capacidade: {len(pontos)}")
 
-    # Matriz de distâncias e tempos — paralela, cada thread abre sua própria conexão
-    logger.info("Calculando matriz de distâncias (paralelo)...")
+    # Matriz de distâncias e tempos (pontos + hub): cache em lote e só os faltantes no OSRM
+    logger.info("Calculando matriz de distâncias...")
     if progress_callback:
         progress_callback(15, "Calculando matriz de distâncias")
 
-    pares = [(i, j) for i in range(len(pontos)) for j in range(len(pontos)) if i != j]
-    total_pares = len(pares)
-
-    def _calcular_par(par):
-        i, j = par
-        conn_t = conectar_banco_routing()
-        try:
-            fn = partial(get_route, tenant_id=tenant_id, conn=conn_t, logger=None)
-            d, t = calcular_distancia_e_tempo(pontos[i], pontos[j], fn)
-            return (i, j), (d, t)
-        finally:
-            fechar_conexao(conn_t)
-
-    matriz_dist = {}
-    concluidos = 0
-    max_workers = min(8, max(1, total_pares))
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(_calcular_par, par): par for par in pares}
-        for future in as_completed(futures):
-            key, value = future.result()
-            matriz_dist[key] = value
-            concluidos += 1
-            if progress_callback and total_pares > 0:
-                pct = 15 + int(concluidos / total_pares * 55)
-                progress_callback(pct, f"Matriz: {concluidos}/{total_pares} pares")
-
-    rotas = [[i] for i in range(len(pontos))]
+    def _progresso_matriz(concluidos, total_pares):
+        if progress_callback:
+            pct = 15 + int(concluidos / total_pares * 55)
+            progress_callback(pct, f"Matriz: {concluidos}/{total_pares} pares")
+
+    n_pontos = len(pontos)
+    coords = [(ponto["lat"], ponto["lon"]) for ponto in pontos] + [tuple(origem)]
+    matriz_dist = obter_matriz_rotas(
+        coords, tenant_id, conn, logger=logger, progress_callback=_progresso_matriz
+    )
+
+    dist_pontos = [[0.0] * n_pontos for _ in range(n_pontos)]
+    tempo_pontos = [[0.0] * n_pontos for _ in range(n_pontos)]
+    ida_dist, ida_tempo = [0.0] * n_pontos, [0.0] * n_pontos
+    volta_dist, volta_tempo = [0.0] * n_pontos, [0.0] * n_pontos
+    for (i, j), (d, t) in matriz_dist.items():
+        if i == n_pontos:
+            ida_dist[j], ida_tempo[j] = d, t
+        elif j == n_pontos:
+            volta_dist[i], volta_tempo[i] = d, t
+        else:
+            dist_pontos[i][j] = d
+            tempo_pontos[i][j] = t
 
     # Calculando savings
     if progress_callback:
         progress_callback(70, "Calculando savings")
     logger.info("Calculando savings...")
     savings = []
-    for i in range(len(pontos)):
-        for j in range(i + 1, len(pontos)):
-            d_i0, t_i0 = calcular_distancia_e_tempo(pontos[i], {"lat": origem[0], "lon": origem[1]}, obter_rota)
-            d_j0, t_j0 = calcular_distancia_e_tempo(pontos[j], {"lat": origem[0], "lon": origem[1]}, obter_rota)
-            d_ij, t_ij = matriz_dist.get((i, j), (0.0, 0.0))
-            saving = d_i0 + d_j0 - d_ij
+    for i in range(n_pontos):
+        for j in range(i + 1, n_pontos):
+            saving = volta_dist[i] + volta_dist[j] - dist_pontos[i][j]
             savings.append((saving, i, j))
 
     savings.sort(reverse=True)
@@ -196,58 +271,18 @@ def gerar_rotas_transferencias(
     if progress_callback:
         progress_callback(80, "Otimizando rotas")
     logger.info("Iniciando processo de junção de rotas com base nos savings...")
-    for _, i, j in savings:
-        rota_i = next((r for r in rotas if r[-1] == i), None)
-        rota_j = next((r for r in rotas if r[0] == j), None)
-
-        if rota_i and rota_j and rota_i != rota_j:
-            nova_rota = rota_i + rota_j
-            peso_total_rota = sum(pontos[idx]["peso"] for idx in nova_rota)
-            cargas_rota = [pontos[idx].get("carga_id", pontos[idx].get("cluster_id")) for idx in nova_rota]
-            if len(cargas_rota) != len(set(cargas_rota)):
-                continue
-
-            capacidade_maxima_rota = max(
-                float(pontos[idx].get("capacidade_maxima_veiculo") or 0.0)
-                for idx in nova_rota
-            )
-            if capacidade_maxima_rota > 0 and peso_total_rota > capacidade_maxima_rota:
-                continue
-
-            # Cálculo de tempo parcial sem volta
-            tempo_transito = 0.0
-            anterior = origem
-            for idx in nova_rota:
-                atual = (pontos[idx]["lat"], pontos[idx]["lon"])
-                _, tempo = calcular_distancia_e_tempo({"lat": anterior[0], "lon": anterior[1]},
-                                                       {"lat": atual[0], "lon": atual[1]}, obter_rota)
-                tempo_transito += tempo
-                anterior = atual
-
-            # Tempo da volta
-            _, tempo_volta = calcular_distancia_e_tempo({"lat": anterior[0], "lon": anterior[1]},
-                                                         {"lat": origem[0], "lon": origem[1]}, obter_rota)
-
-            # Tempo de parada: leve/pesada é definido pela carga total embarcada
-            # no veículo e aplicado uniformemente em todas as paradas da rota.
-            parada_rota = (
-                tempo_parada_pesada
-                if peso_total_rota > peso_leve_max
-                else tempo_parada_leve
-            )
-            tempo_parada = len(nova_rota) * parada_rota
-
-            # Tempo de descarregamento
-            total_volumes = sum(pontos[idx]["volumes"] for idx in nova_rota)
-            tempo_descarga = total_volumes * tempo_por_volume
-
-            # Tempo total com volta
-            tempo_total = tempo_transito + tempo_parada + tempo_descarga + tempo_volta
-
-            if tempo_total <= tempo_maximo:
-                rotas.remove(rota_i)
-                rotas.remove(rota_j)
-                rotas.append(nova_rota)
+    rotas = _juntar_rotas_por_savings(
+        pontos,
+        savings,
+        tempo_pontos,
+        ida_tempo,
+        volta_tempo,
+        tempo_maximo,
+        tempo_parada_leve,
+        tempo_parada_pesada,
+        tempo_por_volume,
+        peso_leve_max,
+    )
 
     if progress_callback:
         progress_callback(90, "Montando resumo das rotas")
@@ -294,21 +329,15 @@ def gerar_rotas_transferencias(
                     "cte_volumes": cte["volumes"]
                 })
 
-        # Cálculo de distância e tempo
-        distancia_ida = 0.0
-        tempo_transito_ida = 0.0
+        # Cálculo de distância e tempo (a partir das matrizes já calculadas)
+        distancia_ida = ida_dist[rota[0]]
+        tempo_transito_ida = ida_tempo[rota[0]]
+        for anterior, atual in zip(rota, rota[1:]):
+            distancia_ida += dist_pontos[anterior][atual]
+            tempo_transito_ida += tempo_pontos[anterior][atual]
 
-        anterior = origem
-        for idx_ponto in rota:
-            atual = (pontos[idx_ponto]["lat"], pontos[idx_ponto]["lon"])
-            dist, tempo = calcular_distancia_e_tempo({"lat": anterior[0], "lon": anterior[1]},
-                                                      {"lat": atual[0], "lon": atual[1]}, obter_rota)
-            distancia_ida += dist
-            tempo_transito_ida += tempo
-            anterior = atual
-
-        dist_volta, tempo_volta = calcular_distancia_e_tempo({"lat": anterior[0], "lon": anterior[1]},
-                                                              {"lat": origem[0], "lon": origem[1]}, obter_rota)
+        dist_volta = volta_dist[rota[-1]]
+        tempo_volta = volta_tempo[rota[-1]]
 
         distancia_total = distancia_ida + dist_volta
         tempo_transito_total = tempo_transito_ida + tempo_volta
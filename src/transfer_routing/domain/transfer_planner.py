@@ -1,14 +1,12 @@
 #transfer_routing/domain/transfer_planner.py
 
 from datetime import date
-from functools import partial
 
 from transfer_routing.infrastructure.database_reader import (
     buscar_hub_central,
     carregar_entregas_completas
 )
 from transfer_routing.infrastructure.database_writer import salvar_transferencias
-from transfer_routing.infrastructure.geolocation import get_route
 from transfer_routing.domain.route_planning import gerar_rotas_transferencias
 
 
@@ -52,8 +50,6 @@ class TransferPlanner:
 
         logger.info("Verificando cache e calculando distâncias e tempos.")
 
-        obter_rota = partial(get_route, tenant_id=self.tenant_id, conn=conn_routing, logger=logger)
-
         logger.info("Iniciando geração de rotas.")
         rotas_resumo, detalhes_transferencias = gerar_rotas_transferencias(
             df_entregas=df_entregas_sem_hub,
@@ -63,7 +59,6 @@ class TransferPlanner:
             tempo_parada_pesada=self.tempo_parada_pesada,
             tempo_por_volume=self.tempo_por_volume,
             peso_leve_max=self.peso_leve_max,
-            obter_rota=obter_rota,
             conn=conn_routing,
             tenant_id=self.tenant_id,
             logger=logger,
@@ -3,6 +3,8 @@
 import json
 import os
 
+from psycopg2.extras import execute_values
+
 
 def obter_rota_do_cache(origem_str, destino_str, conn, logger=None):
     try:
@@ -68,6 +70,74 @@ def save_route_to_cache(origem_str, destino_str, tenant_id,
 
 
 
+def obter_metricas_do_cache_em_lote(pares_str, conn, logger=None):
+    """
+    Busca distância/tempo de vários trechos numa única consulta.
+    pares_str: [(origem_str, destino_str), ...]
+    Retorna: {(origem_str, destino_str): (distancia_km, tempo_minutos)} apenas para os encontrados.
+    """
+    pares_str = list(set(pares_str))
+    if not pares_str:
+        return {}
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT c.origem, c.destino, c.distancia_km, c.tempo_minutos
+                FROM cache_rotas c
+                JOIN unnest(%s::text[], %s::text[]) AS p(origem, destino)
+                  ON c.origem = p.origem AND c.destino = p.destino
+            """, (
+                [origem for origem, _ in pares_str],
+                [destino for _, destino in pares_str],
+            ))
+            rows = cur.fetchall()
+    except Exception as e:
+        conn.rollback()
+        if logger:
+            logger.error(f"Erro ao consultar cache em lote: {e}")
+        return {}
+
+    encontrados = {}
+    for origem_str, destino_str, distancia_km, tempo_minutos in rows:
+        if distancia_km is None or tempo_minutos is None:
+            continue
+        encontrados[(origem_str, destino_str)] = (float(distancia_km), float(tempo_minutos))
+
+    if logger:
+        logger.info(f"Cache em lote: {len(encontrados)}/{len(pares_str)} trechos encontrados")
+    return encontrados
+
+
+def salvar_rotas_no_cache_em_lote(registros, tenant_id, conn, logger=None):
+    """
+    registros: [(origem_str, destino_str, distancia_km, tempo_minutos, rota_json), ...]
+    """
+    if not registros:
+        return
+    try:
+        with conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO cache_rotas (
+                    origem, destino, tenant_id,
+                    distancia_km, tempo_minutos, rota_json
+                ) VALUES %s
+                ON CONFLICT (origem, destino) DO NOTHING
+            """, [
+                (origem_str, destino_str, tenant_id, distancia_km, tempo_minutos, json.dumps(rota_json))
+                for origem_str, destino_str, distancia_km, tempo_minutos, rota_json in registros
+            ])
+        conn.commit()
+
+        if logger:
+            logger.info(f"Cache salvo em lote: {len(registros)} trechos")
+
+    except Exception as e:
+        conn.rollback()
+        if logger:
+            logger.error(f"Erro ao salvar cache em lote: {e}")
+
+
 def limpar_cache_total(conn, logger=None):
     try:
         with conn.cursor() as cur:
@@ -1,9 +1,19 @@
 import psycopg2
 import os
+import threading
 from dotenv import load_dotenv
+from psycopg2 import pool
 
 load_dotenv()
 
+ROUTING_DB_POOL_MIN = int(os.getenv("ROUTING_DB_POOL_MIN", "1"))
+ROUTING_DB_POOL_MAX = int(os.getenv("ROUTING_DB_POOL_MAX", "8"))
+
+_pool_routing = None
+_pool_routing_pid = None
+_pool_lock = threading.Lock()
+_conexoes_do_pool = set()
+
 
 def conectar_banco_cluster():
     return psycopg2.connect(
@@ -15,8 +25,8 @@ def conectar_banco_cluster():
     )
 
 
-def conectar_banco_routing():
-    return psycopg2.connect(
+def _parametros_routing():
+    return dict(
         dbname=os.getenv("ROUTING_DB"),
         user=os.getenv("DB_USER"),
         password=os.getenv("DB_PASS"),
@@ -25,6 +35,44 @@ def conectar_banco_routing():
     )
 
 
+def _obter_pool_routing():
+    """Pool por processo (recriado após fork, ex.: workers RQ)."""
+    global _pool_routing, _pool_routing_pid
+    if _pool_routing is None or _pool_routing_pid != os.getpid():
+        with _pool_lock:
+            if _pool_routing is None or _pool_routing_pid != os.getpid():
+                _pool_routing = pool.ThreadedConnectionPool(
+                    ROUTING_DB_POOL_MIN,
+                    max(ROUTING_DB_POOL_MIN, ROUTING_DB_POOL_MAX),
+                    **_parametros_routing()
+                )
+                _pool_routing_pid = os.getpid()
+                _conexoes_do_pool.clear()
+    return _pool_routing
+
+
+def conectar_banco_routing():
+    """
+    Conexão com o banco de routing vinda do pool do processo.
+    Se o pool estiver esgotado, abre uma conexão avulsa (fechada normalmente em fechar_conexao).
+    """
+    try:
+        conn = _obter_pool_routing().getconn()
+    except pool.PoolError:
+        return psycopg2.connect(**_parametros_routing())
+    with _pool_lock:
+        _conexoes_do_pool.add(id(conn))
+    return conn
+
+
 def fechar_conexao(conn):
-    if conn:
+    if not conn:
+        return
+    with _pool_lock:
+        do_pool = id(conn) in _conexoes_do_pool
+        _conexoes_do_pool.discard(id(conn))
+    if do_pool and _pool_routing is not None and _pool_routing_pid == os.getpid():
+        # putconn faz rollback de transação pendente e descarta conexões quebradas
+        _pool_routing.putconn(conn, close=bool(conn.closed))
+    else:
         conn.close()
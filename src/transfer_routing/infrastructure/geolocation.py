@@ -5,7 +5,9 @@ import os
 from dotenv import load_dotenv
 
 from transfer_routing.infrastructure.cache import (
+    obter_metricas_do_cache_em_lote,
     obter_rota_do_cache,
+    salvar_rotas_no_cache_em_lote,
     save_route_to_cache
 )
 from transfer_routing.infrastructure.osrm_service import OSRMRouteService
@@ -15,6 +17,7 @@ load_dotenv()
 
 GOOGLE_MAPS_API_KEY = os.getenv("GMAPS_API_KEY")
 OSRM_URL = os.getenv("OSRM_URL", "http://osrm:5000")
+OSRM_LOTE_PARES = int(os.getenv("TRANSFER_OSRM_LOTE_PARES", "200"))
 
 logger = LoggerFactory.get_logger(__name__)
 osrm_service = OSRMRouteService(OSRM_URL)
@@ -100,3 +103,65 @@ def get_route(origem: tuple, destino: tuple, tenant_id: str, conn, logger=None):
             logger.error(f"Erro ao obter rota da API Google Maps: {e}")
         return None, None, []
 
+
+
+def obter_matriz_rotas(coords: list, tenant_id: str, conn, logger=None, progress_callback=None):
+    """
+    Distância/tempo entre todos os pares ordenados de coords [(lat, lon), ...].
+    1️⃣ uma consulta em lote ao cache; 2️⃣ faltantes no OSRM em lotes paralelos
+    (salvos no cache em lote); 3️⃣ o que o OSRM não resolver segue por get_route (Google).
+    Retorna: {(i, j): (distancia_km, tempo_minutos)} — (0.0, 0.0) quando não há rota.
+    """
+    coords_str = [formatar_coord(c) for c in coords]
+    pares = [(i, j) for i in range(len(coords)) for j in range(len(coords)) if i != j]
+    total_pares = len(pares)
+
+    matriz = {}
+    pendentes_por_chave = {}
+    for i, j in pares:
+        chave = (coords_str[i], coords_str[j])
+        if chave[0] == chave[1]:
+            matriz[(i, j)] = (0.0, 0.0)
+        else:
+            pendentes_por_chave.setdefault(chave, []).append((i, j))
+
+    # 1️⃣ Cache no banco (uma consulta para todos os pares)
+    cache = obter_metricas_do_cache_em_lote(list(pendentes_por_chave), conn, logger=logger)
+    for chave, metricas in cache.items():
+        for par in pendentes_por_chave.pop(chave, []):
+            matriz[par] = metricas
+
+    # 2️⃣ OSRM, apenas para os faltantes
+    faltantes = list(pendentes_por_chave)
+    if logger:
+        logger.info(f"Matriz: {len(cache)} trechos do cache, {len(faltantes)} via OSRM")
+
+    sem_rota = []
+    for inicio in range(0, len(faltantes), OSRM_LOTE_PARES):
+        lote = faltantes[inicio:inicio + OSRM_LOTE_PARES]
+        resultados = osrm_service.consultar_rotas([
+            (coords[pendentes_por_chave[chave][0][0]], coords[pendentes_por_chave[chave][0][1]])
+            for chave in lote
+        ])
+
+        registros = []
+        for chave, (rota, distancia_km, tempo_minutos) in zip(lote, resultados):
+            if distancia_km > 0:
+                registros.append((chave[0], chave[1], distancia_km, tempo_minutos, {"coordenadas": rota}))
+                for par in pendentes_por_chave[chave]:
+                    matriz[par] = (distancia_km, tempo_minutos)
+            else:
+                sem_rota.append(chave)
+        salvar_rotas_no_cache_em_lote(registros, tenant_id, conn, logger=logger)
+
+        if progress_callback and total_pares > 0:
+            progress_callback(len(matriz), total_pares)
+
+    # 3️⃣ Fallback individual (Google Maps)
+    for chave in sem_rota:
+        i, j = pendentes_por_chave[chave][0]
+        distancia_km, tempo_minutos, _ = get_route(coords[i], coords[j], tenant_id, conn, logger=logger)
+        for par in pendentes_por_chave[chave]:
+            matriz[par] = (distancia_km or 0.0, tempo_minutos or 0.0)
+
+    return matriz
@@ -0,0 +1,114 @@
+# utils/atribuicao_capacitada.py
+
+import logging
+import os
+
+import numpy as np
+from ortools.graph.python import min_cost_flow
+
+logger = logging.getLogger(__name__)
+
+# Centros candidatos por ponto no fluxo (0 = todos); se ficar inviável, refaz com todos
+ATRIBUICAO_CAPACITADA_VIZINHOS = int(os.getenv("ATRIBUICAO_CAPACITADA_VIZINHOS", "4"))
+# Distância² (graus²) -> custo inteiro do fluxo
+_ESCALA_CUSTO = 1e8
+
+
+def limites_de_tamanho(total: int, k: int, tolerancia: int):
+    """(mínimo, máximo) por cluster em torno de total/k, sempre com solução viável."""
+    alvo = total // k
+    minimo = max(0, min(alvo - int(tolerancia), alvo))
+    maximo = max(alvo + int(tolerancia), -(-total // k))
+    return minimo, maximo
+
+
+def _resolver_fluxo(dist2, minimo, maximo, vizinhos):
+    n, k = dist2.shape
+
+    if 0 < vizinhos < k:
+        candidatos = np.argpartition(dist2, vizinhos - 1, axis=1)[:, :vizinhos]
+    else:
+        candidatos = np.broadcast_to(np.arange(k), (n, k))
+
+    # nós: pontos [0, n), centros [n, n + k), sorvedouro n + k
+    sorvedouro = n + k
+    m = candidatos.shape[1]
+
+    origem_pontos = np.repeat(np.arange(n), m)
+    destino_pontos = n + candidatos.ravel()
+    custo_pontos = np.rint(
+        np.take_along_axis(dist2, candidatos, axis=1).ravel() * _ESCALA_CUSTO
+    ).astype(np.int64)
+
+    smcf = min_cost_flow.SimpleMinCostFlow()
+    arcos = smcf.add_arcs_with_capacity_and_unit_cost(
+        np.concatenate([origem_pontos, n + np.arange(k)]),
+        np.concatenate([destino_pontos, np.full(k, sorvedouro)]),
+        np.concatenate([np.ones(n * m, dtype=np.int64), np.full(k, maximo - minimo, dtype=np.int64)]),
+        np.concatenate([custo_pontos, np.zeros(k, dtype=np.int64)]),
+    )
+
+    # o mínimo de cada centro é demanda do próprio centro; o excedente vai ao sorvedouro
+    smcf.set_nodes_supplies(
+        np.arange(n + k + 1),
+        np.concatenate([
+            np.ones(n, dtype=np.int64),
+            np.full(k, -minimo, dtype=np.int64),
+            [-(n - k * minimo)],
+        ]),
+    )
+
+    if smcf.solve() != smcf.OPTIMAL:
+        return None
+
+    fluxos = smcf.flows(arcos[: n * m]).reshape(n, m)
+    return candidatos[np.arange(n), fluxos.argmax(axis=1)]
+
+
+def atribuir_com_capacidade(coords, centros, minimo, maximo, max_iter: int = 10,
+                            vizinhos: int = None):
+    """
+    Atribui cada ponto a um centro minimizando a soma das distâncias², com
+    minimo <= tamanho de cada cluster <= maximo (fluxo de custo mínimo pontos -> centros).
+
+    Alterna fluxo e recálculo dos centros (como o KMeans) até os rótulos estabilizarem.
+    Retorna (rotulos, centros).
+    """
+    coords = np.asarray(coords, dtype=float)
+    centros = np.array(centros, dtype=float)
+    n, k = len(coords), len(centros)
+
+    if k * minimo > n or k * maximo < n:
+        raise ValueError(f"Limites inviáveis: n={n} k={k} mínimo={minimo} máximo={maximo}")
+
+    vizinhos = ATRIBUICAO_CAPACITADA_VIZINHOS if vizinhos is None else vizinhos
+    origem = coords.mean(axis=0)
+    pontos = coords - origem
+    rotulos = None
+
+    for _ in range(max(1, max_iter)):
+        deslocados = centros - origem
+        dist2 = (
+            (pontos ** 2).sum(axis=1)[:, None]
+            - 2 * pontos @ deslocados.T
+            + (deslocados ** 2).sum(axis=1)[None, :]
+        )
+        dist2 = np.maximum(dist2, 0.0)
+
+        novos = _resolver_fluxo(dist2, minimo, maximo, vizinhos)
+        if novos is None:
+            logger.info(f"[ATRIBUICAO_CAPACITADA] vizinhos={vizinhos} inviável, usando todos os centros")
+            novos = _resolver_fluxo(dist2, minimo, maximo, 0)
+            if novos is None:
+                raise ValueError(f"Fluxo sem solução: n={n} k={k} mínimo={minimo} máximo={maximo}")
+
+        if rotulos is not None and np.array_equal(novos, rotulos):
+            break
+
+        rotulos = novos
+        contagem = np.bincount(rotulos, minlength=k)
+        for eixo in range(coords.shape[1]):
+            soma = np.bincount(rotulos, weights=coords[:, eixo], minlength=k)
+            centros[:, eixo] = np.where(contagem > 0, soma / np.maximum(contagem, 1), centros[:, eixo])
+
+    return rotulos, centros
@@ -0,0 +1,117 @@
+# utils/kmeans_incremental.py
+
+import hashlib
+import logging
+import threading
+
+import numpy as np
+from sklearn.cluster import KMeans
+
+logger = logging.getLogger(__name__)
+
+
+def assinatura_coordenadas(coords) -> str:
+    """Identifica o conjunto de pontos (mesma ordem) para reaproveitar partições."""
+    coords = np.ascontiguousarray(coords, dtype=float)
+    return hashlib.blake2b(coords.tobytes(), digest_size=16).hexdigest() + f":{len(coords)}"
+
+
+def _rotulos_mais_proximos(coords, centros):
+    # ||x - c||² sem montar o tensor N x k x 2 (centrado na média para não perder precisão)
+    origem = coords.mean(axis=0)
+    coords = coords - origem
+    centros = centros - origem
+    dist = (
+        (coords ** 2).sum(axis=1)[:, None]
+        - 2 * coords @ centros.T
+        + (centros ** 2).sum(axis=1)[None, :]
+    )
+    rotulos = dist.argmin(axis=1)
+    return rotulos, np.maximum(dist[np.arange(len(coords)), rotulos], 0.0)
+
+
+class KMeansIncremental:
+    """
+    Partições KMeans encadeadas por k sobre o mesmo conjunto de pontos.
+
+    centros(k) parte de centros(k-1): o cluster de maior inércia é dividido ao longo do
+    seu eixo principal e o KMeans roda uma única vez a partir desses k centros (n_init=1).
+    A cadeia começa em k=1 (centroide), então o resultado de cada k não depende da ordem
+    em que os cenários são avaliados — serial, adaptativo ou em processos separados.
+    """
+
+    def __init__(self, coords, random_state: int = 42, max_iter: int = 100):
+        self.coords = np.ascontiguousarray(coords, dtype=float)
+        self.random_state = random_state
+        self.max_iter = max_iter
+        self.assinatura = assinatura_coordenadas(self.coords)
+
+        self._centros = {1: self.coords.mean(axis=0, keepdims=True)}
+        self._lock = threading.Lock()
+
+    def _proximo(self, centros_anteriores):
+        rotulos, dist2 = _rotulos_mais_proximos(self.coords, centros_anteriores)
+        inercia = np.bincount(rotulos, weights=dist2, minlength=len(centros_anteriores))
+
+        maior = int(inercia.argmax())
+        pontos = self.coords[rotulos == maior]
+        centro = centros_anteriores[maior]
+
+        if len(pontos) > 1:
+            _, valores, eixos = np.linalg.svd(pontos - centro, full_matrices=False)
+            desvio = eixos[0] * (valores[0] / np.sqrt(len(pontos)))
+        else:
+            desvio = np.zeros_like(centro)
+
+        iniciais = np.vstack([
+            np.delete(centros_anteriores, maior, axis=0),
+            centro + desvio,
+            centro - desvio,
+        ])
+
+        modelo = KMeans(
+            n_clusters=len(iniciais),
+            init=iniciais,
+            n_init=1,
+            max_iter=self.max_iter,
+            random_state=self.random_state,
+        ).fit(self.coords)
+
+        return modelo.cluster_centers_
+
+    def centros(self, k: int) -> np.ndarray:
+        k = int(k)
+        if k < 1 or k > len(self.coords):
+            raise ValueError(f"k={k} inválido para {len(self.coords)} pontos")
+
+        with self._lock:
+            if k not in self._centros:
+                base = max(c for c in self._centros if c < k)
+                for atual in range(base + 1, k + 1):
+                    self._centros[atual] = self._proximo(self._centros[atual - 1])
+
+            return self._centros[k]
+
+    def rotulos(self, k: int) -> np.ndarray:
+        return _rotulos_mais_proximos(self.coords, self.centros(k))[0]
+
+    def inercia(self, k: int) -> float:
+        return float(_rotulos_mais_proximos(self.coords, self.centros(k))[1].sum())
+
+    def exportar(self) -> dict:
+        with self._lock:
+            return {
+                "assinatura": self.assinatura,
+                "centros": {k: c.tolist() for k, c in self._centros.items()},
+            }
+
+    def importar(self, snapshot: dict) -> int:
+        """Semeia centros já calculados (ex.: pelo processo pai). Ignora se os pontos forem outros."""
+        if not snapshot or snapshot.get("assinatura") != self.assinatura:
+            return 0
+
+        with self._lock:
+            for k, centros in snapshot.get("centros", {}).items():
+                self._centros.setdefault(int(k), np.asarray(centros, dtype=float))
+
+        return len(snapshot.get("centros", {}))
@@ -0,0 +1,214 @@
+# utils/rate_governor.py
+
+import os
+import time
+import threading
+import logging
+
+from redis import Redis
+
+logger = logging.getLogger(__name__)
+
+RATE_GOVERNOR_REDIS_HOST = os.getenv("RATE_GOVERNOR_REDIS_HOST", "redis")
+RATE_GOVERNOR_REDIS_PORT = int(os.getenv("RATE_GOVERNOR_REDIS_PORT", "6379"))
+# Fator multiplicativo ao detectar 429/timeout e intervalo mínimo entre reduções
+RATE_GOVERNOR_FATOR_REDUCAO = float(os.getenv("RATE_GOVERNOR_FATOR_REDUCAO", "0.7"))
+RATE_GOVERNOR_COOLDOWN_SEC = float(os.getenv("RATE_GOVERNOR_COOLDOWN_SEC", "2"))
+RATE_GOVERNOR_ESPERA_MAX_SEC = float(os.getenv("RATE_GOVERNOR_ESPERA_MAX_SEC", "60"))
+
+# QPS padrão por provedor (sobrescreva com RATE_<PROVEDOR>_QPS / _QPS_MIN / _BURST)
+PROVEDORES_PADRAO = {
+    "nominatim": {"qps": 20.0, "qps_min": 1.0},
+    # nominatim.openstreetmap.org: política de uso de no máximo 1 requisição/s
+    "nominatim_publico": {"qps": 1.0, "qps_min": 0.5},
+    "google_geocode": {"qps": 40.0, "qps_min": 2.0},
+    "google_routes": {"qps": 10.0, "qps_min": 1.0},
+}
+
+EVENTOS = ("ok", "throttle", "timeout", "erro")
+
+# Token bucket atômico: recarrega pela taxa atual (compartilhada) e consome 1 token.
+# Retorna a espera em segundos (0 = token concedido).
+_LUA_ADQUIRIR = """
+local chave = KEYS[1]
+local taxa_padrao = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local agora = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local estado = redis.call('HMGET', chave, 'tokens', 'ts', 'taxa')
+local taxa = tonumber(estado[3]) or taxa_padrao
+local tokens = tonumber(estado[1]) or burst
+local ts = tonumber(estado[2]) or agora
+tokens = math.min(burst, tokens + math.max(0, agora - ts) * taxa)
+local espera = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    espera = (1 - tokens) / taxa
+end
+redis.call('HSET', chave, 'tokens', tostring(tokens), 'ts', tostring(agora), 'taxa', tostring(taxa))
+redis.call('EXPIRE', chave, 3600)
+return tostring(espera)
+"""
+
+# AIMD: 429/timeout reduz a taxa (no máximo uma vez por cooldown) e esvazia o bucket;
+# cada sucesso aumenta 1% da taxa máxima
+_LUA_REGISTRAR = """
+local chave = KEYS[1]
+local chave_metricas = KEYS[2]
+local chave_minuto = KEYS[3]
+local evento = ARGV[1]
+local taxa_padrao = tonumber(ARGV[2])
+local taxa_min = tonumber(ARGV[3])
+local taxa_max = tonumber(ARGV[4])
+local fator = tonumber(ARGV[5])
+local cooldown = tonumber(ARGV[6])
+local t = redis.call('TIME')
+local agora = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local estado = redis.call('HMGET', chave, 'taxa', 'ultima_reducao')
+local taxa = tonumber(estado[1]) or taxa_padrao
+local ultima_reducao = tonumber(estado[2]) or 0
+if evento == 'throttle' or evento == 'timeout' then
+    if agora - ultima_reducao >= cooldown then
+        taxa = math.max(taxa_min, taxa * fator)
+        -- esvazia o bucket: a próxima requisição de qualquer worker já sai espaçada
+        redis.call('HSET', chave, 'ultima_reducao', tostring(agora), 'tokens', '0', 'ts', tostring(agora))
+    end
+elseif evento == 'ok' then
+    taxa = math.min(taxa_max, taxa + taxa_max / 100)
+end
+redis.call('HSET', chave, 'taxa', tostring(taxa))
+redis.call('EXPIRE', chave, 3600)
+redis.call('HINCRBY', chave_metricas, evento, 1)
+redis.call('EXPIRE', chave_metricas, 86400)
+redis.call('INCR', chave_minuto)
+redis.call('EXPIRE', chave_minuto, 600)
+return tostring(taxa)
+"""
+
+
+class GovernadorTaxa:
+    """
+    Limite de requisições por provedor compartilhado entre processos/containers (Redis).
+
+    - aguardar(): bloqueia até haver token no bucket do provedor.
+    - registrar(evento): 'ok' | 'throttle' (429/OVER_QUERY_LIMIT) | 'timeout' | 'erro';
+      a taxa se adapta (AIMD) e é a mesma para todos os workers.
+    - metricas(): taxa atual, contadores e vazão do último minuto.
+    Se o Redis estiver indisponível, cai para um bucket local do processo.
+    """
+
+    def __init__(self, provedor: str, qps: float = None, qps_min: float = None,
+                 burst: float = None, redis_conn=None):
+        padrao = PROVEDORES_PADRAO.get(provedor, {"qps": 10.0, "qps_min": 1.0})
+        prefixo_env = f"RATE_{provedor.upper()}"
+
+        self.provedor = provedor
+        self.qps = float(qps or os.getenv(f"{prefixo_env}_QPS", padrao["qps"]))
+        self.qps_min = min(self.qps, float(qps_min or os.getenv(f"{prefixo_env}_QPS_MIN", padrao["qps_min"])))
+        self.burst = max(1.0, float(burst or os.getenv(f"{prefixo_env}_BURST", self.qps)))
+
+        self._chave = f"rate_governor:{provedor}"
+        self._chave_metricas = f"rate_governor:{provedor}:metricas"
+
+        self._redis = redis_conn or Redis(
+            host=RATE_GOVERNOR_REDIS_HOST,
+            port=RATE_GOVERNOR_REDIS_PORT,
+            socket_timeout=2,
+        )
+        self._adquirir = self._redis.register_script(_LUA_ADQUIRIR)
+        self._registrar = self._redis.register_script(_LUA_REGISTRAR)
+
+        # fallback local (sem Redis)
+        self._lock = threading.Lock()
+        self._ultima_chamada_local = 0.0
+
+    def _chave_minuto(self, epoch_min: int) -> str:
+        return f"rate_governor:{self.provedor}:req:{epoch_min}"
+
+    def _aguardar_local(self):
+        with self._lock:
+            intervalo = 1.0 / self.qps_min
+            espera = self._ultima_chamada_local + intervalo - time.time()
+            if espera > 0:
+                time.sleep(espera)
+            self._ultima_chamada_local = time.time()
+
+    def aguardar(self) -> float:
+        """Bloqueia até obter um token. Retorna o tempo total esperado (s)."""
+        inicio = time.time()
+
+        while True:
+            try:
+                espera = float(self._adquirir(keys=[self._chave], args=[self.qps, self.burst]))
+            except Exception as e:
+                logger.warning(f"[RATE][{self.provedor}][REDIS_INDISPONIVEL] {e}")
+                self._aguardar_local()
+                return time.time() - inicio
+
+            if espera <= 0:
+                return time.time() - inicio
+
+            if time.time() - inicio + espera > RATE_GOVERNOR_ESPERA_MAX_SEC:
+                logger.warning(f"[RATE][{self.provedor}][ESPERA_MAX] seguindo sem token")
+                return time.time() - inicio
+
+            time.sleep(espera)
+
+    def registrar(self, evento: str):
+        if evento not in EVENTOS:
+            evento = "erro"
+
+        try:
+            taxa = float(self._registrar(
+                keys=[self._chave, self._chave_metricas, self._chave_minuto(int(time.time() // 60))],
+                args=[
+                    evento, self.qps, self.qps_min, self.qps,
+                    RATE_GOVERNOR_FATOR_REDUCAO, RATE_GOVERNOR_COOLDOWN_SEC,
+                ],
+            ))
+        except Exception as e:
+            logger.warning(f"[RATE][{self.provedor}][REDIS_INDISPONIVEL] {e}")
+            return
+
+        if evento in ("throttle", "timeout"):
+            logger.warning(f"[RATE][{self.provedor}][{evento.upper()}] taxa={taxa:.2f} req/s")
+
+    def metricas(self) -> dict:
+        try:
+            taxa = self._redis.hget(self._chave, "taxa")
+            contadores = self._redis.hgetall(self._chave_metricas)
+            minuto_anterior = int(time.time() // 60) - 1
+            req_ultimo_minuto = self._redis.get(self._chave_minuto(minuto_anterior))
+        except Exception as e:
+            logger.warning(f"[RATE][{self.provedor}][REDIS_INDISPONIVEL] {e}")
+            return {"provedor": self.provedor, "disponivel": False}
+
+        contadores = {k.decode(): int(v) for k, v in contadores.items()}
+
+        return {
+            "provedor": self.provedor,
+            "disponivel": True,
+            "taxa_atual": round(float(taxa), 2) if taxa else self.qps,
+            "taxa_max": self.qps,
+            "taxa_min": self.qps_min,
+            "req_por_seg_ultimo_minuto": round(int(req_ultimo_minuto or 0) / 60, 2),
+            **{evento: contadores.get(evento, 0) for evento in EVENTOS},
+        }
+
+
+_governadores = {}
+_governadores_pid = None
+_governadores_lock = threading.Lock()
+
+
+def obter_governador(provedor: str) -> GovernadorTaxa:
+    """Instância única por provedor e processo (recriada após fork)."""
+    global _governadores, _governadores_pid
+    with _governadores_lock:
+        if _governadores_pid != os.getpid():
+            _governadores = {}
+            _governadores_pid = os.getpid()
+        if provedor not in _governadores:
+            _governadores[provedor] = GovernadorTaxa(provedor)
+        return _governadores[provedor]
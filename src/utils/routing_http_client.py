@@ -0,0 +1,150 @@
+# utils/routing_http_client.py
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Optional
+from urllib.parse import urlparse
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+ROUTING_HTTP_MAX_CONCORRENCIA = int(os.getenv("ROUTING_HTTP_MAX_CONCORRENCIA", "16"))
+ROUTING_HTTP_MAX_CONEXOES = int(os.getenv("ROUTING_HTTP_MAX_CONEXOES", "32"))
+ROUTING_HTTP_TIMEOUT_SEC = float(os.getenv("ROUTING_HTTP_TIMEOUT_SEC", "10"))
+# Formato: "host=segundos,host=segundos" (ex.: "osrm_service=10,maps.googleapis.com=15")
+ROUTING_HTTP_TIMEOUTS_POR_HOST = os.getenv("ROUTING_HTTP_TIMEOUTS_POR_HOST", "")
+
+
+def _ler_timeouts_por_host(valor: str) -> dict:
+    timeouts = {}
+    for item in (valor or "").split(","):
+        if "=" not in item:
+            continue
+        host, segundos = item.split("=", 1)
+        try:
+            timeouts[host.strip()] = float(segundos)
+        except ValueError:
+            continue
+    return timeouts
+
+
+class RoutingHttpClient:
+    """
+    Cliente HTTP compartilhado para OSRM/Google.
+
+    Mantém um único httpx.AsyncClient (keep-alive + pool de conexões) num event loop
+    próprio em thread dedicada, com semáforo limitando requisições simultâneas.
+    Os métodos *_sync são a fachada para o código síncrono (workers RQ / threads).
+    """
+
+    def __init__(
+        self,
+        max_concorrencia: int = None,
+        max_conexoes: int = None,
+        timeout_padrao: float = None,
+        timeouts_por_host: dict = None,
+    ):
+        self.max_concorrencia = max(1, int(max_concorrencia or ROUTING_HTTP_MAX_CONCORRENCIA))
+        self.max_conexoes = max(1, int(max_conexoes or ROUTING_HTTP_MAX_CONEXOES))
+        self.timeout_padrao = float(timeout_padrao or ROUTING_HTTP_TIMEOUT_SEC)
+        self.timeouts_por_host = (
+            timeouts_por_host
+            if timeouts_por_host is not None
+            else _ler_timeouts_por_host(ROUTING_HTTP_TIMEOUTS_POR_HOST)
+        )
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever,
+            name="routing-http-client",
+            daemon=True,
+        )
+        self._thread.start()
+        self._client = None
+        self._semaforo = None
+        asyncio.run_coroutine_threadsafe(self._iniciar(), self._loop).result()
+
+    async def _iniciar(self):
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_conexoes,
+                max_keepalive_connections=self.max_conexoes,
+            ),
+            timeout=self.timeout_padrao,
+        )
+        self._semaforo = asyncio.Semaphore(self.max_concorrencia)
+
+    def _timeout_para(self, url: str, timeout: Optional[float]) -> float:
+        if timeout is not None:
+            return float(timeout)
+        host = urlparse(url).hostname or ""
+        return self.timeouts_por_host.get(host, self.timeout_padrao)
+
+    async def get_json(self, url: str, params: dict = None, timeout: float = None):
+        """
+        GET assíncrono. Retorna (status_code, json) ou (None, None) em erro de rede/parse.
+        """
+        async with self._semaforo:
+            try:
+                response = await self._client.get(
+                    url,
+                    params=params,
+                    timeout=self._timeout_para(url, timeout),
+                )
+            except Exception as e:
+                logger.warning(f"❌ Erro HTTP roteamento ({urlparse(url).hostname}): {e}")
+                return None, None
+
+        try:
+            return response.status_code, response.json()
+        except Exception:
+            return response.status_code, None
+
+    async def get_json_varios(self, requisicoes: list, timeout: float = None):
+        """
+        Executa várias requisições em paralelo (limitadas pelo semáforo).
+        requisicoes: [(url, params), ...] — retorna lista na mesma ordem.
+        """
+        return await asyncio.gather(*[
+            self.get_json(url, params=params, timeout=timeout)
+            for url, params in requisicoes
+        ])
+
+    def get_json_sync(self, url: str, params: dict = None, timeout: float = None):
+        return asyncio.run_coroutine_threadsafe(
+            self.get_json(url, params=params, timeout=timeout),
+            self._loop,
+        ).result()
+
+    def get_json_varios_sync(self, requisicoes: list, timeout: float = None):
+        if not requisicoes:
+            return []
+        return asyncio.run_coroutine_threadsafe(
+            self.get_json_varios(requisicoes, timeout=timeout),
+            self._loop,
+        ).result()
+
+    def fechar(self):
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+            self._client = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_cliente = None
+_cliente_pid = None
+_cliente_lock = threading.Lock()
+
+
+def obter_cliente_roteamento() -> RoutingHttpClient:
+    """Instância única do cliente por processo (criada sob demanda; recriada após fork)."""
+    global _cliente, _cliente_pid
+    if _cliente is None or _cliente_pid != os.getpid():
+        with _cliente_lock:
+            if _cliente is None or _cliente_pid != os.getpid():
+                _cliente = RoutingHttpClient()
+                _cliente_pid = os.getpid()
+    return _cliente